@@ -1,18 +1,62 @@
+import time
+_SCRIPT_START = time.perf_counter()  # untuk mengukur time-to-first-paint
+
 import streamlit as st
+from streamlit.runtime.memory_uploaded_file_manager import MemoryUploadedFileManager
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from PIL import Image, ImageOps, ImageDraw, ImageFont
 import numpy as np
 import pandas as pd
-import tensorflow as tf
 import io
-import time
+import json
+import logging
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+# Modul lokal ringan: TensorFlow/ultralytics baru di-import saat model dimuat
+import pipeline
+from engine import Detections, VehicleDetector
+from classifier import BIKE, CAR, model_path as classifier_path
+from detector import model_path as detector_path
+from scheduler import InferenceScheduler
+from tracing import Trace, profile_call
+from video import process_video
+from result_cache import ResultCache, file_version, make_key
+from preprocess import ImageTooLarge, decode_scaled, list_images, probe_image
+from session_store import SessionStore, estimate_size
+from benchmark import measure_profiles
+from export import export_bytes
+import config
 
-ULTRALYTICS_AVAILABLE = False
-try:
-    import ultralytics
-    from ultralytics import YOLO
-    ULTRALYTICS_AVAILABLE = True
-except:
-    pass
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("app")
+
+# Run yang sedang berjalan (app penuh + fragment di dalamnya): durasi dan byte media yang dikirim
+_RUN_STACK = [{"scope": "app", "start": _SCRIPT_START, "media_bytes": 0}]
+
+def _record_run(run):
+    ms = (time.perf_counter() - run["start"]) * 1000
+    st.session_state.setdefault("rerun_timings", {})[run["scope"]] = {"ms": ms, "media_bytes": run["media_bytes"]}
+    logger.info("rerun %s: %.1f ms, %d media bytes", run["scope"], ms, run["media_bytes"])
+
+@contextmanager
+def timed_run(scope):
+    """Ukur satu eksekusi fragment (sendiri atau sebagai bagian dari rerun app)"""
+    run = {"scope": scope, "start": time.perf_counter(), "media_bytes": 0}
+    _RUN_STACK.append(run)
+    try:
+        yield run
+    finally:
+        _RUN_STACK.remove(run)
+        _record_run(run)
+
+def send_image(data, **kwargs):
+    """st.image untuk bytes terenkode, dihitung ke byte media run yang aktif"""
+    st.image(data, **kwargs)
+    for run in _RUN_STACK:
+        run["media_bytes"] += len(data)
 
 st.set_page_config(page_title="Car & Bike Detection AI", page_icon="🚗", layout="wide")
 
@@ -545,6 +589,9 @@ if "page" not in st.session_state:
     st.session_state.page = 0
 if "user_name" not in st.session_state:
     st.session_state.user_name = ""
+if "session_id" not in st.session_state:
+    # Kunci sesi di SessionStore (upload & gambar hasil disimpan di sana, bukan di session_state)
+    st.session_state.session_id = uuid.uuid4().hex
 
 def go_next():
     if st.session_state.page < 3:
@@ -556,42 +603,115 @@ def go_prev():
 
 #Model 
 @st.cache_resource
-def load_models():
-    yolo_model = YOLO("model/best.pt")
-    classifier = tf.keras.models.load_model("model/classifier_model.h5")
-    return yolo_model, classifier
+def start_model_loading():
+    # Mulai muat model di thread latar begitu app boot; halaman 0-2 tidak menunggu
+    return pipeline.BackgroundLoader(VehicleDetector.load)
 
-yolo_model, classifier = load_models()
+model_loader = start_model_loading()
 
-# Classification function - CORRECT VERSION
-def classify_crop(crop_img, classifier_model):
-    """Classify cropped vehicle image as car or bike"""
+def get_detector():
+    """VehicleDetector (pemilik kedua model), menunggu loader latar jika belum selesai"""
+    if not model_loader.ready():
+        with st.spinner("Memuat model AI..."):
+            model_loader.wait()
     try:
-        # Model trained dengan 128x128 RGB
-        img_resized = crop_img.resize((128, 128))
-        img_array = np.array(img_resized) / 255.0  # Rescale seperti saat training
-        img_array = np.expand_dims(img_array, axis=0)  # Shape: (1, 128, 128, 3)
-        
-        # Predict
-        prediction = classifier_model.predict(img_array, verbose=0)
-        
-        # Binary classification dengan sigmoid output
-        # Assuming: 0 = bike/motor, 1 = car (sesuai urutan folder alfabetis)
-        confidence = float(prediction[0][0])
-        
-        if confidence > 0.5:
-            return "car", confidence
-        else:
-            return "bike", 1 - confidence
-            
+        return model_loader.get()
     except Exception as e:
-        st.error(f"Classification error: {str(e)}")
-        return "unknown", 0.0
-        
+        st.error(f"Gagal memuat model: {str(e)}")
+        return None
+
+# Profil inferensi halaman 3 (parameternya juga bagian dari cache key)
+PROFILE_LABELS = {"fast": "Cepat", "balanced": "Seimbang", "accurate": "Akurat", "adaptive": "Adaptif"}
+SAMPLE_IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_images")
+# Versi file yang benar-benar dimuat backend aktif (hasil export/konversi/kuantisasi, bukan hanya .pt/.h5)
+MODEL_VERSION = {
+    "detector": [config.DETECTOR_BACKEND, file_version(detector_path())],
+    "classifier": [config.CLASSIFIER_BACKEND, file_version(classifier_path())],
+    "cascade": pipeline.DEFAULT_CASCADE.describe(),
+}
+
+@st.cache_resource
+def get_result_cache():
+    # Satu cache untuk semua sesi dalam proses ini
+    return ResultCache(config.RESULT_CACHE_MAX_BYTES, config.RESULT_CACHE_DIR or None)
+
+result_cache = get_result_cache()
+
+@st.cache_resource
+def get_profile_latency():
+    # Latensi terukur per profil di sample_images; diisi sekali lewat tombol ukur, dibagi semua sesi
+    return {}
+
+@st.cache_resource
+def get_session_store():
+    # Satu store untuk semua sesi: batas per sesi, batas global dan TTL idle
+    return SessionStore(config.SESSION_MAX_BYTES, config.SESSION_STORE_MAX_BYTES, config.SESSION_TTL_S,
+                        config.SESSION_IMAGE_FORMAT, config.SESSION_IMAGE_QUALITY)
+
+session_store = get_session_store()
+
+SESSION_ID = st.session_state.session_id
+
+def get_decoded_upload(file_id, target_size, image_bytes):
+    """Decode sekali per file upload dan ukuran target, dipakai ulang oleh rerun berikutnya sesi ini.
+
+    Disimpan di SessionStore (dihitung ke budget sesi, dikeluarkan sebelum upload); array yang
+    tidak muat di budget di-decode ulang setiap kali.
+    """
+    tag = (file_id, target_size)
+    cached = session_store.get(SESSION_ID, "decoded")
+    if cached is not None and cached[0] == tag:
+        return cached[1]
+    decoded = decode_scaled(image_bytes, target_size)
+    session_store.put_object(SESSION_ID, "decoded", (tag, decoded), decoded.array.nbytes)
+    return decoded
+RESULT_KEYS = ["upload_info", "dets", "process_time", "trace", "profile"]
+
+def clear_results():
+    for k in RESULT_KEYS:
+        if k in st.session_state:
+            del st.session_state[k]
+    session_store.drop(SESSION_ID)
+
+def release_upload(uploaded):
+    """Lepas salinan upload milik Streamlit setelah byte-nya disimpan di SessionStore"""
+    ctx = get_script_run_ctx()
+    # API internal Streamlit (versi dipin di requirements.txt, dijaga tests/test_streamlit_compat.py).
+    # Mengganti key widget saja tidak cukup: frontend hanya menghapus file saat pengguna menghapusnya.
+    # Seperti st.chat_input, hanya manager in-memory yang bisa melepas satu file
+    if ctx is not None and isinstance(ctx.uploaded_file_mgr, MemoryUploadedFileManager):
+        ctx.uploaded_file_mgr.remove_file(session_id=ctx.session_id, file_id=uploaded.file_id)
+    else:
+        logger.info("upload %s tetap di file manager Streamlit sampai sesi berakhir", uploaded.file_id)
+    # Key baru: widget kosong, tidak merujuk file yang sudah dilepas
+    st.session_state["uploader_gen"] = st.session_state.get("uploader_gen", 0) + 1
+
+@st.cache_resource
+def get_scheduler(_detector):
+    # Satu scheduler pemilik engine untuk semua sesi
+    return InferenceScheduler(_detector)
+
 #Header
 st.markdown("<div class='hero-title'>Car & Bike Detection AI</div>", unsafe_allow_html=True)
 st.markdown("<div class='hero-sub'>Platform deteksi serta klasifikasi kendaraan berbasis AI menggunakan teknologi Computer Vision dan Deep Learning</div>", unsafe_allow_html=True)
 
+@st.cache_resource
+def log_first_paint():
+    # Sekali per proses: waktu dari start script pertama sampai header terkirim
+    logger.info("Time to first paint: %.2fs (models %s)", time.perf_counter() - _SCRIPT_START,
+                   "ready" if model_loader.ready() else "still loading")
+    return True
+
+log_first_paint()
+
+# Model readiness indicator
+if model_loader.error() is not None:
+    st.markdown("<p style='text-align:center;color:#fc8181;font-size:13px;margin-top:-32px'>● Model gagal dimuat</p>", unsafe_allow_html=True)
+elif model_loader.ready():
+    st.markdown(f"<p style='text-align:center;color:#68d391;font-size:13px;margin-top:-32px'>● Model siap (dimuat dalam {model_loader.load_seconds:.1f}s)</p>", unsafe_allow_html=True)
+else:
+    st.markdown("<p style='text-align:center;color:#f6e05e;font-size:13px;margin-top:-32px'>◌ Model sedang dimuat di latar belakang...</p>", unsafe_allow_html=True)
+
 content_col = st.container()
 
 #Halaman 0----------------------------------------------
@@ -892,26 +1012,49 @@ elif st.session_state.page == 3:
         st.markdown("<h3>Deteksi & Klasifikasi Kendaraan</h3>", unsafe_allow_html=True)
         st.markdown("<p class='muted'>Unggah gambar kendaraan dalam format JPG atau PNG untuk analisis otomatis dengan dual-model AI</p>", unsafe_allow_html=True)
         
-        uploaded = st.file_uploader("Pilih Gambar", type=["jpg","jpeg","png"], label_visibility="collapsed")
+        uploaded = st.file_uploader("Pilih Gambar", type=["jpg","jpeg","png"], label_visibility="collapsed",
+                                    key=f"image_upload_{st.session_state.get('uploader_gen', 0)}")
         
-        if uploaded:
+        upload_info = st.session_state.get("upload_info", {})
+        if uploaded and (upload_info.get("file_id") != uploaded.file_id
+                         or session_store.get(SESSION_ID, "upload") is None):
+            # Hanya saat file baru (file_id berubah): rerun lain tidak membaca/menyimpan ulang upload
             try:
-                image = Image.open(uploaded).convert("RGB")
-                st.session_state["uploaded_image_pil"] = image
-                st.session_state["uploaded_image_bytes"] = uploaded.getvalue()
+                # Hanya header yang dibaca di sini; decode terjadi saat inferensi (skala dekat imgsz)
+                image_bytes = uploaded.getvalue()
+                width, height, _ = probe_image(image_bytes)
+                # Dipin: entri turunan (hasil, CSV, profil) tidak boleh mengusir upload
+                if session_store.put(SESSION_ID, "upload", image_bytes, pinned=True):
+                    st.session_state["upload_info"] = {"file_id": uploaded.file_id, "name": uploaded.name,
+                                                       "type": uploaded.type, "size": uploaded.size,
+                                                       "width": width, "height": height}
+                    # Byte upload cukup disimpan sekali (di SessionStore)
+                    release_upload(uploaded)
+                    st.rerun()
+                else:
+                    st.error(f"Gambar melebihi batas memori sesi ({config.SESSION_MAX_BYTES / 1024 / 1024:.0f} MB)")
+            except ImageTooLarge as e:
+                st.error(f"Gambar terlalu besar: {str(e)}")
             except Exception as e:
                 st.error(f"Gagal membuka gambar: {str(e)}")
         
-        if "uploaded_image_pil" in st.session_state:
+        upload_bytes = session_store.get(SESSION_ID, "upload") if "upload_info" in st.session_state else None
+        if "upload_info" in st.session_state and upload_bytes is None:
+            # Dikeluarkan oleh TTL / batas memori selama sesi idle
+            clear_results()
+            st.info("Gambar sebelumnya sudah kedaluwarsa, silakan unggah ulang.")
+        
+        if upload_bytes is not None:
             col_img, col_preview = st.columns([2, 1], gap="large")
             
             with col_img:
-                st.image(st.session_state["uploaded_image_pil"], caption="Gambar Input", use_container_width=True)
+                send_image(upload_bytes, caption="Gambar Input", use_container_width=True)
             
             with col_preview:
-                file_type = uploaded.type if uploaded else "unknown"
-                file_size = f"{uploaded.size / 1024:.1f} KB" if uploaded else "0 KB"
-                img_width, img_height = st.session_state["uploaded_image_pil"].size
+                upload_info = st.session_state["upload_info"]
+                file_type = upload_info["type"]
+                file_size = f"{upload_info['size'] / 1024:.1f} KB"
+                img_width, img_height = upload_info["width"], upload_info["height"]
                 st.markdown(f"""
                     <div class='settings-box'>
                         <h4 style='margin:0 0 12px 0;color:#e0b3ff'>Info Gambar</h4>
@@ -923,79 +1066,100 @@ elif st.session_state.page == 3:
             
             col1, col2, col3 = st.columns([1,1,1])
             with col2:
-                if yolo_model is not None and classifier is not None:
+                detector = get_detector()
+                if detector is not None:
+                    scheduler = get_scheduler(detector)
+                    profiler_kind = st.selectbox(
+                        "Profil request berikutnya",
+                        options=["off", "cprofile", "torch"],
+                        format_func=lambda k: {"off": "Tanpa profiling", "cprofile": "cProfile", "torch": "PyTorch profiler"}[k],
+                        key="profiler_kind",
+                    )
+                    profile_latency = get_profile_latency()
+                    profile_name = st.selectbox(
+                        "Profil inferensi",
+                        options=list(pipeline.PROFILES),
+                        index=list(pipeline.PROFILES).index(config.DETECT_PROFILE),
+                        format_func=lambda k: PROFILE_LABELS.get(k, k) + (
+                            f" · ~{profile_latency[k]['p50_ms']:.0f} ms" if k in profile_latency else ""),
+                        key="detect_profile",
+                    )
+                    params = pipeline.profile_params(profile_name)
+                    st.caption(
+                        f"imgsz {params['imgsz']} · conf {params['conf']:.2f} · maks {params['max_det']} deteksi · "
+                        f"batch klasifikasi {params['classifier_batch']}"
+                    )
+                    if not profile_latency and st.button("Ukur latensi profil (sample_images)", use_container_width=True):
+                        # Lewat scheduler: model tetap dipakai satu thread
+                        with st.spinner("Mengukur latensi tiap profil..."):
+                            profile_latency.update(measure_profiles(
+                                lambda data, p: scheduler.detect(data, p), list_images(SAMPLE_IMAGES_DIR)
+                            ))
+                        st.rerun()
+                    tiled_mode = st.checkbox("Mode tile (gambar resolusi tinggi)", key="tiled_mode",
+                                             help="Deteksi per potongan gambar: objek kecil lebih terdeteksi, waktu proses lebih lama")
+                    if tiled_mode:
+                        # Parameter tile hanya ditambahkan saat aktif agar cache key mode biasa tidak berubah
+                        params["tiled"] = True
                     if st.button("Mulai Deteksi & Klasifikasi", use_container_width=True):
                         start_time = time.time()
+                        trace = Trace("page3")
+                        st.session_state.pop("profile", None)
+                        classify_errors = []
+
+                        def on_classify_error(e):
+                            classify_errors.append(e)
+                            st.error(f"Classification error: {str(e)}")
+
                         with st.spinner("AI sedang menganalisis gambar..."):
                             try:
-                                # YOLO Detection
-                                results = yolo_model.predict(
-                                    np.array(st.session_state["uploaded_image_pil"]), 
-                                    imgsz=960, 
-                                    conf=0.45, 
-                                    max_det=50
-                                )
-                                r0 = results[0]
-                                
-                                dets = []
-                                classifications = []
-                                
-                                if hasattr(r0, "boxes") and r0.boxes is not None and len(r0.boxes) > 0:
-                                    boxes = r0.boxes.xyxy.cpu().numpy()
-                                    scores = r0.boxes.conf.cpu().numpy()
-                                    classes = r0.boxes.cls.cpu().numpy().astype(int)
-                                    names = r0.names if hasattr(r0, "names") else {}
-                                    
-                                    orig_img = st.session_state["uploaded_image_pil"]
-                                    
-                                    # Classify each detection
-                                    for idx, (b, s, c) in enumerate(zip(boxes, scores, classes)):
-                                        yolo_class = names.get(int(c), str(c))
-                                        
-                                        # Crop the detected region
-                                        x1, y1, x2, y2 = map(int, b)
-                                        crop = orig_img.crop((x1, y1, x2, y2))
-                                        
-                                        # Classify the crop
-                                        class_name, class_conf = classify_crop(crop, classifier)
-                                        
-                                        dets.append({
-                                            "ID": idx + 1,
-                                            "YOLO Class": yolo_class,
-                                            "Classified As": class_name,
-                                            "Detection Conf": f"{float(s):.1%}",
-                                            "Classification Conf": f"{class_conf:.1%}",
-                                            "Bounding Box": f"({x1}, {y1}, {x2}, {y2})",
-                                            "Det_Confidence": float(s),
-                                            "Class_Confidence": class_conf
-                                        })
-                                        
-                                        classifications.append({
-                                            "class": class_name,
-                                            "confidence": class_conf
-                                        })
-                                
-                                # Draw results with classifications
-                                plotted = r0.plot()
-                                if isinstance(plotted, np.ndarray):
-                                    img = Image.fromarray(plotted)
+                                # Hasil yang sama (bytes + parameter + model) diambil dari cache
+                                with trace.span("cache_lookup") as cache_attrs:
+                                    cache_key = make_key(
+                                        upload_bytes,
+                                        models=MODEL_VERSION,
+                                        result="detections",  # format entri: Detections.to_dict()
+                                        **params
+                                    )
+                                    cached = None if profiler_kind != "off" else result_cache.get(cache_key)
+                                    cache_attrs["hit"] = cached is not None
+                                if cached is not None:
+                                    # Cache hit: gambar tidak perlu di-decode sama sekali
+                                    dets, img = Detections.from_dict(cached[0]), cached[1]
+                                elif profiler_kind != "off":
+                                    decoded = get_decoded_upload(upload_info["file_id"], pipeline.decode_size(params),
+                                                                 upload_bytes)
+
+                                    # Profiler hanya melihat thread pemanggil: engine dijalankan di sini,
+                                    # tetapi memegang kunci model scheduler agar tidak paralel dengan sesi lain
+                                    def run_profiled():
+                                        with scheduler.model_lock:
+                                            found = detector.detect(decoded, params, trace=trace, on_classify_error=on_classify_error)
+                                        return found, detector.render(decoded, found, trace)
+                                    (dets, img), data, filename, summary = profile_call(run_profiled, profiler_kind)
+                                    session_store.put(SESSION_ID, "profile", data)
+                                    st.session_state["profile"] = {"filename": filename, "summary": summary}
                                 else:
-                                    img = plotted if isinstance(plotted, Image.Image) else Image.fromarray(np.array(plotted))
-                                
-                                # Resize for display
-                                target_width = 900
-                                max_width = 1200
-                                if img.width < target_width:
-                                    scale = target_width / img.width
-                                    new_size = (int(img.width * scale), int(img.height * scale))
-                                    img = img.resize(new_size, Image.LANCZOS)
-                                if img.width > max_width:
-                                    scale = max_width / img.width
-                                    img = img.resize((int(img.width * scale), int(img.height * scale)), Image.LANCZOS)
-                                
-                                st.session_state["result_image"] = img
+                                    decoded = get_decoded_upload(upload_info["file_id"], pipeline.decode_size(params),
+                                                                 upload_bytes)
+                                    # Antre di scheduler bersama, bukan predict langsung dari thread sesi
+                                    dets, img = scheduler.detect(
+                                        decoded,
+                                        params,
+                                        on_classify_error=on_classify_error,
+                                        trace=trace
+                                    )
+                                    # Label "unknown" karena classifier gagal tidak boleh diputar ulang dari cache
+                                    if not classify_errors:
+                                        result_cache.put(cache_key, dets.to_dict(), img)
+                                st.session_state["trace"] = trace.to_dict()
+                                logger.info("page3 trace %s", trace.to_json())
+                                # Disimpan terenkode (WebP), bukan PIL ukuran tampilan
+                                session_store.put_image(SESSION_ID, "result", img)
+                                # Laporan dienkode sekali di sini, bukan di setiap rerun fragment detail
+                                session_store.put(SESSION_ID, "export_csv",
+                                                  export_bytes([(upload_info.get("name", "upload"), dets)], "csv"))
                                 st.session_state["dets"] = dets
-                                st.session_state["classifications"] = classifications
                                 
                                 end_time = time.time()
                                 st.session_state["process_time"] = end_time - start_time
@@ -1007,162 +1171,312 @@ elif st.session_state.page == 3:
                 else:
                     st.error("Model tidak tersedia.")
         
-        if "result_image" in st.session_state and "dets" in st.session_state:
-            st.markdown("</div>", unsafe_allow_html=True)
+        # Tiap area di bawah adalah fragment: widget di dalamnya hanya me-rerun area itu sendiri,
+        # bukan seluruh halaman (tanpa kirim ulang gambar hasil dan kartu deteksi)
+        @st.fragment
+        def show_result_image():
+            with timed_run("result_image"):
+                result_bytes = session_store.get(SESSION_ID, "result")
+                if result_bytes is None:
+                    if "dets" in st.session_state:
+                        # Ditolak store: upload + hasil melebihi batas memori sesi
+                        st.warning("Gambar hasil tidak disimpan: melebihi batas memori sesi.")
+                    return
+                # Display result image
+                st.markdown("<div style='margin:32px 0;padding:4px;background:linear-gradient(135deg,rgba(183,148,246,0.3),rgba(139,115,209,0.2));border-radius:20px'>", unsafe_allow_html=True)
+                send_image(result_bytes, use_container_width=True)
+                st.markdown("</div>", unsafe_allow_html=True)
 
-            # Display result image
-            st.markdown("<div style='margin:32px 0;padding:4px;background:linear-gradient(135deg,rgba(183,148,246,0.3),rgba(139,115,209,0.2));border-radius:20px'>", unsafe_allow_html=True)
-            st.image(st.session_state["result_image"], use_container_width=True)
-            st.markdown("</div>", unsafe_allow_html=True)
+                col1, col2, col3 = st.columns([1.5,1,1.5])
+                with col2:
+                    st.markdown("<div style='background:linear-gradient(135deg,#8b73d1,#b794f6);color:white;border:none;border-radius:12px;padding:12px 24px;font-weight:600;text-align:center'>Hasil Analisis AI</div>", unsafe_allow_html=True)
 
-            col1, col2, col3 = st.columns([1.5,1,1.5])
-            with col2:
-                st.markdown("<div style='background:linear-gradient(135deg,#8b73d1,#b794f6);color:white;border:none;border-radius:12px;padding:12px 24px;font-weight:600;text-align:center'>Hasil Analisis AI</div>", unsafe_allow_html=True)
+        @st.fragment
+        def show_statistics():
+            with timed_run("statistics"):
+                # Statistics - HITUNG DARI HASIL KLASIFIKASI
+                dets = st.session_state["dets"]
             
-            # Statistics - HITUNG DARI HASIL KLASIFIKASI
-            dets = st.session_state["dets"]
+                # Hitung berdasarkan hasil KLASIFIKASI (bukan YOLO detection)
+                car_count = dets.count(CAR)
+                bike_count = dets.count(BIKE)
+                total_detected = len(dets)
             
-            # Hitung berdasarkan hasil KLASIFIKASI (bukan YOLO detection)
-            car_count = sum(1 for d in dets if 'car' in d['Classified As'].lower())
-            bike_count = sum(1 for d in dets if 'bike' in d['Classified As'].lower() or 'motor' in d['Classified As'].lower())
-            total_detected = len(dets)
+                avg_det_conf = float(dets.scores.mean()) if len(dets) else 0
+                avg_class_conf = float(dets.label_scores.mean()) if len(dets) else 0
+                process_time = st.session_state.get("process_time", 0)
             
-            avg_det_conf = np.mean([d['Det_Confidence'] for d in dets]) if dets else 0
-            avg_class_conf = np.mean([d['Class_Confidence'] for d in dets]) if dets else 0
-            process_time = st.session_state.get("process_time", 0)
-            
-            st.markdown("<div class='card' style='margin-top:32px'>", unsafe_allow_html=True)
-            st.markdown("<h3 style='margin-bottom:24px;text-align:center'>Statistik Deteksi & Klasifikasi</h3>", unsafe_allow_html=True)
+                st.markdown("<div class='card' style='margin-top:32px'>", unsafe_allow_html=True)
+                st.markdown("<h3 style='margin-bottom:24px;text-align:center'>Statistik Deteksi & Klasifikasi</h3>", unsafe_allow_html=True)
 
-            stat1, stat2, stat3, stat4, stat5, stat6 = st.columns(6, gap="medium")
+                stat1, stat2, stat3, stat4, stat5, stat6 = st.columns(6, gap="medium")
             
-            total_vehicles = car_count + bike_count
-            car_pct = (car_count / total_vehicles * 100) if total_vehicles > 0 else 0
-            bike_pct = (bike_count / total_vehicles * 100) if total_vehicles > 0 else 0
+                total_vehicles = car_count + bike_count
+                car_pct = (car_count / total_vehicles * 100) if total_vehicles > 0 else 0
+                bike_pct = (bike_count / total_vehicles * 100) if total_vehicles > 0 else 0
             
-            with stat1:
-                st.markdown(f"""
-                    <div class='stat-card'>
-                        <div class='stat-label'>Total Objek</div>
-                        <div class='stat-number'>{total_detected}</div>
-                        <div class='stat-sublabel'>Terdeteksi</div>
-                    </div>
-                """, unsafe_allow_html=True)
+                with stat1:
+                    st.markdown(f"""
+                        <div class='stat-card'>
+                            <div class='stat-label'>Total Objek</div>
+                            <div class='stat-number'>{total_detected}</div>
+                            <div class='stat-sublabel'>Terdeteksi</div>
+                        </div>
+                    """, unsafe_allow_html=True)
             
-            with stat2:
-                st.markdown(f"""
-                    <div class='stat-card'>
-                        <div class='stat-label'>Akurasi Deteksi</div>
-                        <div class='stat-number'>{avg_det_conf:.0%}</div>
-                        <div class='stat-sublabel'>YOLO Model</div>
-                    </div>
-                """, unsafe_allow_html=True)
+                with stat2:
+                    st.markdown(f"""
+                        <div class='stat-card'>
+                            <div class='stat-label'>Akurasi Deteksi</div>
+                            <div class='stat-number'>{avg_det_conf:.0%}</div>
+                            <div class='stat-sublabel'>YOLO Model</div>
+                        </div>
+                    """, unsafe_allow_html=True)
             
-            with stat3:
-                st.markdown(f"""
-                    <div class='stat-card'>
-                        <div class='stat-label'>Akurasi Klasifikasi</div>
-                        <div class='stat-number'>{avg_class_conf:.0%}</div>
-                        <div class='stat-sublabel'>CNN Model</div>
-                    </div>
-                """, unsafe_allow_html=True)
+                with stat3:
+                    st.markdown(f"""
+                        <div class='stat-card'>
+                            <div class='stat-label'>Akurasi Klasifikasi</div>
+                            <div class='stat-number'>{avg_class_conf:.0%}</div>
+                            <div class='stat-sublabel'>CNN Model</div>
+                        </div>
+                    """, unsafe_allow_html=True)
             
-            with stat4:
-                st.markdown(f"""
-                    <div class='stat-card'>
-                        <div class='stat-label'>Mobil</div>
-                        <div class='stat-number'>{car_count}</div>
-                        <div class='stat-sublabel'>{car_pct:.0f}% dari total</div>
-                    </div>
-                """, unsafe_allow_html=True)
+                with stat4:
+                    st.markdown(f"""
+                        <div class='stat-card'>
+                            <div class='stat-label'>Mobil</div>
+                            <div class='stat-number'>{car_count}</div>
+                            <div class='stat-sublabel'>{car_pct:.0f}% dari total</div>
+                        </div>
+                    """, unsafe_allow_html=True)
             
-            with stat5:
-                st.markdown(f"""
-                    <div class='stat-card'>
-                        <div class='stat-label'>Motor</div>
-                        <div class='stat-number'>{bike_count}</div>
-                        <div class='stat-sublabel'>{bike_pct:.0f}% dari total</div>
-                    </div>
-                """, unsafe_allow_html=True)
+                with stat5:
+                    st.markdown(f"""
+                        <div class='stat-card'>
+                            <div class='stat-label'>Motor</div>
+                            <div class='stat-number'>{bike_count}</div>
+                            <div class='stat-sublabel'>{bike_pct:.0f}% dari total</div>
+                        </div>
+                    """, unsafe_allow_html=True)
             
-            with stat6:
-                st.markdown(f"""
-                    <div class='stat-card'>
-                        <div class='stat-label'>Waktu Proses</div>
-                        <div class='stat-number'>{process_time:.2f}s</div>
-                        <div class='stat-sublabel'>Total inferensi</div>
-                    </div>
-                """, unsafe_allow_html=True)
+                with stat6:
+                    st.markdown(f"""
+                        <div class='stat-card'>
+                            <div class='stat-label'>Waktu Proses</div>
+                            <div class='stat-number'>{process_time:.2f}s</div>
+                            <div class='stat-sublabel'>Total inferensi</div>
+                        </div>
+                    """, unsafe_allow_html=True)
             
-            st.markdown("</div>", unsafe_allow_html=True)
+                st.markdown("</div>", unsafe_allow_html=True)
 
-            # Detailed table
-            st.markdown("<div class='detail-table'>", unsafe_allow_html=True)
-            st.markdown("<h3 style='margin-bottom:20px'>Detail Klasifikasi Objek</h3>", unsafe_allow_html=True)
-            st.markdown("<div class='table-header'><div>ID</div><div>Kelas</div><div>Conf. Deteksi</div><div>Conf. Klasifikasi</div></div>", unsafe_allow_html=True)
+        @st.fragment
+        def show_details():
+            with timed_run("details"):
+                dets = st.session_state["dets"]
+                
+                # Detailed table
+                st.markdown("<div class='detail-table'>", unsafe_allow_html=True)
+                st.markdown("<h3 style='margin-bottom:20px'>Detail Klasifikasi Objek</h3>", unsafe_allow_html=True)
+                st.markdown("<div class='table-header'><div>ID</div><div>Kelas</div><div>Conf. Deteksi</div><div>Conf. Klasifikasi</div></div>", unsafe_allow_html=True)
             
-            for d in dets:
-                badge_class = "badge-car" if "car" in d["Classified As"].lower() else "badge-bike"
-                st.markdown(f"""
-                    <div class='table-row'>
-                        <div style='color:#c7bfe8;font-weight:700'>#{d['ID']}</div>
-                        <div><span class='class-badge {badge_class}'>{d['Classified As'].title()}</span></div>
-                        <div>
-                            <div style='color:#c7bfe8;font-weight:600'>{d['Detection Conf']}</div>
-                            <div class='conf-bar' style='width:100%;margin-top:4px;background:rgba(255,255,255,0.1);height:6px;border-radius:3px;overflow:hidden'>
-                                <div class='conf-fill' style='width:{d["Det_Confidence"]*100}%;height:100%;background:linear-gradient(90deg,#7c3aed,#a78bfa)'></div>
+                for det_id, label, det_conf, class_conf, source in zip(
+                    dets.ids + 1, dets.label_names, dets.scores, dets.label_scores, dets.sources
+                ):
+                    badge_class = "badge-car" if label == CAR else "badge-bike"
+                    st.markdown(f"""
+                        <div class='table-row'>
+                            <div style='color:#c7bfe8;font-weight:700'>#{det_id}</div>
+                            <div><span class='class-badge {badge_class}'>{label.title()}</span></div>
+                            <div>
+                                <div style='color:#c7bfe8;font-weight:600'>{det_conf:.1%}</div>
+                                <div class='conf-bar' style='width:100%;margin-top:4px;background:rgba(255,255,255,0.1);height:6px;border-radius:3px;overflow:hidden'>
+                                    <div class='conf-fill' style='width:{det_conf*100}%;height:100%;background:linear-gradient(90deg,#7c3aed,#a78bfa)'></div>
+                                </div>
                             </div>
-                        </div>
-                        <div>
-                            <div style='color:#b8aed4;font-weight:600'>{d['Classification Conf']}</div>
-                            <div class='conf-bar' style='width:100%;margin-top:4px;background:rgba(255,255,255,0.1);height:6px;border-radius:3px;overflow:hidden'>
-                                <div class='conf-fill' style='width:{d["Class_Confidence"]*100}%;height:100%;background:linear-gradient(90deg,#67c6f4,#9ed7f5)'></div>
+                            <div>
+                                <div style='color:#b8aed4;font-weight:600'>{class_conf:.1%}{" · YOLO" if pipeline.SOURCES[source] == "yolo" else ""}</div>
+                                <div class='conf-bar' style='width:100%;margin-top:4px;background:rgba(255,255,255,0.1);height:6px;border-radius:3px;overflow:hidden'>
+                                    <div class='conf-fill' style='width:{class_conf*100}%;height:100%;background:linear-gradient(90deg,#67c6f4,#9ed7f5)'></div>
+                                </div>
                             </div>
                         </div>
-                    </div>
-                """, unsafe_allow_html=True)
-            st.markdown("</div>", unsafe_allow_html=True)
+                    """, unsafe_allow_html=True)
+                st.markdown("</div>", unsafe_allow_html=True)
             
-            # Download CSV
-            try:
-                df = pd.DataFrame(dets)
-                csv = df.to_csv(index=False).encode('utf-8')
-                st.download_button("Download Laporan CSV", data=csv, file_name="vehicle_classification_results.csv", mime="text/csv", use_container_width=True)
-            except Exception:
-                pass
+                # Download CSV
+                export_csv = session_store.get(SESSION_ID, "export_csv")
+                if export_csv is not None:
+                    st.download_button("Download Laporan CSV", data=export_csv, file_name="vehicle_classification_results.csv", mime="text/csv", use_container_width=True)
             
-            # Navigation
-            col_l, col_r = st.columns([1,1])
-            with col_l:
-                if st.button("← Kembali", key="back_results"):
-                    go_prev()
-            with col_r:
-                if st.button("Mulai Baru", key="reset_results"):
-                    keys_to_clear = ["uploaded_image_pil", "uploaded_image_bytes", "result_image", "dets", "classifications", "process_time"]
-                    for k in keys_to_clear:
-                        if k in st.session_state:
-                            del st.session_state[k]
-                    st.rerun()
+                # Per-stage timing
+                if "trace" in st.session_state:
+                    with st.expander("Rincian Waktu per Tahap"):
+                        trace_dict = st.session_state["trace"]
+                        st.dataframe(
+                            pd.DataFrame([{
+                                "Tahap": "    " * sp["depth"] + sp["name"],
+                                "Mulai (ms)": sp["start_ms"],
+                                "Durasi (ms)": sp["duration_ms"],
+                                "Detail": ", ".join(f"{k}={v}" for k, v in sp["attrs"].items()),
+                            } for sp in trace_dict["spans"]]),
+                            hide_index=True,
+                            use_container_width=True
+                        )
+                        st.download_button("Download Trace (JSON)", data=json.dumps(trace_dict, indent=2), file_name="pipeline_trace.json", mime="application/json")
+                        if "profile" in st.session_state:
+                            profile = st.session_state["profile"]
+                            st.code(profile["summary"])
+                            profile_data = session_store.get(SESSION_ID, "profile")
+                            if profile_data is not None:
+                                st.download_button("Download Profil", data=profile_data, file_name=profile["filename"], mime="application/octet-stream")
+            
+                # Cache counters
+                cache_stats = result_cache.stats()
+                st.caption(
+                    f"Cache hasil: {cache_stats['hits']} hit memori · {cache_stats['disk_hits']} hit disk · "
+                    f"{cache_stats['misses']} miss · {cache_stats['entries']} entri "
+                    f"({cache_stats['bytes'] / 1024 / 1024:.1f} / {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB)"
+                )
+                if model_loader.ready() and model_loader.error() is None:
+                    detector = model_loader.get()
+                    classifier = detector.classifier
+                    sched_stats = get_scheduler(detector).stats()
+                    st.caption(
+                        f"Scheduler: antrean {sched_stats['queue_depth']} (maks {sched_stats['max_queue_depth']}) · "
+                        f"tunggu p50 {sched_stats['wait_p50_ms']:.0f} ms / p95 {sched_stats['wait_p95_ms']:.0f} ms · "
+                        f"rata-rata batch {sched_stats['mean_batch_size']:.1f}"
+                    )
+                    cascade_stats = pipeline.DEFAULT_CASCADE.stats()
+                    if pipeline.DEFAULT_CASCADE.enabled and cascade_stats["boxes"]:
+                        st.caption(
+                            f"Cascade: {cascade_stats['avoided_rate']:.0%} panggilan CNN dihindari "
+                            f"({cascade_stats['yolo']} label YOLO · {cascade_stats['drop']} kotak kecil di-drop · "
+                            f"{cascade_stats['cnn']} ke CNN)"
+                        )
+                    if hasattr(classifier, "stats"):
+                        memo_stats = classifier.stats()
+                        st.caption(
+                            f"Memo klasifikasi crop: {memo_stats['hit_rate']:.0%} hit rate "
+                            f"({memo_stats['hits']} hit / {memo_stats['misses']} miss) · "
+                            f"hemat ~{memo_stats['time_saved_s']:.2f}s"
+                        )
+            
+                # Navigation
+                col_l, col_r = st.columns([1,1])
+                with col_l:
+                    if st.button("← Kembali", key="back_results"):
+                        go_prev()
+                        st.rerun()
+                with col_r:
+                    if st.button("Mulai Baru", key="reset_results"):
+                        clear_results()
+                        st.rerun()
+
+        @st.fragment
+        def show_video_mode():
+            with timed_run("video"):
+                # Video mode
+                with st.expander("Mode Video (MP4)"):
+                    st.markdown("<p class='muted'>Proses video dari kamera jalan: frame diambil sesuai target FPS lalu dideteksi & diklasifikasi per batch</p>", unsafe_allow_html=True)
+                    uploaded_video = st.file_uploader("Pilih Video", type=["mp4", "avi", "mov"], key="video_upload", label_visibility="collapsed")
+                    col_fps, col_out = st.columns([1, 1])
+                    with col_fps:
+                        video_fps = st.number_input("Target FPS sampling", min_value=0.5, max_value=30.0, value=2.0, step=0.5)
+                    with col_out:
+                        video_annotate = st.checkbox("Buat video beranotasi", value=False)
+            
+                    if uploaded_video and st.button("Proses Video", use_container_width=True):
+                        with tempfile.TemporaryDirectory() as tmp:
+                            video_path = os.path.join(tmp, uploaded_video.name)
+                            with open(video_path, "wb") as f:
+                                f.write(uploaded_video.getvalue())
+                            records_path = os.path.join(tmp, "records.jsonl")
+                            output_path = os.path.join(tmp, "annotated.mp4") if video_annotate else None
+                    
+                            progress = st.progress(0.0, text="Memproses video...")
+                            def _on_frame(record, reader):
+                                if reader.frame_count:
+                                    progress.progress(min(record["frame"] / reader.frame_count, 1.0), text=f"Frame {record['frame']} / {reader.frame_count}")
+                    
+                            try:
+                                detector = get_detector()
+                                scheduler = get_scheduler(detector)
+                                # Frame diproses di thread sesi, tetapi setiap predict antre di kunci model scheduler
+                                stats = process_video(video_path, scheduler.guarded(detector.yolo_model), scheduler.guarded(detector.classifier), records_path, output_path, target_fps=video_fps, on_frame=_on_frame)
+                                progress.progress(1.0, text="Selesai")
+                                st.success(f"{stats['frames']} frame diproses, {stats['detections']} deteksi · {stats['fps']:.2f} frame/detik")
+                                with open(records_path, "rb") as f:
+                                    st.download_button("Download Deteksi per Frame (JSONL)", data=f.read(), file_name="video_detections.jsonl", mime="application/jsonl", use_container_width=True)
+                                if output_path:
+                                    with open(output_path, "rb") as f:
+                                        st.download_button("Download Video Beranotasi", data=f.read(), file_name="annotated.mp4", mime="video/mp4", use_container_width=True)
+                            except Exception as e:
+                                st.error(f"Error: {str(e)}")
+
+        @st.fragment
+        def show_feedback():
+            with timed_run("feedback"):
+                # Feedback section
+                st.markdown("<div class='card' style='margin-top:32px'>", unsafe_allow_html=True)
+                st.markdown("<h3>Feedback & Rating</h3>", unsafe_allow_html=True)
+                st.markdown("<p class='muted'>Bantu kami meningkatkan sistem dengan memberikan feedback Anda</p>", unsafe_allow_html=True)
         
-        # Feedback section
-        st.markdown("<div class='card' style='margin-top:32px'>", unsafe_allow_html=True)
-        st.markdown("<h3>Feedback & Rating</h3>", unsafe_allow_html=True)
-        st.markdown("<p class='muted'>Bantu kami meningkatkan sistem dengan memberikan feedback Anda</p>", unsafe_allow_html=True)
+                feedback = st.text_area("Tulis feedback Anda", placeholder="Bagikan pengalaman, saran, atau kritik Anda tentang aplikasi ini...", label_visibility="collapsed", height=100)
         
-        feedback = st.text_area("Tulis feedback Anda", placeholder="Bagikan pengalaman, saran, atau kritik Anda tentang aplikasi ini...", label_visibility="collapsed", height=100)
+                col_rate, col_submit = st.columns([2,1])
+                with col_rate:
+                    rating = st.select_slider("Rating Aplikasi", options=[1,2,3,4,5], value=5)
+                with col_submit:
+                    st.markdown("<div style='height:8px'></div>", unsafe_allow_html=True)
+                    if st.button("Kirim Feedback", use_container_width=True):
+                        if feedback:
+                            st.success("Terima kasih atas feedback Anda!")
+                        else:
+                            st.warning("Mohon tulis feedback terlebih dahulu")
         
-        col_rate, col_submit = st.columns([2,1])
-        with col_rate:
-            rating = st.select_slider("Rating Aplikasi", options=[1,2,3,4,5], value=5)
-        with col_submit:
-            st.markdown("<div style='height:8px'></div>", unsafe_allow_html=True)
-            if st.button("Kirim Feedback", use_container_width=True):
-                if feedback:
-                    st.success("Terima kasih atas feedback Anda!")
-                else:
-                    st.warning("Mohon tulis feedback terlebih dahulu")
+                st.markdown("</div>", unsafe_allow_html=True)
         
-        st.markdown("</div>", unsafe_allow_html=True)
+        if "dets" in st.session_state and session_store.get(SESSION_ID, "result") is not None:
+            st.markdown("</div>", unsafe_allow_html=True)
+            show_result_image()
+            show_statistics()
+            show_details()
+        
+        # Session memory diagnostics
+        with st.expander("Memori Sesi"):
+            store_stats = session_store.stats()
+            own = session_store.session_stats(SESSION_ID)
+            state_sizes = {k: estimate_size(v) for k, v in st.session_state.items()}
+            st.caption(
+                f"Store semua sesi: {store_stats['bytes'] / 1024 / 1024:.1f} / "
+                f"{store_stats['max_total_bytes'] / 1024 / 1024:.0f} MB · {store_stats['sessions']} sesi · "
+                f"TTL {store_stats['ttl_seconds'] / 60:.0f} menit · eviksi TTL {store_stats['evictions']['ttl']}, "
+                f"batas sesi {store_stats['evictions']['session_budget']}, "
+                f"batas global {store_stats['evictions']['global_budget']}"
+            )
+            st.caption(
+                f"Sesi ini: store {own['bytes'] / 1024:.0f} / {store_stats['max_session_bytes'] / 1024 / 1024:.0f} MB, "
+                f"session_state ~{sum(state_sizes.values()) / 1024:.0f} KB"
+            )
+            rerun_timings = st.session_state.get("rerun_timings", {})
+            if rerun_timings:
+                # Rerun terakhir per cakupan: "app" = seluruh skrip, lainnya = fragment sendiri
+                st.caption("Rerun terakhir: " + " · ".join(
+                    f"{scope} {t['ms']:.0f} ms ({t['media_bytes'] / 1024:.0f} KB gambar)" for scope, t in rerun_timings.items()
+                ))
+            st.dataframe(
+                pd.DataFrame(
+                    [{"Lokasi": "store", "Kunci": k, "KB": round(v / 1024, 1)} for k, v in own["entries"].items()]
+                    + [{"Lokasi": "session_state", "Kunci": k, "KB": round(v / 1024, 1)} for k, v in state_sizes.items()]
+                ),
+                hide_index=True,
+                use_container_width=True
+            )
+        
+        show_video_mode()
+        show_feedback()
         
         col1, col2, col3 = st.columns([1,1,1])
         with col1:
@@ -1170,7 +1484,7 @@ elif st.session_state.page == 3:
                 go_prev()
         with col3:
             if st.button("Mulai Baru"):
-                for key in ["uploaded_image_pil", "uploaded_image_bytes", "result_image", "dets", "classifications", "process_time"]:
-                    if key in st.session_state:
-                        del st.session_state[key]
+                clear_results()
                 st.rerun()
+
+_record_run(_RUN_STACK[0])
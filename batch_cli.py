@@ -0,0 +1,216 @@
+"""Headless batch detection over image directories.
+
+Runs the same YOLO + classifier pipeline as the app over a directory or
+glob, sharded across worker processes that each load the models once:
+
+    python batch_cli.py sample_images --workers 4 --out runs/batch
+
+Writes one typed record per detection (see export.SCHEMA) to
+<out>/detections.<format> (csv, jsonl, parquet or arrow) as results come
+in, and annotated images to <out>/annotated/, then prints images/sec and
+per-stage time. Images are named by their path relative to the common
+directory of the inputs; annotated copies are JPEGs with the extension
+replaced ("Bike (8)_png.jpg" only when "Bike (8).jpg" also exists).
+With --no-annotated nothing is rendered.
+
+Each worker gets cpu_count // workers threads. The OMP/MKL/OpenBLAS
+variables are set in the environment the workers are spawned with, so
+they are in place before a worker imports numpy or cv2; OpenCV and torch
+are limited again after import, since they read their own settings.
+--standin runs the CPU-bound stand-in models, to compare worker counts
+without weights.
+"""
+import argparse
+import contextlib
+import multiprocessing as mp
+import os
+import time
+from collections import Counter
+
+import cv2
+
+import config
+import pipeline
+from engine import VehicleDetector
+from export import EXTENSIONS, STAGES, WRITERS, open_writer
+from pipeline import PROFILES, profile_params
+from preprocess import list_images
+
+_worker = {}
+_THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def _relative(path, base):
+    # Path relatif ke akar input: file bernama sama di direktori berbeda tidak bertabrakan
+    return os.path.relpath(os.path.abspath(path), base) if base else os.path.basename(path)
+
+
+@contextlib.contextmanager
+def _thread_env(threads):
+    # Worker spawn mewarisi environment saat dibuat, sebelum ia meng-import numpy/cv2;
+    # setelah import, variabel ini tidak dibaca lagi
+    saved = {var: os.environ.get(var) for var in _THREAD_VARS}
+    os.environ.update({var: str(threads) for var in _THREAD_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _annotated_name(relative, collisions):
+    # "Bike (8).jpg" -> "Bike (8).jpg"; bila "Bike (8).png" juga ada, ekstensi asli jadi bagian nama
+    stem, ext = os.path.splitext(relative)
+    return (f"{stem}_{ext[1:]}" if stem in collisions else stem) + ".jpg"
+
+
+def _init_worker(threads_per_worker, params, annotated_dir, base, standin=None, collisions=frozenset()):
+    # OpenCV dan torch punya pool thread sendiri yang tidak membaca OMP_NUM_THREADS lagi setelah import
+    if config.CLASSIFIER_NUM_THREADS is None:
+        config.CLASSIFIER_NUM_THREADS = threads_per_worker
+
+    cv2.setNumThreads(threads_per_worker)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    if standin is not None:
+        from standins import load_standin_models
+        models = load_standin_models(*standin, cpu_bound=True)
+    else:
+        models = pipeline.load_models()
+    _worker["detector"] = VehicleDetector(*models, **(params or {}))
+    _worker["annotated_dir"] = annotated_dir
+    _worker["base"] = base
+    _worker["collisions"] = collisions
+
+
+def _process(path):
+    detector = _worker["detector"]
+    timings = {}
+    start = time.perf_counter()
+    try:
+        decoded = detector.decode(path)
+        timings["decode"] = time.perf_counter() - start
+        detections = detector.detect(decoded, timings=timings)
+    except Exception as e:
+        return path, None, timings, time.perf_counter() - start, str(e)
+
+    # Tanpa output anotasi tidak ada render
+    if _worker["annotated_dir"]:
+        render_start = time.perf_counter()
+        img = detector.render(decoded, detections)
+        timings["render"] = time.perf_counter() - render_start
+        name = _annotated_name(_relative(path, _worker["base"]), _worker["collisions"])
+        out_path = os.path.join(_worker["annotated_dir"], name)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        img.convert("RGB").save(out_path, quality=90)
+    return path, detections, timings, time.perf_counter() - start, None
+
+
+def run_batch(paths, out_dir, workers=1, params=None, save_annotated=True, export_format="csv", standin=None):
+    """Process `paths` across `workers` processes; returns a summary dict.
+
+    `standin`, if given, is (call_ms, item_ms) for CPU-bound stand-in models.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    annotated_dir = os.path.join(out_dir, "annotated") if save_annotated else None
+    if annotated_dir:
+        os.makedirs(annotated_dir, exist_ok=True)
+
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else None
+    stems = Counter(os.path.splitext(_relative(p, base))[0] for p in set(paths))
+    collisions = frozenset(stem for stem, n in stems.items() if n > 1)
+    stage_totals = dict.fromkeys(STAGES, 0.0)
+    n_images = n_dets = 0
+    failures = []
+
+    ctx = mp.get_context("spawn")
+    start = time.perf_counter()
+    ready = None
+    extension = next(ext for ext, fmt in EXTENSIONS.items() if fmt == export_format)
+    export_path = os.path.join(out_dir, "detections" + extension)
+    with open_writer(export_path, export_format) as writer, _thread_env(threads_per_worker), \
+            ctx.Pool(workers, _init_worker, (threads_per_worker, params, annotated_dir, base, standin,
+                                                         collisions)) as pool:
+        for path, detections, timings, seconds, error in pool.imap_unordered(_process, paths, chunksize=1):
+            if ready is None:
+                # Throughput dihitung setelah model termuat (tanpa waktu startup worker)
+                ready = time.perf_counter() - seconds
+            if error:
+                failures.append((path, error))
+                continue
+            n_images += 1
+            n_dets += len(detections)
+            for stage, stage_s in timings.items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + stage_s
+            # Ditulis saat hasil datang; memori hanya sebesar satu row group
+            writer.write(_relative(path, base), detections, timings)
+    end = time.perf_counter()
+    busy = end - (ready or start)
+
+    return {
+        "images": n_images,
+        "detections": n_dets,
+        "failures": failures,
+        "export_path": export_path,
+        "workers": workers,
+        "threads_per_worker": threads_per_worker,
+        "elapsed_s": end - start,
+        "startup_s": (ready or end) - start,
+        "images_per_s": n_images / busy if busy else 0.0,
+        "stage_ms_per_image": {k: v / n_images * 1000 if n_images else 0.0 for k, v in stage_totals.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch car/bike detection over image files")
+    parser.add_argument("source", help="directory or glob, e.g. sample_images/ or 'snapshots/*.jpg'")
+    parser.add_argument("--out", default="runs/batch", help="output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=config.DETECT_PROFILE,
+                        help="inference profile; --imgsz/--conf/--max-det override its values")
+    parser.add_argument("--imgsz", type=int)
+    parser.add_argument("--conf", type=float)
+    parser.add_argument("--max-det", type=int)
+    parser.add_argument("--tiled", action="store_true", help="detect on overlapping tiles (large images)")
+    parser.add_argument("--no-annotated", action="store_true", help="skip writing annotated images")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv",
+                        help="detection export format (parquet/arrow need pyarrow)")
+    parser.add_argument("--repeat", type=int, default=1, help="repeat the image list to get a longer run")
+    parser.add_argument("--standin", action="store_true", help="use CPU-bound deterministic stand-in models")
+    parser.add_argument("--standin-call-ms", type=float, default=20.0)
+    parser.add_argument("--standin-item-ms", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    paths = list_images(args.source) * args.repeat
+    if not paths:
+        parser.error(f"no images found in {args.source!r}")
+    workers = max(1, min(args.workers, len(paths)))
+    params = profile_params(args.profile)
+    params.update({k: v for k, v in (("imgsz", args.imgsz), ("conf", args.conf), ("max_det", args.max_det))
+                   if v is not None}, tiled=args.tiled)
+
+    standin = (args.standin_call_ms, args.standin_item_ms) if args.standin else None
+    summary = run_batch(paths, args.out, workers, params, not args.no_annotated, args.format, standin)
+
+    print(f"{summary['images']} images, {summary['detections']} detections, {workers} workers "
+          f"x {summary['threads_per_worker']} threads")
+    print(f"{summary['elapsed_s']:.1f}s total ({summary['startup_s']:.1f}s model startup), "
+          f"{summary['images_per_s']:.2f} images/sec")
+    print("per-stage time (ms/image):")
+    for stage, ms in summary["stage_ms_per_image"].items():
+        print(f"  {stage:9s} {ms:8.1f}")
+    for path, error in summary["failures"]:
+        print(f"FAILED {path}: {error}")
+    return 1 if summary["failures"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+"""Dynamic micro-batching for concurrent inference requests.
+
+Callers submit single items from any thread and get a Future back. A worker
+thread collects items until the batch is full or the oldest item has
+waited `max_wait_ms`, then processes them with one call to
+`process_batch(items) -> results`. A result may be an ItemError to fail
+just that item's Future; an exception raised by `process_batch` fails the
+whole batch.
+
+With `workers > 1` several threads drain the same queue, so only use that
+with a thread-safe `process_batch`.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+class ItemError:
+    """Result placeholder that makes the batcher fail one item's Future with `error`."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class MicroBatcher:
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=10.0, name="micro-batcher", workers=1):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self._waits = deque(maxlen=2048)  # detik antrean per item (terbaru)
+        self._threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+                         for i in range(max(1, int(workers)))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Submit `item` and wait for its result."""
+        return self.submit(item).result(timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            waits = np.array(self._waits) * 1000
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "busy_s": self.busy_seconds,
+                "queue_depth": self.queue_depth(),
+                "max_queue_depth": self.max_queue_depth,
+                "wait_p50_ms": float(np.percentile(waits, 50)) if len(waits) else 0.0,
+                "wait_p95_ms": float(np.percentile(waits, 95)) if len(waits) else 0.0,
+            }
+
+    def close(self):
+        self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.put(_STOP)  # untuk worker lain
+                return
+            batch = self._collect(first)
+            # Future yang sudah di-cancel tidak ikut diproses
+            live = [(item, f) for item, f, _ in batch if f.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            items = [item for item, _ in live]
+            futures = [f for _, f in live]
+
+            start = time.perf_counter()
+            with self._lock:
+                self._waits.extend(start - submitted for _, _, submitted in batch)
+            try:
+                results = self.process_batch(items)
+            except Exception as e:
+                for f in futures:
+                    f.set_exception(e)
+            else:
+                for f, result in zip(futures, results):
+                    if isinstance(result, ItemError):
+                        f.set_exception(result.error)
+                    else:
+                        f.set_result(result)
+            with self._lock:
+                self.batches += 1
+                self.items += len(items)
+                self.busy_seconds += time.perf_counter() - start
@@ -0,0 +1,320 @@
+"""Reproducible latency/throughput benchmark of the detect -> crop -> classify path.
+
+Runs pipeline.detect_and_classify over every image in sample_images/ (sorted,
+after an untimed warm-up pass) and reports p50/p95/p99 latency, throughput,
+peak RSS, per-stage time and a breakdown by image resolution and detection
+count:
+
+    python benchmark.py --out runs/bench.json
+    python benchmark.py --standin --repeats 5 --out runs/bench.json
+    python benchmark.py --standin --repeats 5 --save-baseline
+
+--standin uses the deterministic stand-in models, so CI machines without
+weights can still track the pipeline's own overhead (decode, crop, resize,
+render). Results are JSON. Every run is compared against the stored
+baseline for its model kind (BASELINES: benchmarks/baseline-standin.json
+for --standin, benchmarks/baseline.json for the real weights; override
+with --baseline, skip with --no-compare) and exits non-zero on
+regressions beyond --tolerance; --save-baseline writes the current run as
+the new baseline. The committed stand-in baseline was recorded on a
+1-CPU machine with zero simulated model cost, so it tracks the pipeline's
+own overhead; re-record it on the CI machine before relying on it.
+
+--profile benchmarks one inference profile (pipeline.PROFILES);
+--all-profiles runs each of them and prints a side-by-side summary.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+import config
+import pipeline
+from pipeline import DETECT_PARAMS, PROFILES, profile_params
+from preprocess import list_images, probe_image
+
+STAGES = ("decode", "detect", "crop", "classify", "render")
+# Batas bucket: sisi terpanjang gambar (px) dan jumlah deteksi per gambar
+RESOLUTION_BUCKETS = ((640, "<=640"), (1280, "641-1280"), (1920, "1281-1920"), (None, ">1920"))
+DETECTION_BUCKETS = ((0, "0"), (2, "1-2"), (5, "3-5"), (None, "6+"))
+# Baseline default per jenis model (relatif ke file ini)
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+BASELINES = {"standin": os.path.join(BASELINE_DIR, "baseline-standin.json"),
+             "models": os.path.join(BASELINE_DIR, "baseline.json")}
+# Metrik yang dibandingkan dengan baseline: True = lebih tinggi lebih buruk
+COMPARED_METRICS = {"p50_ms": True, "p95_ms": True, "p99_ms": True, "images_per_s": False, "peak_rss_mb": True}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: kilobyte di Linux, byte di macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _bucket(value, buckets):
+    for limit, label in buckets:
+        if limit is None or value <= limit:
+            return label
+
+
+def _latency_summary(latencies_ms):
+    lat = np.asarray(latencies_ms, dtype=np.float64)
+    if not len(lat):
+        return {"runs": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    return {
+        "runs": int(len(lat)),
+        "mean_ms": float(lat.mean()),
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+def _load_models(standin, call_ms=0.0, item_ms=0.0):
+    if standin:
+        from standins import load_standin_models
+        return load_standin_models(call_ms=call_ms, item_ms=item_ms)
+    from classifier import load_classifier
+    from detector import load_detector
+    # Tanpa memo: gambar yang diulang tidak boleh mengenai cache hasil klasifikasi
+    return load_detector(warmup=True), load_classifier(memo_capacity=0, warmup=True)
+
+
+def run_benchmark(models, paths, params=None, repeats=3, warmup=True):
+    """Time the full pipeline `repeats` times per image; returns a JSON-serialisable dict.
+
+    Images are read into memory first so disk I/O is not measured; decoding
+    is, as the "decode" stage.
+    """
+    yolo_model, classifier = models
+    params = {**DETECT_PARAMS, **(params or {})}
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        width, height, _ = probe_image(data)
+        payloads.append((os.path.basename(path), data, width, height))
+
+    if warmup:
+        for _, data, _, _ in payloads:
+            pipeline.detect_and_classify(data, yolo_model, classifier, params)
+
+    runs = []
+    stage_totals = dict.fromkeys(STAGES, 0.0)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for name, data, width, height in payloads:
+            timings = {}
+            t0 = time.perf_counter()
+            detections, _ = pipeline.detect_and_classify(data, yolo_model, classifier, params, timings)
+            runs.append({
+                "image": name,
+                "width": width,
+                "height": height,
+                "detections": len(detections),
+                "latency_ms": (time.perf_counter() - t0) * 1000,
+            })
+            for stage, seconds in timings.items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+    elapsed = time.perf_counter() - start
+
+    def breakdown(key):
+        groups = {}
+        for run in runs:
+            groups.setdefault(key(run), []).append(run["latency_ms"])
+        return {label: _latency_summary(lat) for label, lat in groups.items()}
+
+    per_image = {}
+    for run in runs:
+        entry = per_image.setdefault(run["image"], {"width": run["width"], "height": run["height"],
+                                                    "detections": run["detections"], "latencies": []})
+        entry["latencies"].append(run["latency_ms"])
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "models": {"detector": getattr(yolo_model, "backend", type(yolo_model).__name__),
+                   "classifier": getattr(classifier, "name", type(classifier).__name__)},
+        "params": params,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "machine": platform.machine(), "cpu_count": os.cpu_count()},
+        "images": len(payloads),
+        "repeats": repeats,
+        "elapsed_s": elapsed,
+        "images_per_s": len(runs) / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        **_latency_summary([run["latency_ms"] for run in runs]),
+        "stage_ms_per_image": {k: v / len(runs) * 1000 if runs else 0.0 for k, v in stage_totals.items()},
+        "by_resolution": breakdown(lambda r: _bucket(max(r["width"], r["height"]), RESOLUTION_BUCKETS)),
+        "by_detections": breakdown(lambda r: _bucket(r["detections"], DETECTION_BUCKETS)),
+        "per_image": {name: {"width": e["width"], "height": e["height"], "detections": e["detections"],
+                             **_latency_summary(e["latencies"])} for name, e in per_image.items()},
+    }
+
+
+def measure_profiles(detect, paths, profiles=None, repeats=1):
+    """p50/mean latency (ms) per profile of `detect(image_bytes, params)` over `paths`.
+
+    `detect` is any callable running the full pipeline, e.g.
+    InferenceScheduler.detect in the app, so the models stay single-threaded.
+    """
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            payloads.append(f.read())
+    report = {}
+    for name in profiles or PROFILES:
+        params = profile_params(name)
+        detect(payloads[0], params)  # warm-up per imgsz
+        latencies = []
+        for _ in range(repeats):
+            for data in payloads:
+                start = time.perf_counter()
+                detect(data, params)
+                latencies.append((time.perf_counter() - start) * 1000)
+        summary = _latency_summary(latencies)
+        report[name] = {"p50_ms": summary["p50_ms"], "mean_ms": summary["mean_ms"]}
+    return report
+
+
+def compare_to_baseline(result, baseline, tolerance=0.10):
+    """Compare headline metrics; returns a list of rows with a `regressed` flag.
+
+    A metric regresses when it is worse than the baseline by more than
+    `tolerance` (relative). Metrics missing from either side are skipped.
+    """
+    rows = []
+    for metric, higher_is_worse in COMPARED_METRICS.items():
+        current, previous = result.get(metric), baseline.get(metric)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        worse = change if higher_is_worse else -change
+        rows.append({"metric": metric, "baseline": previous, "current": current, "change": change,
+                     "regressed": worse > tolerance})
+    return rows
+
+
+def _print_summary(result):
+    print(f"{result['images']} images x {result['repeats']} repeats "
+          f"({result['models']['detector']} detector, {result['models']['classifier']} classifier)")
+    print(f"latency ms: p50 {result['p50_ms']:.1f}  p95 {result['p95_ms']:.1f}  p99 {result['p99_ms']:.1f}  "
+          f"mean {result['mean_ms']:.1f}")
+    rss = result["peak_rss_mb"]
+    print(f"throughput: {result['images_per_s']:.2f} images/sec, peak RSS "
+          + (f"{rss:.0f} MB" if rss is not None else "n/a"))
+    print("per-stage time (ms/image):")
+    for stage, ms in result["stage_ms_per_image"].items():
+        print(f"  {stage:9s} {ms:8.1f}")
+    for title, key, buckets in (("longest side (px)", "by_resolution", RESOLUTION_BUCKETS),
+                                ("detections", "by_detections", DETECTION_BUCKETS)):
+        print(f"by {title}:")
+        for label in (label for _, label in buckets if label in result[key]):
+            row = result[key][label]
+            print(f"  {label:10s} runs {row['runs']:4d}  p50 {row['p50_ms']:8.1f}  p95 {row['p95_ms']:8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the car/bike pipeline on sample images")
+    parser.add_argument("source", nargs="?", default="sample_images", help="directory or glob of images")
+    parser.add_argument("--standin", action="store_true", help="use deterministic stand-in models")
+    parser.add_argument("--standin-call-ms", type=float, default=0.0, help="simulated stand-in cost per call")
+    parser.add_argument("--standin-item-ms", type=float, default=0.0, help="simulated stand-in cost per image")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=config.DETECT_PROFILE,
+                        help="inference profile; --imgsz/--conf/--max-det override its values")
+    parser.add_argument("--all-profiles", action="store_true", help="benchmark every profile and compare them")
+    parser.add_argument("--imgsz", type=int)
+    parser.add_argument("--conf", type=float)
+    parser.add_argument("--max-det", type=int)
+    parser.add_argument("--threads", type=int, default=None, help="limit torch/OpenMP/classifier threads")
+    parser.add_argument("--out", help="write the result JSON here")
+    parser.add_argument("--baseline", help="baseline JSON to compare against (default: BASELINES for the model kind)")
+    parser.add_argument("--no-compare", action="store_true", help="do not compare against a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression (0.10 = 10%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    args = parser.parse_args(argv)
+
+    paths = list_images(args.source)
+    if not paths:
+        parser.error(f"no images found in {args.source!r}")
+    if args.all_profiles and (args.baseline or args.save_baseline):
+        parser.error("--baseline compares a single profile, drop --all-profiles")
+    baseline_path = args.baseline or BASELINES["standin" if args.standin else "models"]
+
+    if args.threads:
+        # Samakan jumlah thread antar mesin agar hasil bisa dibandingkan
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[var] = str(args.threads)
+        config.CLASSIFIER_NUM_THREADS = args.threads
+        import cv2
+        cv2.setNumThreads(args.threads)
+        try:
+            import torch
+            torch.set_num_threads(args.threads)
+        except ImportError:
+            pass
+
+    models = _load_models(args.standin, args.standin_call_ms, args.standin_item_ms)
+    overrides = {k: v for k, v in (("imgsz", args.imgsz), ("conf", args.conf), ("max_det", args.max_det))
+                 if v is not None}
+    if args.all_profiles:
+        results = {}
+        for name in PROFILES:
+            results[name] = run_benchmark(models, paths, {**profile_params(name), **overrides}, args.repeats)
+        print(f"{'profile':10s} {'imgsz':>6s} {'p50 ms':>8s} {'p95 ms':>8s} {'images/s':>9s}")
+        for name, result in results.items():
+            print(f"{name:10s} {str(result['params']['imgsz']):>6s} {result['p50_ms']:8.1f} {result['p95_ms']:8.1f} "
+                  f"{result['images_per_s']:9.2f}")
+        if args.out:
+            os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"profiles": results}, f, indent=2)
+        return 0
+
+    params = {**profile_params(args.profile), **overrides}
+    result = run_benchmark(models, paths, params, args.repeats)
+    result["threads"] = args.threads
+    _print_summary(result)
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    status = 0
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path) or ".", exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved baseline to {baseline_path}")
+    elif args.no_compare or args.all_profiles:
+        pass
+    elif not os.path.exists(baseline_path):
+        if args.baseline:
+            parser.error(f"baseline {baseline_path!r} not found")
+        print(f"no baseline at {baseline_path}; record one with --save-baseline")
+    else:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("models") != result["models"] or baseline.get("params") != result["params"]:
+            print("warning: baseline was recorded with different models or parameters")
+        print(f"vs baseline {baseline_path} (tolerance {args.tolerance:.0%}):")
+        for row in compare_to_baseline(result, baseline, args.tolerance):
+            flag = "REGRESSION" if row["regressed"] else "ok"
+            print(f"  {row['metric']:13s} {row['baseline']:10.2f} -> {row['current']:10.2f} "
+                  f"({row['change']:+.1%}) {flag}")
+            status = 1 if row["regressed"] else status
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
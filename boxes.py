@@ -0,0 +1,29 @@
+"""NumPy-backed boxes shaped like ultralytics `Results.boxes`.
+
+Code that reads detector output only uses `boxes.xyxy`, `boxes.conf` and
+`boxes.cls` through `.cpu().numpy()`, plus `len(boxes)`. ArrayBoxes gives
+the same interface over plain arrays, for results that are not produced by
+ultralytics (the stand-in detector, merged tiled detections).
+"""
+
+
+class _Array:
+    # Meniru tensor torch: .cpu().numpy()
+    def __init__(self, data):
+        self._data = data
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._data
+
+
+class ArrayBoxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = _Array(xyxy)
+        self.conf = _Array(conf)
+        self.cls = _Array(cls)
+
+    def __len__(self):
+        return len(self.conf.numpy())
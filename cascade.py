@@ -0,0 +1,159 @@
+"""Cascade policy deciding which detections actually need the CNN classifier.
+
+YOLO already predicts a class per box. When that class maps cleanly onto
+car/bike and YOLO is confident, running the 128x128 CNN on the crop adds
+latency without adding information, so the cascade takes YOLO's label.
+Ambiguous classes (anything not in the class map) always go to the CNN.
+Boxes below a minimum area (in original-image pixels) are too small for
+the CNN to judge; they are either dropped or still classified, depending
+on the small-box policy. The cascade is off by default
+(CASCADE_SKIP_CONF=0) until YOLO/CNN agreement has been measured with
+the real models.
+
+Every row records its path in "Label Source" ("cnn" or "yolo"). Measure
+how many classifier calls the policy avoids, and how often YOLO's label
+agrees with the CNN on the skipped boxes, with
+
+    python cascade.py sample_images --standin
+"""
+import argparse
+import threading
+
+import numpy as np
+
+import config
+from classifier import BIKE, CAR
+from preprocess import list_images
+
+ROUTE_CNN, ROUTE_YOLO, ROUTE_DROP = "cnn", "yolo", "drop"
+SMALL_BOX_POLICIES = ("classify", "drop")
+# Kelas YOLO yang setara dengan label classifier; kelas lain selalu ke CNN
+DEFAULT_CLASS_MAP = {"car": CAR, "motorcycle": BIKE, "motorbike": BIKE, "bike": BIKE}
+
+
+class CascadePolicy:
+    def __init__(self, skip_conf=None, min_area=None, small_boxes=None, class_map=None):
+        self.skip_conf = config.CASCADE_SKIP_CONF if skip_conf is None else skip_conf
+        self.min_area = config.CASCADE_MIN_AREA if min_area is None else min_area
+        self.small_boxes = small_boxes or config.CASCADE_SMALL_BOXES
+        if self.small_boxes not in SMALL_BOX_POLICIES:
+            raise ValueError(f"Unknown small-box policy {self.small_boxes!r}, expected one of {SMALL_BOX_POLICIES}")
+        self.class_map = DEFAULT_CLASS_MAP if class_map is None else class_map
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys((ROUTE_CNN, ROUTE_YOLO, ROUTE_DROP), 0)
+
+    @property
+    def enabled(self):
+        return bool(self.skip_conf) or (self.min_area > 0 and self.small_boxes == "drop")
+
+    def describe(self):
+        """Settings that change the output (part of result-cache keys)."""
+        return {"skip_conf": self.skip_conf, "min_area": self.min_area, "small_boxes": self.small_boxes}
+
+    def yolo_label(self, name):
+        return self.class_map.get(str(name).lower())
+
+    def route(self, boxes, scores, classes, names, scale=(1.0, 1.0)):
+        """Per-box route: ROUTE_CNN, ROUTE_YOLO or ROUTE_DROP.
+
+        `boxes` are in the pixels the crops are cut from and `scale` is
+        (sx, sy) original pixels per such pixel (DecodedImage.scale), so
+        `min_area` is in original-image pixels and an image is routed the
+        same whatever scale it was decoded at.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        routes = np.full(len(boxes), ROUTE_CNN, dtype=object)
+        if self.skip_conf:
+            mapped = np.array([self.yolo_label(names.get(int(c), c)) is not None for c in classes], dtype=bool)
+            routes[mapped & (np.asarray(scores) >= self.skip_conf)] = ROUTE_YOLO
+        if self.min_area > 0 and self.small_boxes == "drop":
+            area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]) * scale[0] * scale[1]
+            routes[area < self.min_area] = ROUTE_DROP
+        with self._lock:
+            for key in self.counts:
+                self.counts[key] += int((routes == key).sum())
+        return routes
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.counts.values())
+            avoided = self.counts[ROUTE_YOLO] + self.counts[ROUTE_DROP]
+            return {**self.counts, "boxes": total, "avoided_rate": avoided / total if total else 0.0}
+
+
+def cascade_report(yolo_model, classifier, paths, policy, params=None):
+    """Classifier calls avoided by `policy` and its agreement with the CNN.
+
+    Every box is classified by the CNN (reference), then routed. `agreement`
+    is the share of YOLO-labelled boxes whose label matches the CNN's.
+    """
+    from classifier import classify_crops
+    from pipeline import DETECT_PARAMS
+    from preprocess import crop_views, decode_scaled
+
+    params = {**DETECT_PARAMS, **(params or {})}
+    detect_params = {k: v for k, v in params.items() if k not in ("tiled", "classifier_batch")}
+    if detect_params["imgsz"] == "auto":
+        detect_params["imgsz"] = config.DETECTOR_IMGSZ
+    routes_total = dict.fromkeys((ROUTE_CNN, ROUTE_YOLO, ROUTE_DROP), 0)
+    agree = compared = 0
+    for path in paths:
+        decoded = decode_scaled(path, detect_params["imgsz"])
+        image = decoded.array
+        r = yolo_model.predict(image, **detect_params)[0]
+        if r.boxes is None or len(r.boxes) == 0:
+            continue
+        boxes = r.boxes.xyxy.cpu().numpy()
+        scores = r.boxes.conf.cpu().numpy()
+        classes = r.boxes.cls.cpu().numpy().astype(int)
+        cnn_labels = [label for label, _ in classify_crops(crop_views(image, boxes), classifier)]
+        routes = policy.route(boxes, scores, classes, r.names, decoded.scale)
+        for route, c, cnn_label in zip(routes, classes, cnn_labels):
+            routes_total[route] += 1
+            if route == ROUTE_YOLO:
+                compared += 1
+                agree += policy.yolo_label(r.names.get(int(c), c)) == cnn_label
+    total = sum(routes_total.values())
+    return {
+        "boxes": total,
+        **routes_total,
+        "avoided_rate": (routes_total[ROUTE_YOLO] + routes_total[ROUTE_DROP]) / total if total else 0.0,
+        "agreement": agree / compared if compared else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the classifier cascade on a directory of images")
+    parser.add_argument("source", help="directory or glob of images")
+    parser.add_argument("--standin", action="store_true", help="use deterministic stand-in models")
+    parser.add_argument("--skip-conf", type=float, nargs="+", default=None,
+                        help="YOLO confidence thresholds to compare "
+                             "(default: CASCADE_SKIP_CONF, or 0.8-0.95 while the cascade is off)")
+    parser.add_argument("--min-area", type=float, default=None, help="minimum box area in original px^2")
+    parser.add_argument("--small-boxes", choices=SMALL_BOX_POLICIES, default=None)
+    args = parser.parse_args(argv)
+
+    paths = list_images(args.source)
+    if not paths:
+        parser.error(f"no images found in {args.source!r}")
+    if args.standin:
+        from standins import load_standin_models
+        yolo_model, classifier = load_standin_models()
+    else:
+        from classifier import load_classifier
+        from detector import load_detector
+        yolo_model, classifier = load_detector(), load_classifier(memo_capacity=0)
+
+    print(f"{'skip conf':>9s} {'boxes':>6s} {'cnn':>5s} {'yolo':>5s} {'drop':>5s} {'avoided':>8s} {'agreement':>9s}")
+    thresholds = args.skip_conf or ([config.CASCADE_SKIP_CONF] if config.CASCADE_SKIP_CONF else [0.8, 0.85, 0.9, 0.95])
+    for skip_conf in thresholds:
+        policy = CascadePolicy(skip_conf, args.min_area, args.small_boxes)
+        row = cascade_report(yolo_model, classifier, paths, policy)
+        agreement = f"{row['agreement']:9.0%}" if row["agreement"] is not None else f"{'-':>9s}"
+        print(f"{skip_conf:9.2f} {row['boxes']:6d} {row[ROUTE_CNN]:5d} {row[ROUTE_YOLO]:5d} {row[ROUTE_DROP]:5d} "
+              f"{row['avoided_rate']:8.0%} {agreement}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
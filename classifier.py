@@ -0,0 +1,601 @@
+"""Car/bike CNN classifier behind interchangeable runtime backends.
+
+The same 128x128 sigmoid model can run through Keras (.h5), a converted
+TFLite interpreter (.tflite), an int8-quantized TFLite model or ONNX
+Runtime (.onnx). Pick one with the CLASSIFIER_BACKEND setting in config.py.
+To create the converted files and verify them against the .h5 model:
+
+    python classifier.py convert
+    python classifier.py parity sample_images
+
+The int8 model is post-training quantized with a representative dataset of
+vehicle crops from local images, and is not bit-exact, so it is checked
+with a label-agreement / confidence-drift / latency comparison instead:
+
+    python classifier.py convert --formats tflite-int8 --calibration sample_images
+    python classifier.py compare sample_images --candidate tflite-int8
+"""
+import argparse
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import config
+from preprocess import CROP_SIZE, crop_views, list_images, normalize_batch, resize_batch
+from tracing import maybe_span
+
+logger = logging.getLogger(__name__)
+
+INPUT_SIZE = CROP_SIZE
+CAR, BIKE = "car", "bike"
+
+
+class KerasBackend:
+    """Runs the original .h5 model through tf.keras."""
+
+    name = "keras"
+    default_path = "CLASSIFIER_H5_PATH"
+
+    def __init__(self, path=None, num_threads=None):
+        import tensorflow as tf
+
+        if num_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        self.model = tf.keras.models.load_model(path or getattr(config, self.default_path))
+
+    def predict(self, batch):
+        """uint8 batch (N, 128, 128, 3) -> sigmoid scores (N,)"""
+        return np.asarray(self.model.predict_on_batch(normalize_batch(batch))).reshape(-1)
+
+
+class TFLiteBackend:
+    """Runs a converted .tflite model, preferring the slim tflite_runtime package.
+
+    Quantized models (integer input/output tensors) are fed and read through
+    the tensors' scale and zero point. Resizing an interpreter's input means
+    reallocating all its tensors, so one interpreter is kept per batch size
+    (the classifier buckets, plus a few larger sizes in LRU order) and each
+    is allocated only once.
+    """
+
+    name = "tflite"
+    default_path = "CLASSIFIER_TFLITE_PATH"
+    max_shapes = 8
+
+    def __init__(self, path=None, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self._new_interpreter = Interpreter
+        self._num_threads = num_threads
+        with open(path or getattr(config, self.default_path), "rb") as f:
+            self._model = f.read()
+        interpreter = Interpreter(model_content=self._model, num_threads=num_threads)
+        interpreter.allocate_tensors()
+        self._input = interpreter.get_input_details()[0]
+        self._output = interpreter.get_output_details()[0]
+        self._interpreters = OrderedDict({int(self._input["shape"][0]): interpreter})
+        self._lock = threading.Lock()
+        in_scale, in_zero = self._input["quantization"]
+        # Input uint8 dengan scale 1/255 dan zero point 0 = piksel mentah, tanpa normalisasi
+        self._raw_input = (self._input["dtype"] == np.uint8 and in_zero == 0
+                           and abs(in_scale * 255.0 - 1.0) < 1e-6)
+
+    def _interpreter(self, shape):
+        with self._lock:
+            interpreter = self._interpreters.get(shape[0])
+            if interpreter is not None:
+                self._interpreters.move_to_end(shape[0])
+                return interpreter
+            interpreter = self._new_interpreter(model_content=self._model, num_threads=self._num_threads)
+            interpreter.resize_tensor_input(self._input["index"], list(shape))
+            interpreter.allocate_tensors()
+            self._interpreters[shape[0]] = interpreter
+            if len(self._interpreters) > self.max_shapes:
+                self._interpreters.popitem(last=False)
+            return interpreter
+
+    def _quantize_input(self, batch):
+        if self._raw_input:
+            return batch
+        x = normalize_batch(batch)
+        if self._input["dtype"] == np.float32:
+            return x
+        scale, zero = self._input["quantization"]
+        info = np.iinfo(self._input["dtype"])
+        return np.clip(np.rint(x / scale) + zero, info.min, info.max).astype(self._input["dtype"])
+
+    def predict(self, batch):
+        """uint8 batch (N, 128, 128, 3) -> sigmoid scores (N,)"""
+        x = self._quantize_input(batch)
+        interpreter = self._interpreter(x.shape)
+        interpreter.set_tensor(self._input["index"], np.ascontiguousarray(x))
+        interpreter.invoke()
+        out = interpreter.get_tensor(self._output["index"]).reshape(-1)
+        if self._output["dtype"] != np.float32:
+            scale, zero = self._output["quantization"]
+            return ((out.astype(np.float32) - zero) * scale).astype(np.float32)
+        return out.astype(np.float32)
+
+
+class Int8TFLiteBackend(TFLiteBackend):
+    """TFLiteBackend on the int8 post-training quantized model (see quantize_classifier)."""
+
+    name = "tflite-int8"
+    default_path = "CLASSIFIER_TFLITE_INT8_PATH"
+
+
+class OnnxBackend:
+    """Runs a converted .onnx model through ONNX Runtime on CPU."""
+
+    name = "onnx"
+    default_path = "CLASSIFIER_ONNX_PATH"
+
+    def __init__(self, path=None, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            path or getattr(config, self.default_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        """uint8 batch (N, 128, 128, 3) -> sigmoid scores (N,)"""
+        output = self.session.run(None, {self._input_name: normalize_batch(batch)})[0]
+        return np.asarray(output, dtype=np.float32).reshape(-1)
+
+
+BACKENDS = {
+    KerasBackend.name: KerasBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    Int8TFLiteBackend.name: Int8TFLiteBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def model_path(backend=None):
+    """Model file the given (or configured) backend loads by default."""
+    backend = backend or config.CLASSIFIER_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown classifier backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    return getattr(config, BACKENDS[backend].default_path)
+
+
+class MemoizedClassifier:
+    """Bounded LRU memo in front of a classifier backend.
+
+    Keys are a blake2b hash of each resized 128x128 uint8 crop, so
+    pixel-identical crops (parked cars in a fixed camera view) are scored
+    once. Duplicates inside one batch are also only run once.
+    """
+
+    def __init__(self, backend, capacity=4096):
+        self.backend = backend
+        self.name = backend.name
+        self.capacity = capacity
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._infer_seconds = 0.0
+        self._inferred = 0
+
+    @staticmethod
+    def _key(crop):
+        return hashlib.blake2b(np.ascontiguousarray(crop).data, digest_size=16).digest()
+
+    def predict(self, batch):
+        """uint8 batch (N, 128, 128, 3) -> sigmoid scores (N,)"""
+        keys = [self._key(crop) for crop in batch]
+        scores = np.empty(len(keys), dtype=np.float32)
+        pending = {}  # key -> indices in batch still needing a score
+        with self._lock:
+            for i, key in enumerate(keys):
+                score = self._scores.get(key)
+                if score is None:
+                    pending.setdefault(key, []).append(i)
+                else:
+                    self._scores.move_to_end(key)
+                    scores[i] = score
+
+        if pending:
+            first = [indices[0] for indices in pending.values()]
+            start = time.perf_counter()
+            fresh = self.backend.predict(batch[first])
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                for (key, indices), score in zip(pending.items(), fresh):
+                    scores[indices] = score
+                    self._scores[key] = float(score)
+                    self._scores.move_to_end(key)
+                while len(self._scores) > self.capacity:
+                    self._scores.popitem(last=False)
+                self._infer_seconds += elapsed
+                self._inferred += len(first)
+
+        with self._lock:
+            self.misses += len(pending)
+            self.hits += len(keys) - len(pending)
+        return scores
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            per_crop = self._infer_seconds / self._inferred if self._inferred else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._scores),
+                "capacity": self.capacity,
+                # perkiraan: rata-rata waktu inferensi per crop x jumlah hit
+                "time_saved_s": self.hits * per_crop,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._scores.clear()
+
+
+class BucketedClassifier:
+    """Pads every batch up to the nearest size in `buckets`.
+
+    Graph runtimes (Keras, TFLite) trace or reallocate for each new batch
+    shape; with a fixed set of shapes that are all warmed up at load time,
+    no request pays that cost. Batches larger than the biggest bucket pass
+    through unpadded.
+    """
+
+    def __init__(self, backend, buckets):
+        self.backend = backend
+        self.name = backend.name
+        self.buckets = sorted(set(buckets))
+
+    def bucket_for(self, n):
+        i = bisect.bisect_left(self.buckets, n)
+        return self.buckets[i] if i < len(self.buckets) else n
+
+    def predict(self, batch):
+        """uint8 batch (N, 128, 128, 3) -> sigmoid scores (N,)"""
+        n = len(batch)
+        size = self.bucket_for(n)
+        if size != n:
+            padded = np.zeros((size, *batch.shape[1:]), dtype=batch.dtype)
+            padded[:n] = batch
+            batch = padded
+        return self.backend.predict(batch)[:n]
+
+    def warmup(self):
+        """Run every bucket once; returns {bucket: (cold_ms, warm_ms)}."""
+        timings = {}
+        for size in self.buckets:
+            dummy = np.zeros((size, *INPUT_SIZE, 3), dtype=np.uint8)
+            runs = []
+            for _ in range(2):
+                start = time.perf_counter()
+                self.backend.predict(dummy)
+                runs.append((time.perf_counter() - start) * 1000)
+            timings[size] = tuple(runs)
+        return timings
+
+
+def load_classifier(backend=None, path=None, memo_capacity=None, buckets=None, warmup=False):
+    """Load the classifier through the configured (or given) backend.
+
+    The backend is wrapped in a BucketedClassifier (default buckets
+    CLASSIFIER_BATCH_BUCKETS, pass `()` to disable), warmed up for every
+    bucket if `warmup`, and, with a positive `memo_capacity` (default
+    CLASSIFIER_MEMO_SIZE), put behind a MemoizedClassifier.
+    """
+    backend = backend or config.CLASSIFIER_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown classifier backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    model = BACKENDS[backend](path, num_threads=config.CLASSIFIER_NUM_THREADS)
+
+    buckets = config.CLASSIFIER_BATCH_BUCKETS if buckets is None else buckets
+    if buckets:
+        model = BucketedClassifier(model, buckets)
+        if warmup:
+            start = time.perf_counter()
+            timings = model.warmup()
+            logger.info("Classifier warm-up (%s) took %.2fs; cold/warm ms per bucket: %s", backend,
+                        time.perf_counter() - start,
+                        ", ".join(f"{size}: {cold:.0f}/{warm:.0f}" for size, (cold, warm) in timings.items()))
+
+    memo_capacity = config.CLASSIFIER_MEMO_SIZE if memo_capacity is None else memo_capacity
+    if memo_capacity > 0:
+        model = MemoizedClassifier(model, memo_capacity)
+    return model
+
+
+def label_from_score(score):
+    # Binary classification dengan sigmoid output
+    # Assuming: 0 = bike/motor, 1 = car (sesuai urutan folder alfabetis)
+    if score > 0.5:
+        return CAR, score
+    return BIKE, 1 - score
+
+
+def resize_crops(crops):
+    """Resize crops to the model input and stack them as one uint8 batch.
+
+    `crops` are either uint8 array views into the decoded image (fast path,
+    see preprocess.crop_views) or PIL images.
+    """
+    # Model trained dengan 128x128 RGB
+    if all(isinstance(c, np.ndarray) for c in crops):
+        return resize_batch(crops, INPUT_SIZE)
+    return np.stack([np.asarray(c.convert("RGB").resize(INPUT_SIZE)) for c in crops])
+
+
+def predict_scores(batch, classifier_model, max_batch_size=None, trace=None):
+    """Run a uint8 batch through the classifier in chunks of `max_batch_size`."""
+    max_batch_size = max_batch_size or config.CLASSIFIER_MAX_BATCH
+    scores = []
+    for start in range(0, len(batch), max_batch_size):
+        chunk = batch[start:start + max_batch_size]
+        with maybe_span(trace, "classify.forward", crops=len(chunk)) as attrs:
+            t0 = time.perf_counter()
+            scores.append(classifier_model.predict(chunk))
+            attrs["ms_per_crop"] = round((time.perf_counter() - t0) * 1000 / len(chunk), 3)
+    return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+
+
+def classify_crops(crops, classifier_model, max_batch_size=None, trace=None):
+    """Classify cropped vehicle images as car or bike in batched forward passes.
+
+    Returns a list of (label, confidence) tuples in the same order as `crops`.
+    Resize and each forward chunk are recorded as spans when `trace` is given.
+    """
+    if not crops:
+        return []
+    with maybe_span(trace, "classify.resize", crops=len(crops)):
+        batch = resize_crops(crops)
+    scores = predict_scores(batch, classifier_model, max_batch_size, trace)
+    return [label_from_score(float(s)) for s in scores]
+
+
+def classify_crop(crop_img, classifier_model):
+    """Classify cropped vehicle image as car or bike"""
+    return classify_crops([crop_img], classifier_model)[0]
+
+
+def representative_crops(paths, yolo_model=None, limit=None, seed=0):
+    """Up to `limit` resized uint8 crops (N, 128, 128, 3) of local images for int8 calibration.
+
+    With a detector the crops are its detections, i.e. what the classifier
+    sees in production; without one each whole image is used as a crop.
+    Crops are sampled evenly from all images when there are more than `limit`.
+    """
+    from preprocess import decode_image
+
+    limit = limit or config.CLASSIFIER_CALIBRATION_CROPS
+    crops = []
+    for path in paths:
+        image = decode_image(path, config.DETECTOR_IMGSZ)
+        if yolo_model is None:
+            crops.append(image)
+            continue
+        r = yolo_model.predict(image, imgsz=config.DETECTOR_IMGSZ, conf=0.25, max_det=50)[0]
+        if r.boxes is not None and len(r.boxes):
+            crops.extend(crop_views(image, r.boxes.xyxy.cpu().numpy()))
+    if len(crops) > limit:
+        pick = np.random.default_rng(seed).choice(len(crops), limit, replace=False)
+        crops = [crops[i] for i in sorted(pick)]
+    return resize_crops(crops) if crops else np.zeros((0, *INPUT_SIZE, 3), dtype=np.uint8)
+
+
+def quantize_classifier(calibration, h5_path=None, out_path=None):
+    """Post-training full-integer quantization of the .h5 model.
+
+    `calibration` is a uint8 crop batch (see representative_crops). Weights
+    and activations become int8; the input tensor is uint8 with scale 1/255
+    so TFLiteBackend feeds raw pixels, the output is dequantized on read.
+    Returns the path written.
+    """
+    import tensorflow as tf
+
+    if not len(calibration):
+        raise ValueError("int8 quantization needs at least one calibration crop")
+    model = tf.keras.models.load_model(h5_path or config.CLASSIFIER_H5_PATH)
+
+    def representative_dataset():
+        for crop in calibration:
+            yield [normalize_batch(crop[None]).copy()]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.uint8
+    converter.inference_output_type = tf.uint8
+    out_path = out_path or config.CLASSIFIER_TFLITE_INT8_PATH
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+    return out_path
+
+
+def convert_classifier(h5_path=None, formats=("tflite", "onnx"), calibration=None):
+    """Convert the .h5 model to the requested formats, returning {format: path}.
+
+    "tflite-int8" needs `calibration` crops (see quantize_classifier).
+    """
+    import tensorflow as tf
+
+    h5_path = h5_path or config.CLASSIFIER_H5_PATH
+    model = tf.keras.models.load_model(h5_path)
+    written = {}
+
+    if "tflite" in formats:
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        with open(config.CLASSIFIER_TFLITE_PATH, "wb") as f:
+            f.write(converter.convert())
+        written["tflite"] = config.CLASSIFIER_TFLITE_PATH
+
+    if "onnx" in formats:
+        import tf2onnx
+
+        spec = (tf.TensorSpec((None, *INPUT_SIZE, 3), tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=config.CLASSIFIER_ONNX_PATH)
+        written["onnx"] = config.CLASSIFIER_ONNX_PATH
+
+    if "tflite-int8" in formats:
+        written["tflite-int8"] = quantize_classifier(calibration if calibration is not None else [], h5_path)
+
+    return written
+
+
+def _load_parity_batch(paths):
+    from PIL import Image
+
+    images = []
+    for p in paths:
+        # copy() memuat piksel; file ditutup sebelum gambar berikutnya dibuka
+        with Image.open(p) as im:
+            images.append(im.copy())
+    if not images:
+        # Tanpa gambar: pakai noise deterministik
+        return np.random.default_rng(0).integers(0, 256, (16, *INPUT_SIZE, 3), dtype=np.uint8)
+    return resize_crops(images)
+
+
+def check_parity(image_paths=(), backends=("tflite", "onnx"), atol=1e-3):
+    """Compare each backend's sigmoid outputs with the .h5 model.
+
+    Returns {backend: {"max_abs_diff": float, "label_agreement": float, "ok": bool}}.
+    """
+    batch = _load_parity_batch(image_paths)
+    reference = load_classifier("keras", memo_capacity=0, buckets=()).predict(batch)
+    report = {}
+    for name in backends:
+        scores = load_classifier(name, memo_capacity=0, buckets=()).predict(batch)
+        diff = float(np.max(np.abs(scores - reference)))
+        agreement = float(np.mean((scores > 0.5) == (reference > 0.5)))
+        report[name] = {"max_abs_diff": diff, "label_agreement": agreement, "ok": diff <= atol}
+    return report
+
+
+def _per_crop_ms(model, batch, repeats):
+    model.predict(batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(batch)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(batch))
+
+
+def compare_classifiers(crops, reference="keras", candidate="tflite-int8", repeats=5, batch_size=None):
+    """Label agreement, confidence drift and per-crop latency of `candidate` vs `reference`.
+
+    `crops` is a uint8 batch (see representative_crops); evaluate on images
+    that were not used for calibration. Backends are names from BACKENDS or
+    model objects with `predict`. Confidence is that of the predicted label
+    (label_from_score); drift is taken over all crops. Latency is measured
+    unpadded and without the memo, at batch 1 and at `batch_size` (default
+    CLASSIFIER_MAX_BATCH).
+    """
+    if not len(crops):
+        raise ValueError("no crops to compare")
+    models = {role: load_classifier(m, memo_capacity=0, buckets=()) if isinstance(m, str) else m
+              for role, m in (("reference", reference), ("candidate", candidate))}
+    scores = {role: predict_scores(crops, model) for role, model in models.items()}
+    ref, cand = scores["reference"], scores["candidate"]
+    ref_conf = np.array([label_from_score(float(s))[1] for s in ref])
+    cand_conf = np.array([label_from_score(float(s))[1] for s in cand])
+    agree = (ref > 0.5) == (cand > 0.5)
+    drift = np.abs(cand_conf - ref_conf)
+    batch = crops[:batch_size or config.CLASSIFIER_MAX_BATCH]
+    return {
+        "crops": len(crops),
+        "label_agreement": float(agree.mean()),
+        "disagreements": int((~agree).sum()),
+        "score_max_abs_diff": float(np.abs(cand - ref).max()),
+        "conf_drift_mean": float(drift.mean()),
+        "conf_drift_p95": float(np.percentile(drift, 95)),
+        "conf_drift_max": float(drift.max()),
+        "latency_ms_per_crop": {
+            role: {"batch_1": _per_crop_ms(model, crops[:1], repeats),
+                   f"batch_{len(batch)}": _per_crop_ms(model, batch, repeats)}
+            for role, model in models.items()
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classifier backend tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="convert the .h5 model to TFLite / ONNX")
+    convert.add_argument("--formats", nargs="+", default=["tflite", "onnx"], choices=["tflite", "onnx", "tflite-int8"])
+    convert.add_argument("--calibration", default="sample_images",
+                         help="images whose vehicle crops calibrate the int8 model")
+    convert.add_argument("--calibration-crops", type=int, default=None)
+    convert.add_argument("--whole-images", action="store_true",
+                         help="calibrate on whole images instead of detector crops")
+
+    parity = sub.add_parser("parity", help="compare backend outputs with the .h5 model")
+    parity.add_argument("images", nargs="?", default="sample_images")
+    parity.add_argument("--backends", nargs="+", default=["tflite", "onnx"], choices=["tflite", "onnx"])
+    parity.add_argument("--atol", type=float, default=1e-3)
+
+    compare = sub.add_parser("compare", help="label agreement, confidence drift and latency vs a reference backend")
+    compare.add_argument("images", nargs="?", default="sample_images")
+    compare.add_argument("--reference", default="keras", choices=sorted(BACKENDS))
+    compare.add_argument("--candidate", default="tflite-int8", choices=sorted(BACKENDS))
+    compare.add_argument("--repeats", type=int, default=5)
+    compare.add_argument("--whole-images", action="store_true",
+                         help="compare on whole images instead of detector crops")
+    compare.add_argument("--standin", action="store_true", help="crop with the stand-in detector")
+
+    args = parser.parse_args(argv)
+    if args.command in ("convert", "compare"):
+        source = args.calibration if args.command == "convert" else args.images
+        yolo_model = None
+        if not args.whole_images and (args.command == "compare" or "tflite-int8" in args.formats):
+            if getattr(args, "standin", False):
+                from standins import StandInDetector
+                yolo_model = StandInDetector()
+            else:
+                from detector import load_detector
+                yolo_model = load_detector()
+
+    if args.command == "convert":
+        calibration = None
+        if "tflite-int8" in args.formats:
+            calibration = representative_crops(list_images(source), yolo_model, args.calibration_crops)
+            print(f"calibration: {len(calibration)} crops from {source}")
+        for fmt, path in convert_classifier(formats=args.formats, calibration=calibration).items():
+            print(f"{fmt}: {path}")
+        return 0
+
+    if args.command == "compare":
+        crops = representative_crops(list_images(source), yolo_model, limit=10 ** 6)
+        row = compare_classifiers(crops, args.reference, args.candidate, args.repeats)
+        print(f"{args.candidate} vs {args.reference} on {row['crops']} crops from {source}")
+        print(f"  label agreement  {row['label_agreement']:.1%} ({row['disagreements']} disagree)")
+        print(f"  confidence drift mean {row['conf_drift_mean']:.4f} · p95 {row['conf_drift_p95']:.4f} · "
+              f"max {row['conf_drift_max']:.4f} (max |score diff| {row['score_max_abs_diff']:.4f})")
+        for role, name in (("reference", args.reference), ("candidate", args.candidate)):
+            latency = " · ".join(f"{k} {v:.3f} ms/crop" for k, v in row["latency_ms_per_crop"][role].items())
+            print(f"  {name:12s} {latency}")
+        return 0
+
+    report = check_parity(list_images(args.images), args.backends, args.atol)
+    for name, row in report.items():
+        status = "OK" if row["ok"] else "MISMATCH"
+        print(f"{name:8s} max|diff|={row['max_abs_diff']:.2e} agreement={row['label_agreement']:.1%} {status}")
+    return 0 if all(row["ok"] for row in report.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
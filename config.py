@@ -0,0 +1,74 @@
+"""Runtime configuration.
+
+Every setting can be overridden with an environment variable of the same
+name, so deployments can switch backends without touching the code.
+"""
+import os
+
+MODEL_DIR = os.environ.get("MODEL_DIR", "model")
+
+# Classifier runtime: "keras" (.h5), "tflite" (.tflite), "tflite-int8" (.tflite terkuantisasi) atau "onnx" (.onnx)
+CLASSIFIER_BACKEND = os.environ.get("CLASSIFIER_BACKEND", "keras")
+CLASSIFIER_H5_PATH = os.environ.get("CLASSIFIER_H5_PATH", os.path.join(MODEL_DIR, "classifier_model.h5"))
+CLASSIFIER_TFLITE_PATH = os.environ.get("CLASSIFIER_TFLITE_PATH", os.path.join(MODEL_DIR, "classifier_model.tflite"))
+CLASSIFIER_ONNX_PATH = os.environ.get("CLASSIFIER_ONNX_PATH", os.path.join(MODEL_DIR, "classifier_model.onnx"))
+# Hasil kuantisasi int8 pasca-training (python classifier.py convert --formats tflite-int8)
+CLASSIFIER_TFLITE_INT8_PATH = os.environ.get("CLASSIFIER_TFLITE_INT8_PATH",
+                                             os.path.join(MODEL_DIR, "classifier_model_int8.tflite"))
+# Jumlah crop maksimum untuk dataset representatif kalibrasi int8
+CLASSIFIER_CALIBRATION_CROPS = int(os.environ.get("CLASSIFIER_CALIBRATION_CROPS", "200"))
+CLASSIFIER_MAX_BATCH = int(os.environ.get("CLASSIFIER_MAX_BATCH", "32"))
+CLASSIFIER_NUM_THREADS = int(os.environ.get("CLASSIFIER_NUM_THREADS", "0")) or None
+# Memo skor per crop (hash piksel 128x128); 0 = nonaktif
+CLASSIFIER_MEMO_SIZE = int(os.environ.get("CLASSIFIER_MEMO_SIZE", "4096"))
+# Batch classifier dipad ke bucket terdekat agar tidak ada retrace untuk ukuran baru
+CLASSIFIER_BATCH_BUCKETS = tuple(int(b) for b in os.environ.get("CLASSIFIER_BATCH_BUCKETS", "1,4,8,16,32").split(","))
+
+# Profil inferensi default (lihat pipeline.PROFILES): fast, balanced, accurate atau adaptive
+DETECT_PROFILE = os.environ.get("DETECT_PROFILE", "balanced")
+
+# Mode tile untuk gambar resolusi tinggi: overlap antar tile, tile per panggilan YOLO,
+# ambang IoS untuk kotak terpotong sambungan tile dan ambang IoU untuk duplikat lain (per kelas)
+TILE_OVERLAP = float(os.environ.get("TILE_OVERLAP", "0.2"))
+TILE_BATCH = int(os.environ.get("TILE_BATCH", "8"))
+TILE_MERGE_THRESHOLD = float(os.environ.get("TILE_MERGE_THRESHOLD", "0.6"))
+TILE_MERGE_IOU = float(os.environ.get("TILE_MERGE_IOU", "0.5"))
+
+# Cascade: label YOLO dipakai langsung (tanpa CNN) jika conf >= ambang dan kelasnya car/motor; 0 = selalu CNN.
+# Nonaktif secara default sampai kecocokan label YOLO vs CNN terukur dengan model asli (python cascade.py)
+CASCADE_SKIP_CONF = float(os.environ.get("CASCADE_SKIP_CONF", "0"))
+# Kotak lebih kecil dari luas ini (px^2 gambar asli, sama di mode tile maupun biasa) di-drop
+# atau tetap diklasifikasi; 0 = nonaktif
+CASCADE_MIN_AREA = float(os.environ.get("CASCADE_MIN_AREA", "0"))
+CASCADE_SMALL_BOXES = os.environ.get("CASCADE_SMALL_BOXES", "drop")
+
+# Header gambar dicek sebelum decode; gambar di atas batas ini ditolak (decompression bomb)
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", "64000000"))
+
+# Warm-up model saat dimuat (dummy input di imgsz dan semua bucket batch)
+WARMUP = os.environ.get("WARMUP", "1") not in ("0", "false", "False")
+
+# Detector runtime: "torch" (best.pt eager), "onnx" atau "openvino"
+DETECTOR_BACKEND = os.environ.get("DETECTOR_BACKEND", "torch")
+DETECTOR_WEIGHTS = os.environ.get("DETECTOR_WEIGHTS", os.path.join(MODEL_DIR, "best.pt"))
+DETECTOR_IMGSZ = int(os.environ.get("DETECTOR_IMGSZ", "960"))
+
+# Cache hasil deteksi: tier memori (LRU, batas byte) + tier disk opsional
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "")
+
+# Scheduler inferensi bersama untuk semua sesi Streamlit
+SCHEDULER_MAX_BATCH = int(os.environ.get("SCHEDULER_MAX_BATCH", "4"))
+SCHEDULER_MAX_WAIT_MS = float(os.environ.get("SCHEDULER_MAX_WAIT_MS", "15"))
+SCHEDULER_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", "1"))
+SCHEDULER_THREADS = int(os.environ.get("SCHEDULER_THREADS", "0"))  # 0 = min(4, jumlah core)
+
+# Export deteksi (batch_cli, export.py): baris per row group Parquet / batch Arrow / flush CSV-JSONL
+EXPORT_ROW_GROUP_SIZE = int(os.environ.get("EXPORT_ROW_GROUP_SIZE", "65536"))
+
+# Artefak per sesi (upload, gambar hasil) disimpan terenkode dengan batas per sesi, global dan TTL
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", str(16 * 1024 * 1024)))
+SESSION_STORE_MAX_BYTES = int(os.environ.get("SESSION_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+SESSION_TTL_S = float(os.environ.get("SESSION_TTL_S", "1800"))
+SESSION_IMAGE_FORMAT = os.environ.get("SESSION_IMAGE_FORMAT", "WEBP")
+SESSION_IMAGE_QUALITY = int(os.environ.get("SESSION_IMAGE_QUALITY", "80"))
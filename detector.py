@@ -0,0 +1,226 @@
+"""YOLO vehicle detector behind interchangeable runtimes.
+
+`best.pt` can run in PyTorch eager mode ("torch") or be exported once at a
+fixed input size to ONNX or OpenVINO, which are considerably faster on CPU.
+All backends go through ultralytics, so callers keep getting the same
+`Results` objects (`boxes.xyxy`, `boxes.conf`, `boxes.cls`, `plot()`).
+
+    python detector.py export --format onnx openvino
+    python detector.py compare sample_images
+"""
+import argparse
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+
+import config
+from preprocess import list_images
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("onnx", "openvino")
+
+
+def exported_path(backend, weights=None, imgsz=None):
+    """Location of the exported model for `backend` at input size `imgsz`."""
+    stem = os.path.splitext(weights or config.DETECTOR_WEIGHTS)[0]
+    imgsz = imgsz or config.DETECTOR_IMGSZ
+    if backend == "onnx":
+        return f"{stem}_{imgsz}.onnx"
+    if backend == "openvino":
+        return f"{stem}_{imgsz}_openvino_model"
+    raise ValueError(f"Unknown export format {backend!r}, expected one of {EXPORT_FORMATS}")
+
+
+def model_path(backend=None, weights=None, imgsz=None):
+    """Model file (or OpenVINO directory) the given or configured backend loads."""
+    backend = backend or config.DETECTOR_BACKEND
+    if backend == "torch":
+        return weights or config.DETECTOR_WEIGHTS
+    return exported_path(backend, weights, imgsz)
+
+
+def export_detector(backend, weights=None, imgsz=None):
+    """Export `weights` to ONNX / OpenVINO at a fixed input size and return the path."""
+    from ultralytics import YOLO
+
+    weights = weights or config.DETECTOR_WEIGHTS
+    imgsz = imgsz or config.DETECTOR_IMGSZ
+    target = exported_path(backend, weights, imgsz)
+
+    out = YOLO(weights).export(format=backend, imgsz=imgsz, dynamic=False, half=False)
+    # ultralytics selalu menulis ke nama yang sama; simpan per imgsz
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    os.replace(str(out), target)
+    return target
+
+
+class YoloDetector:
+    """YOLO model plus the input size it runs at.
+
+    Exported backends have a fixed input shape, so a per-call `imgsz` is only
+    honoured by the torch backend.
+    """
+
+    def __init__(self, backend=None, weights=None, imgsz=None):
+        from ultralytics import YOLO
+
+        self.backend = backend or config.DETECTOR_BACKEND
+        self.imgsz = imgsz or config.DETECTOR_IMGSZ
+        weights = weights or config.DETECTOR_WEIGHTS
+
+        if self.backend == "torch":
+            path = weights
+        elif self.backend in EXPORT_FORMATS:
+            path = model_path(self.backend, weights, self.imgsz)
+            if not os.path.exists(path):
+                path = export_detector(self.backend, weights, self.imgsz)
+        else:
+            raise ValueError(f"Unknown detector backend {self.backend!r}")
+
+        self.model = YOLO(path, task="detect")
+        self.names = self.model.names
+
+    @property
+    def dynamic_imgsz(self):
+        return self.backend == "torch"
+
+    def predict(self, source, imgsz=None, conf=0.45, max_det=50, **kwargs):
+        if not (imgsz and self.dynamic_imgsz):
+            imgsz = self.imgsz
+        return self.model.predict(source, imgsz=imgsz, conf=conf, max_det=max_det, verbose=False, **kwargs)
+
+    def warmup(self, imgsz=None):
+        """Run a dummy frame twice at `imgsz`; returns (cold_ms, warm_ms)."""
+        imgsz = imgsz or self.imgsz
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        runs = []
+        for _ in range(2):
+            start = time.perf_counter()
+            self.predict(dummy, imgsz=imgsz)
+            runs.append((time.perf_counter() - start) * 1000)
+        return tuple(runs)
+
+
+def load_detector(backend=None, weights=None, imgsz=None, warmup=False):
+    """Load the detector through the configured (or given) backend."""
+    detector = YoloDetector(backend, weights, imgsz)
+    if warmup:
+        cold, warm = detector.warmup()
+        logger.info("Detector warm-up (%s, imgsz=%d): cold %.0f ms, warm %.0f ms",
+                    detector.backend, detector.imgsz, cold, warm)
+    return detector
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def _match_boxes(ref_boxes, ref_cls, boxes, cls, iou_threshold):
+    # Greedy matching per pasangan IoU tertinggi dengan kelas yang sama
+    if len(ref_boxes) == 0 or len(boxes) == 0:
+        return []
+    iou = box_iou(ref_boxes, boxes)
+    iou[ref_cls[:, None] != cls[None, :]] = 0
+    matches = []
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_threshold:
+            return matches
+        matches.append(float(iou[i, j]))
+        iou[i, :] = 0
+        iou[:, j] = 0
+
+
+def _boxes_of(result):
+    boxes = result.boxes
+    return boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy().astype(int)
+
+
+def compare_detectors(image_paths, backends=EXPORT_FORMATS, conf=0.45, max_det=50, iou_threshold=0.5):
+    """Latency and box agreement of each backend against the torch path.
+
+    Returns {backend: {"p50_ms", "mean_ms", "speedup", "agreement", "mean_iou"}}.
+    """
+    from PIL import Image
+
+    images = []
+    for p in image_paths:
+        with Image.open(p) as im:
+            images.append(np.array(im.convert("RGB")))
+    runs = {}
+    for name in ("torch", *backends):
+        detector = load_detector(name)
+        detector.predict(images[0], conf=conf, max_det=max_det)  # warm-up
+        latencies, outputs = [], []
+        for img in images:
+            start = time.perf_counter()
+            result = detector.predict(img, conf=conf, max_det=max_det)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            outputs.append(_boxes_of(result))
+        runs[name] = (np.array(latencies), outputs)
+
+    ref_lat, ref_out = runs["torch"]
+    report = {"torch": {"p50_ms": float(np.median(ref_lat)), "mean_ms": float(ref_lat.mean()),
+                        "speedup": 1.0, "agreement": 1.0, "mean_iou": 1.0}}
+    for name in backends:
+        lat, out = runs[name]
+        matched, total, ious = 0, 0, []
+        for (rb, rc), (b, c) in zip(ref_out, out):
+            m = _match_boxes(rb, rc, b, c, iou_threshold)
+            matched += len(m)
+            total += max(len(rb), len(b))
+            ious.extend(m)
+        report[name] = {
+            "p50_ms": float(np.median(lat)),
+            "mean_ms": float(lat.mean()),
+            "speedup": float(ref_lat.mean() / lat.mean()),
+            "agreement": matched / total if total else 1.0,
+            "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detector backend tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="export best.pt at a fixed input size")
+    export.add_argument("--format", nargs="+", default=["onnx"], choices=EXPORT_FORMATS)
+    export.add_argument("--imgsz", type=int, default=config.DETECTOR_IMGSZ)
+
+    compare = sub.add_parser("compare", help="latency and box agreement against the torch path")
+    compare.add_argument("images", nargs="?", default="sample_images")
+    compare.add_argument("--backends", nargs="+", default=["onnx"], choices=EXPORT_FORMATS)
+    compare.add_argument("--iou", type=float, default=0.5)
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        for fmt in args.format:
+            print(f"{fmt}: {export_detector(fmt, imgsz=args.imgsz)}")
+        return 0
+
+    report = compare_detectors(list_images(args.images), args.backends, iou_threshold=args.iou)
+    print(f"{'backend':10s} {'p50 ms':>8s} {'mean ms':>8s} {'speedup':>8s} {'agree':>7s} {'IoU':>6s}")
+    for name, row in report.items():
+        print(f"{name:10s} {row['p50_ms']:8.1f} {row['mean_ms']:8.1f} {row['speedup']:7.2f}x "
+              f"{row['agreement']:6.1%} {row['mean_iou']:6.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
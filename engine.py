@@ -0,0 +1,68 @@
+"""VehicleDetector: the detect-then-classify engine behind the app, the batch CLI and the server.
+
+Owns the YOLO detector and the CNN classifier together with the default
+inference parameters (a pipeline profile) and the classifier cascade, and
+returns array-backed pipeline.Detections. The Streamlit page (through
+scheduler.InferenceScheduler), batch_cli.py and server.py detect through
+it; benchmark.py, streaming.py and video.py still call the pipeline
+functions directly. It can be imported without Streamlit:
+
+    from engine import VehicleDetector
+
+    detector = VehicleDetector.load(profile="fast")
+    detections = detector.detect("sample_images/Car (6).jpg")
+    print(detections.boxes, detections.label_names, detections.count("car"))
+
+The engine is not thread-safe (neither are the models); share one between
+threads through scheduler.InferenceScheduler. Detections is re-exported
+here for callers that only import the engine.
+"""
+import pipeline
+from pipeline import DISPLAY_MAX_WIDTH, Detections
+from preprocess import decode_scaled
+
+
+class VehicleDetector:
+    def __init__(self, yolo_model, classifier, profile=None, cascade=None, **params):
+        self.yolo_model = yolo_model
+        self.classifier = classifier
+        self.cascade = cascade
+        self.params = {**pipeline.profile_params(profile), **params}
+
+    @classmethod
+    def load(cls, profile=None, warmup=None, cascade=None, **params):
+        """Load both models through their configured backends (see pipeline.load_models)."""
+        yolo_model, classifier = pipeline.load_models(warmup)
+        return cls(yolo_model, classifier, profile, cascade, **params)
+
+    def merged_params(self, params=None):
+        return {**self.params, **(params or {})}
+
+    def decode(self, image, params=None):
+        """DecodedImage of `image` at the scale detection uses; pass it to detect and render."""
+        return decode_scaled(image, pipeline.decode_size(self.merged_params(params)))
+
+    def detect(self, image, params=None, timings=None, trace=None, on_classify_error=None):
+        """Detections of one image (path, bytes, PIL image, uint8 array or DecodedImage)."""
+        return self.detect_batch([image], params, timings, trace, on_classify_error)[0]
+
+    def detect_batch(self, images, params=None, timings=None, trace=None, on_classify_error=None):
+        """Detections per image; one YOLO call and one classifier pass for the whole list.
+
+        `params` override the engine's profile for this call; see
+        pipeline.detect_and_classify_batch for the other arguments.
+        """
+        return pipeline.detect_and_classify_batch(images, self.yolo_model, self.classifier,
+                                                  self.merged_params(params), timings, on_classify_error, trace,
+                                                  self.cascade)
+
+    def render(self, image, detections, trace=None, max_width=DISPLAY_MAX_WIDTH):
+        """Annotated PIL image; `image` should be the DecodedImage the detections came from."""
+        return pipeline.render_result(image, detections, trace, max_width)
+
+    def stream(self, images, params=None, **kwargs):
+        """streaming.detect_stream over `images` with this engine's models and parameters."""
+        from streaming import detect_stream
+
+        return detect_stream(images, self.yolo_model, self.classifier, self.merged_params(params),
+                             cascade=self.cascade, **kwargs)
@@ -0,0 +1,360 @@
+"""Streaming export of detection records to CSV, JSONL, Parquet or Arrow IPC.
+
+Writers take one image's pipeline.Detections at a time and write one
+typed record per detection (SCHEMA): image id and name, detector id, box
+corners in original pixels, detector score and YOLO class, classifier
+label, score and source, and the image's per-stage timings. An image
+without detections still gets one record, with det_id 0 and null
+detection fields, so "no vehicles" is distinguishable from "not
+processed" and image ids have no gaps. Records are
+buffered column-wise and written every `row_group_size` rows (one Parquet
+row group / Arrow record batch each), so memory stays bounded by the row
+group however many images are exported. Values are raw numbers; no
+percentages or preformatted strings.
+
+Parquet and Arrow need pyarrow (imported only when such a writer is
+opened). Export a directory through the streaming pipeline with
+
+    python export.py sample_images runs/detections.parquet --standin
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+import config
+from pipeline import LABELS, SOURCES, UNKNOWN_LABEL
+
+STAGES = ("decode", "detect", "crop", "classify", "render")
+# Kolom -> tipe; "label"/"source" adalah id ke kamus tetap (dictionary type di Arrow/Parquet)
+SCHEMA = (
+    ("image_id", "int32"),
+    ("image", "string"),
+    ("det_id", "int32"),
+    ("x1", "float32"),
+    ("y1", "float32"),
+    ("x2", "float32"),
+    ("y2", "float32"),
+    ("det_score", "float32"),
+    ("yolo_class", "int32"),
+    ("yolo_class_name", "string"),
+    ("label", "label"),
+    ("label_score", "float32"),
+    ("label_source", "source"),
+) + tuple((f"{stage}_ms", "float32") for stage in STAGES)
+LABEL_DICTIONARY = LABELS + (UNKNOWN_LABEL,)
+SOURCE_DICTIONARY = SOURCES
+
+
+def detection_columns(image_id, image, detections, timings=None):
+    """Columns (name -> array/list) of the records for one image, in SCHEMA order.
+
+    Null values are NaN (floats), -1 (ints and dictionary ids) and None
+    (strings); an image without detections gets a single such record.
+    """
+    n = len(detections)
+    timings = timings or {}
+    if n:
+        boxes = detections.boxes
+        labels = detections.labels.astype(np.int8)
+        labels[labels < 0] = LABEL_DICTIONARY.index(UNKNOWN_LABEL)
+        columns = {
+            "image_id": np.full(n, image_id, dtype=np.int32),
+            "image": [image] * n,
+            "det_id": detections.ids + 1,
+            "x1": boxes[:, 0], "y1": boxes[:, 1], "x2": boxes[:, 2], "y2": boxes[:, 3],
+            "det_score": detections.scores,
+            "yolo_class": detections.classes,
+            "yolo_class_name": detections.yolo_class_names,
+            "label": labels,
+            "label_score": detections.label_scores,
+            "label_source": detections.sources.astype(np.int8),
+        }
+    else:
+        n = 1
+        missing = np.full(1, np.nan, dtype=np.float32)
+        columns = {
+            "image_id": np.full(1, image_id, dtype=np.int32),
+            "image": [image],
+            "det_id": np.zeros(1, dtype=np.int32),
+            "x1": missing, "y1": missing, "x2": missing, "y2": missing,
+            "det_score": missing,
+            "yolo_class": np.full(1, -1, dtype=np.int32),
+            "yolo_class_name": [None],
+            "label": np.full(1, -1, dtype=np.int8),
+            "label_score": missing,
+            "label_source": np.full(1, -1, dtype=np.int8),
+        }
+    for stage in STAGES:
+        seconds = timings.get(stage)
+        columns[f"{stage}_ms"] = np.full(n, np.nan if seconds is None else seconds * 1000, dtype=np.float32)
+    return columns
+
+
+class ExportWriter:
+    """Base writer: buffers columns and hands them to `_write` once `row_group_size` rows are buffered.
+
+    `target` is a path or a binary file object (left open on close).
+    """
+
+    def __init__(self, target, row_group_size=None):
+        self.row_group_size = row_group_size or config.EXPORT_ROW_GROUP_SIZE
+        self._owns_file = isinstance(target, (str, os.PathLike))
+        self._file = open(target, "wb") if self._owns_file else target
+        self._buffer = {name: [] for name, _ in SCHEMA}
+        self._buffered = 0
+        self.images = 0
+        self.rows = 0
+        self.row_groups = 0
+
+    def write(self, image, detections, timings=None):
+        """Add the records of one image; returns its image_id."""
+        image_id = self.images
+        self.images += 1
+        columns = detection_columns(image_id, image, detections, timings)
+        for name, values in columns.items():
+            self._buffer[name].append(values)
+        self._buffered += len(columns["image_id"])
+        if self._buffered >= self.row_group_size:
+            self.flush()
+        return image_id
+
+    def flush(self):
+        if not self._buffered:
+            return
+        columns = {}
+        for name, kind in SCHEMA:
+            parts = self._buffer[name]
+            columns[name] = [v for part in parts for v in part] if kind == "string" else np.concatenate(parts)
+            parts.clear()
+        self._write(columns, self._buffered)
+        self.rows += self._buffered
+        self.row_groups += 1
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+        self._finish()
+        self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, columns, n):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+    def _close_file(self):
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+
+def _records(columns, n):
+    names = [name for name, _ in SCHEMA]
+    for i in range(n):
+        record = {}
+        for name, kind in SCHEMA:
+            value = columns[name][i]
+            if kind == "label":
+                value = LABEL_DICTIONARY[value] if value >= 0 else None
+            elif kind == "source":
+                value = SOURCE_DICTIONARY[value] if value >= 0 else None
+            elif kind == "float32":
+                value = None if math.isnan(value) else round(float(value), 6)
+            elif kind == "int32":
+                value = int(value) if value >= 0 else None
+            record[name] = value
+        yield [record[name] for name in names]
+
+
+class _TextWriter(ExportWriter):
+    def __init__(self, target, row_group_size=None):
+        super().__init__(target, row_group_size)
+        self._text = io.TextIOWrapper(self._file, encoding="utf-8", newline="")
+
+    def _close_file(self):
+        if self._owns_file:
+            self._text.close()
+        else:
+            # File milik pemanggil tetap terbuka
+            self._text.detach()
+
+
+class CsvExportWriter(_TextWriter):
+    format = "csv"
+
+    def __init__(self, target, row_group_size=None):
+        super().__init__(target, row_group_size)
+        self._csv = csv.writer(self._text)
+        self._csv.writerow([name for name, _ in SCHEMA])
+
+    def _write(self, columns, n):
+        self._csv.writerows(["" if v is None else v for v in row] for row in _records(columns, n))
+
+
+class JsonlExportWriter(_TextWriter):
+    format = "jsonl"
+
+    def _write(self, columns, n):
+        names = [name for name, _ in SCHEMA]
+        for row in _records(columns, n):
+            self._text.write(json.dumps(dict(zip(names, row))) + "\n")
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    types = {
+        "int32": pa.int32(),
+        "float32": pa.float32(),
+        "string": pa.string(),
+        "label": pa.dictionary(pa.int8(), pa.string()),
+        "source": pa.dictionary(pa.int8(), pa.string()),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in SCHEMA])
+
+
+def _record_batch(columns, schema):
+    import pyarrow as pa
+
+    dictionaries = {"label": pa.array(LABEL_DICTIONARY), "source": pa.array(SOURCE_DICTIONARY)}
+    arrays = []
+    for (name, kind), field in zip(SCHEMA, schema):
+        values = columns[name]
+        if kind in dictionaries:
+            indices = pa.array(values, pa.int8(), mask=values < 0)
+            arrays.append(pa.DictionaryArray.from_arrays(indices, dictionaries[kind]))
+        elif kind == "int32":
+            arrays.append(pa.array(values, field.type, mask=values < 0))
+        else:
+            # NaN -> null
+            arrays.append(pa.array(values, field.type, from_pandas=True))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ParquetExportWriter(ExportWriter):
+    """One Parquet row group per `row_group_size` records."""
+
+    format = "parquet"
+
+    def __init__(self, target, row_group_size=None, compression="zstd"):
+        import pyarrow.parquet as pq
+
+        super().__init__(target, row_group_size)
+        self._schema = arrow_schema()
+        self._writer = pq.ParquetWriter(self._file, self._schema, compression=compression)
+
+    def _write(self, columns, n):
+        import pyarrow as pa
+
+        self._writer.write_table(pa.Table.from_batches([_record_batch(columns, self._schema)]))
+
+    def _finish(self):
+        self._writer.close()
+
+
+class ArrowExportWriter(ExportWriter):
+    """Arrow IPC file; one record batch per `row_group_size` records."""
+
+    format = "arrow"
+
+    def __init__(self, target, row_group_size=None):
+        import pyarrow as pa
+
+        super().__init__(target, row_group_size)
+        self._schema = arrow_schema()
+        self._writer = pa.ipc.new_file(self._file, self._schema)
+
+    def _write(self, columns, n):
+        self._writer.write_batch(_record_batch(columns, self._schema))
+
+    def _finish(self):
+        self._writer.close()
+
+
+WRITERS = {w.format: w for w in (CsvExportWriter, JsonlExportWriter, ParquetExportWriter, ArrowExportWriter)}
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet", ".arrow": "arrow", ".ipc": "arrow",
+              ".feather": "arrow"}
+
+
+def open_writer(target, format=None, row_group_size=None):
+    """Writer for `target`; the format defaults to the path's extension."""
+    if format is None:
+        if not isinstance(target, (str, os.PathLike)):
+            raise ValueError("format is required when writing to a file object")
+        format = EXTENSIONS.get(os.path.splitext(str(target))[1].lower())
+    if format not in WRITERS:
+        raise ValueError(f"Unknown export format {format!r}, expected one of {sorted(WRITERS)}")
+    return WRITERS[format](target, row_group_size)
+
+
+def export_bytes(items, format="csv"):
+    """Encoded export of `(image, detections)` pairs, for small in-memory downloads."""
+    buf = io.BytesIO()
+    with open_writer(buf, format) as writer:
+        for image, detections in items:
+            writer.write(image, detections)
+    return buf.getvalue()
+
+
+def export_stream(results, writer):
+    """Write streaming.StreamResult items as they arrive; returns the number of failed images."""
+    failed = 0
+    for result in results:
+        if result.error is not None:
+            failed += 1
+            continue
+        writer.write(str(result.source), result.detections, result.timings)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect over images and export the records incrementally")
+    parser.add_argument("source", help="directory or glob of images")
+    parser.add_argument("out", help="output file (.csv, .jsonl, .parquet or .arrow)")
+    parser.add_argument("--format", choices=sorted(WRITERS), default=None, help="default: from the extension")
+    parser.add_argument("--row-group-size", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=1, help="repeat the image list to get a longer run")
+    parser.add_argument("--standin", action="store_true", help="use deterministic stand-in models")
+    args = parser.parse_args(argv)
+
+    from benchmark import peak_rss_mb
+    from preprocess import list_images
+    from streaming import detect_stream
+
+    paths = list_images(args.source)
+    if not paths:
+        parser.error(f"no images found in {args.source!r}")
+    if args.standin:
+        from standins import load_standin_models
+        yolo_model, classifier = load_standin_models()
+    else:
+        from pipeline import load_models
+        yolo_model, classifier = load_models()
+
+    # Generator: daftar path tidak diulang di memori untuk --repeat besar
+    sources = (path for _ in range(args.repeat) for path in paths)
+    start = time.perf_counter()
+    with open_writer(args.out, args.format, args.row_group_size) as writer:
+        failed = export_stream(detect_stream(sources, yolo_model, classifier, render=False), writer)
+    elapsed = time.perf_counter() - start
+    print(f"{writer.images} images, {writer.rows} records in {writer.row_groups} row groups -> {args.out}")
+    print(f"{elapsed:.1f}s ({writer.images / elapsed:.1f} images/s), {failed} failed, "
+          f"peak RSS {peak_rss_mb():.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,414 @@
+"""Detect-then-classify pipeline, independent of Streamlit.
+
+The YOLO -> crop -> CNN -> render stages as plain functions returning
+array-backed Detections; engine.VehicleDetector wraps them together with
+the models for the app, the batch CLI and other tools.
+
+Inference parameters come from named profiles (PROFILES) that trade speed
+for accuracy: detector input size, confidence threshold, max detections
+and classifier batch limit. The "adaptive" profile derives the input size
+from the image itself, so a 300 px thumbnail is not run at 960 px.
+config.DETECT_PROFILE selects the default (DETECT_PARAMS).
+
+Detections go through a cascade (cascade.CascadePolicy, off by default)
+before the CNN: when enabled, confident car/motorcycle boxes keep YOLO's
+label and the classifier only sees the rest; Detections.sources records
+which path labelled each box.
+"""
+import threading
+import time
+from concurrent.futures import Future, wait
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+from cascade import ROUTE_CNN, ROUTE_DROP, ROUTE_YOLO, CascadePolicy
+from classifier import BIKE, CAR, classify_crops, load_classifier
+from detector import load_detector
+from preprocess import DecodedImage, crop_views, decode_scaled, scale_boxes
+from tiling import detect_tiled
+from tracing import maybe_span
+
+PROFILES = {
+    "fast": {"imgsz": 640, "conf": 0.5, "max_det": 30, "classifier_batch": 16},
+    "balanced": {"imgsz": 960, "conf": 0.45, "max_det": 50, "classifier_batch": 32},
+    "accurate": {"imgsz": 1280, "conf": 0.35, "max_det": 100, "classifier_batch": 32},
+    "adaptive": {"imgsz": "auto", "conf": 0.45, "max_det": 50, "classifier_batch": 32},
+}
+# Batas imgsz profil adaptive (kelipatan stride 32)
+ADAPTIVE_IMGSZ = (320, 1280)
+
+
+def profile_params(name=None):
+    """Copy of the parameters of profile `name` (default config.DETECT_PROFILE)."""
+    name = name or config.DETECT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile {name!r}, expected one of {sorted(PROFILES)}")
+    return dict(PROFILES[name])
+
+
+def adaptive_imgsz(width, height, bounds=ADAPTIVE_IMGSZ):
+    """Detector input size for an image: its longest side rounded up to a multiple of 32, clamped."""
+    size = -(-max(width, height) // 32) * 32
+    return int(min(max(size, bounds[0]), bounds[1]))
+
+
+DETECT_PARAMS = profile_params()
+# Dipakai bila pemanggil tidak memberi policy sendiri; counter-nya dibagi semua pemanggil
+DEFAULT_CASCADE = CascadePolicy()
+DISPLAY_MAX_WIDTH = 1200
+# Warna kotak per label klasifikasi (RGB), sama dengan badge di app
+LABEL_COLORS = {CAR: (167, 139, 250), BIKE: (103, 198, 244)}
+UNKNOWN_COLOR = (160, 160, 160)
+# Id label di Detections.labels / Detections.sources = indeks di tuple ini
+LABELS = (CAR, BIKE)
+UNKNOWN_LABEL = "unknown"
+SOURCES = (ROUTE_CNN, ROUTE_YOLO)
+
+
+def load_models(warmup=None):
+    """Load the detector and classifier through their configured backends.
+
+    With `warmup` (default config.WARMUP) both models run dummy inputs at
+    the configured image size and every classifier batch bucket, so the
+    first real request pays no tracing or allocation cost.
+    """
+    warmup = config.WARMUP if warmup is None else warmup
+    yolo_model = load_detector(warmup=warmup)
+    classifier = load_classifier(warmup=warmup)
+    return yolo_model, classifier
+
+
+class BackgroundLoader:
+    """Runs `loader()` (default load_models) in a daemon thread as soon as it is created.
+
+    Lets a UI render before TensorFlow/ultralytics and the weights are loaded;
+    `get()` blocks until the models are available.
+    """
+
+    def __init__(self, loader=load_models):
+        self._future = Future()
+        self.started = time.perf_counter()
+        self.load_seconds = None
+        threading.Thread(target=self._run, args=(loader,), name="model-loader", daemon=True).start()
+
+    def _run(self, loader):
+        try:
+            models = loader()
+        except BaseException as e:
+            self._future.set_exception(e)
+        else:
+            self.load_seconds = time.perf_counter() - self.started
+            self._future.set_result(models)
+
+    def ready(self):
+        return self._future.done()
+
+    def wait(self, timeout=None):
+        """Block until loading finished (successfully or not); returns ready()."""
+        wait([self._future], timeout)
+        return self.ready()
+
+    def error(self):
+        return self._future.exception() if self._future.done() else None
+
+    def get(self, timeout=None):
+        return self._future.result(timeout)
+
+
+def decode_size(params, tiled=None):
+    """Target size for decode_scaled: the detector's imgsz, or None (full size) in tiled mode."""
+    tiled = params.get("tiled", False) if tiled is None else tiled
+    if tiled:
+        return None
+    return ADAPTIVE_IMGSZ[1] if params["imgsz"] == "auto" else params["imgsz"]
+
+
+@contextmanager
+def _stage(timings, name, trace=None, **attrs):
+    start = time.perf_counter()
+    try:
+        with maybe_span(trace, name, **attrs) as span_attrs:
+            yield span_attrs
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class Detections:
+    """Array-backed detections of one image; boxes are in original-resolution pixels.
+
+    - boxes: (N, 4) float32 xyxy
+    - scores: (N,) float32 detector confidence
+    - classes: (N,) int32 YOLO class ids, named by `class_names`
+    - labels: (N,) int8 index into LABELS, -1 when classification failed
+    - label_scores: (N,) float32 confidence of the label
+    - sources: (N,) uint8 index into SOURCES (which model produced the label)
+    - ids: (N,) int32 detector index of each box (boxes dropped by the cascade leave gaps)
+
+    Formatting (percentages, row dicts) is left to the consumer; `to_rows`
+    gives the row format of the CSV export and the JSON API.
+    """
+
+    __slots__ = ("boxes", "scores", "classes", "labels", "label_scores", "sources", "ids", "class_names")
+
+    def __init__(self, boxes, scores, classes, labels, label_scores, sources, ids, class_names=None):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.classes = np.asarray(classes, dtype=np.int32)
+        self.labels = np.asarray(labels, dtype=np.int8)
+        self.label_scores = np.asarray(label_scores, dtype=np.float32)
+        self.sources = np.asarray(sources, dtype=np.uint8)
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.class_names = dict(class_names or {})
+
+    @classmethod
+    def empty(cls, class_names=None):
+        return cls(np.zeros((0, 4)), [], [], [], [], [], [], class_names)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __repr__(self):
+        return f"Detections({len(self)} boxes, {dict(zip(LABELS, map(self.count, LABELS)))})"
+
+    @property
+    def label_names(self):
+        return [LABELS[i] if i >= 0 else UNKNOWN_LABEL for i in self.labels]
+
+    @property
+    def yolo_class_names(self):
+        return [self.class_names.get(int(c), str(int(c))) for c in self.classes]
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.__slots__[:-1])
+
+    def count(self, label):
+        return int((self.labels == LABELS.index(label)).sum())
+
+    def to_rows(self):
+        """One dict per detection with the CSV export's columns."""
+        rows = []
+        for i in range(len(self)):
+            x1, y1, x2, y2 = map(int, self.boxes[i])
+            class_conf = float(self.label_scores[i])
+            rows.append({
+                "ID": int(self.ids[i]) + 1,
+                "YOLO Class": self.class_names.get(int(self.classes[i]), str(int(self.classes[i]))),
+                "Classified As": LABELS[self.labels[i]] if self.labels[i] >= 0 else UNKNOWN_LABEL,
+                "Detection Conf": f"{float(self.scores[i]):.1%}",
+                "Classification Conf": f"{class_conf:.1%}",
+                "Bounding Box": f"({x1}, {y1}, {x2}, {y2})",
+                "Det_Confidence": float(self.scores[i]),
+                "Class_Confidence": class_conf,
+                "Label Source": SOURCES[self.sources[i]],
+            })
+        return rows
+
+    def to_dict(self):
+        """JSON-serialisable form (see from_dict)."""
+        return {name: getattr(self, name).tolist() for name in self.__slots__[:-1]} | {
+            "class_names": {str(k): v for k, v in self.class_names.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        class_names = {int(k): v for k, v in data.pop("class_names", {}).items()}
+        return cls(**data, class_names=class_names)
+
+
+def _label_id(label):
+    return LABELS.index(label) if label in LABELS else -1
+
+
+def render_result(image, detections, trace=None, max_width=DISPLAY_MAX_WIDTH):
+    """Draw the classifier labels of `detections` over `image`.
+
+    `image` is the DecodedImage (or uint8 array at original size) the
+    detections came from. It is first downscaled to at most `max_width`
+    (None keeps its size; images are never upscaled), then boxes are scaled
+    to that canvas and drawn with OpenCV, so drawing cost does not depend on
+    the upload's resolution.
+    """
+    array, (sx, sy) = (image.array, image.scale) if isinstance(image, DecodedImage) else (image, (1.0, 1.0))
+    array = np.asarray(array)
+    h, w = array.shape[:2]
+    with maybe_span(trace, "render.resize", source_width=w):
+        f = min(1.0, max_width / w) if max_width else 1.0
+        if f < 1.0:
+            canvas = cv2.resize(array, (max(1, round(w * f)), max(1, round(h * f))), interpolation=cv2.INTER_AREA)
+        else:
+            canvas = np.ascontiguousarray(array).copy()
+
+    with maybe_span(trace, "render.draw", boxes=len(detections)):
+        if len(detections):
+            ch, cw = canvas.shape[:2]
+            boxes = np.rint(detections.boxes / np.array([sx, sy, sx, sy]) * f).astype(np.int32)
+            boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, cw - 1)
+            boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, ch - 1)
+            thickness = max(1, round(cw / 500))
+            font_scale = max(0.35, cw / 1800)
+            labels = detections.label_names
+
+            # Semua kotak satu warna digambar dengan satu panggilan polylines
+            for label in set(labels):
+                sel = boxes[[lab == label for lab in labels]]
+                x1, y1, x2, y2 = sel.T
+                polys = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                                  np.stack([x2, y2], 1), np.stack([x1, y2], 1)], axis=1)
+                cv2.polylines(canvas, list(polys.reshape(-1, 4, 1, 2)), True,
+                              LABEL_COLORS.get(label, UNKNOWN_COLOR), thickness, cv2.LINE_AA)
+
+            for (x1, y1, _, _), label, conf in zip(boxes, labels, detections.label_scores):
+                text = f"{label} {conf:.0%}"
+                (tw, th), base = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+                top = y1 - th - base - 2 if y1 - th - base - 2 >= 0 else y1
+                cv2.rectangle(canvas, (int(x1), int(top)), (int(x1) + tw + 4, int(top) + th + base + 2),
+                              LABEL_COLORS.get(label, UNKNOWN_COLOR), cv2.FILLED)
+                cv2.putText(canvas, text, (int(x1) + 2, int(top) + th + 1), cv2.FONT_HERSHEY_SIMPLEX, font_scale,
+                            (255, 255, 255), thickness, cv2.LINE_AA)
+    return Image.fromarray(canvas)
+
+
+def detect_decoded(decoded, yolo_model, params=None, timings=None, trace=None):
+    """Detection stage: one YOLO call over already decoded images (DecodedImage list).
+
+    Returns the raw YOLO results (TiledResult per image in tiled mode).
+    """
+    params = {**DETECT_PARAMS, **(params or {})}
+    tiled = params.pop("tiled", False)
+    params.pop("classifier_batch", None)
+    arrays = [d.array for d in decoded]
+
+    if params["imgsz"] == "auto" and tiled:
+        params["imgsz"] = config.DETECTOR_IMGSZ
+
+    with _stage(timings, "detect", trace, images=len(arrays), tiled=tiled, **params) as attrs:
+        if tiled:
+            return [detect_tiled(yolo_model, arr, **params) for arr in arrays]
+        if params["imgsz"] != "auto":
+            return yolo_model.predict(arrays, **params)
+        if not getattr(yolo_model, "dynamic_imgsz", True):
+            # Backend export (ONNX/OpenVINO) berukuran tetap: satu panggilan di ukurannya sendiri
+            return yolo_model.predict(arrays, **{**params, "imgsz": None})
+        # Satu panggilan YOLO = satu imgsz: satu panggilan per ukuran adaptif, agar thumbnail
+        # tidak ikut dijalankan di ukuran gambar terbesar dalam batch
+        groups = {}
+        for i, a in enumerate(arrays):
+            groups.setdefault(adaptive_imgsz(a.shape[1], a.shape[0]), []).append(i)
+        attrs["imgsz_groups"] = sorted(groups)
+        results = [None] * len(arrays)
+        for imgsz, indices in groups.items():
+            outputs = yolo_model.predict([arrays[i] for i in indices], **{**params, "imgsz": imgsz})
+            for i, r in zip(indices, outputs):
+                results[i] = r
+        return results
+
+
+def classify_detections(decoded, results, classifier, params=None, timings=None, on_classify_error=None,
+                        trace=None, cascade=None):
+    """Crop and classify stages for the YOLO `results` of `decoded`; returns Detections per image.
+
+    See detect_and_classify_batch for `on_classify_error` and `cascade`.
+    """
+    cascade = cascade or DEFAULT_CASCADE
+    classifier_batch = (params or {}).get("classifier_batch", DETECT_PARAMS.get("classifier_batch"))
+
+    found, crops = [], []
+    with _stage(timings, "crop", trace) as attrs:
+        attrs.update(detections=0, skipped=0, dropped=0)
+        for d, r in zip(decoded, results):
+            if not hasattr(r, "boxes") or r.boxes is None or len(r.boxes) == 0:
+                found.append(None)
+                continue
+            boxes = r.boxes.xyxy.cpu().numpy()
+            scores, classes = r.boxes.conf.cpu().numpy(), r.boxes.cls.cpu().numpy().astype(int)
+            routes = cascade.route(boxes, scores, classes, getattr(r, "names", {}), d.scale)
+            found.append((boxes, scores, classes, routes))
+            crops.extend(crop_views(d.array, boxes[routes == ROUTE_CNN]))
+            attrs["detections"] += len(boxes)
+            attrs["skipped"] += int((routes == ROUTE_YOLO).sum())
+            attrs["dropped"] += int((routes == ROUTE_DROP).sum())
+
+    with _stage(timings, "classify", trace, crops=len(crops)):
+        try:
+            labels = classify_crops(crops, classifier, classifier_batch, trace=trace)
+        except Exception as e:
+            if on_classify_error is None:
+                raise
+            on_classify_error(e)
+            labels = [(UNKNOWN_LABEL, 0.0)] * len(crops)
+
+    out, offset = [], 0
+    for r, hit, d in zip(results, found, decoded):
+        names = getattr(r, "names", None) or {}
+        if hit is None:
+            out.append(Detections.empty(names))
+            continue
+        boxes, scores, classes, routes = hit
+        keep = np.flatnonzero(routes != ROUTE_DROP)
+        cnn = routes == ROUTE_CNN
+        label_ids = np.empty(len(boxes), dtype=np.int8)
+        label_scores = scores.astype(np.float32)
+        cnn_labels = labels[offset:offset + int(cnn.sum())]
+        offset += int(cnn.sum())
+        label_ids[cnn] = [_label_id(label) for label, _ in cnn_labels]
+        label_scores[cnn] = [conf for _, conf in cnn_labels]
+        label_ids[~cnn] = [_label_id(cascade.yolo_label(names.get(int(c), c))) for c in classes[~cnn]]
+        out.append(Detections(scale_boxes(boxes[keep], d.scale), scores[keep], classes[keep], label_ids[keep],
+                              label_scores[keep], (routes[keep] == ROUTE_YOLO).astype(np.uint8), keep, names))
+    return out
+
+
+def detect_and_classify_batch(images, yolo_model, classifier, params=None, timings=None, on_classify_error=None,
+                              trace=None, cascade=None):
+    """Run detection and classification on several images at once; returns Detections per image.
+
+    All images go through one YOLO call and all their crops through one
+    batched classifier pass. Per-stage seconds are added to `timings`
+    (decode, detect, crop, classify) when a dict is given, and recorded as
+    spans when a tracing.Trace is given. If classification fails and
+    `on_classify_error` is set, it is called with the exception and the
+    detections are labelled "unknown"; otherwise the exception propagates.
+
+    Encoded images are decoded at a reduced scale close to `imgsz` (see
+    preprocess.decode_scaled); boxes are always in original-resolution
+    pixels. Pass DecodedImage inputs (decode_scaled with decode_size) to
+    render the results afterwards without decoding twice. With
+    `params["tiled"]` images are decoded at full size and detected tile by
+    tile (see tiling.detect_tiled).
+
+    Only boxes the `cascade` policy (default DEFAULT_CASCADE) routes to the
+    CNN are classified; the others take YOLO's label or are dropped.
+    """
+    params = {**DETECT_PARAMS, **(params or {})}
+
+    with _stage(timings, "decode", trace, images=len(images)):
+        # Decode sekali ke satu buffer uint8; crop = view ke buffer ini
+        decoded = [decode_scaled(image, decode_size(params)) for image in images]
+
+    results = detect_decoded(decoded, yolo_model, params, timings, trace)
+    return classify_detections(decoded, results, classifier, params, timings, on_classify_error, trace, cascade)
+
+
+def detect_and_classify(image, yolo_model, classifier, params=None, timings=None, on_classify_error=None,
+                        trace=None, cascade=None):
+    """Run the full pipeline on one image (bytes, path, PIL image, uint8 array or DecodedImage).
+
+    Returns `(detections, result_image)`; see detect_and_classify_batch for
+    `timings`, `trace`, `on_classify_error` and `cascade`. Rendering
+    (render_result) is timed as "render".
+    """
+    params = {**DETECT_PARAMS, **(params or {})}
+    with _stage(timings, "decode", trace, images=1):
+        decoded = decode_scaled(image, decode_size(params))
+    results = detect_decoded([decoded], yolo_model, params, timings, trace)
+    [detections] = classify_detections([decoded], results, classifier, params, timings, on_classify_error, trace,
+                                       cascade)
+    with _stage(timings, "render", trace):
+        img = render_result(decoded, detections, trace)
+    return detections, img
@@ -0,0 +1,267 @@
+"""Image loading and preprocessing helpers shared by the app and the tools.
+
+The fast path decodes an upload once into a single uint8 RGB array. Crops
+are views into that array, resized straight into a preallocated uint8
+batch, and normalised into a reusable float32 buffer, so no float64 or
+per-crop PIL copies are made. Compare it with the old PIL path with
+
+    python preprocess.py "sample_images/Car (6).jpg"
+
+On that 420x295 image (1 CPU, OpenCV 5.0) it measured 1 / 10 / 50 crops at
+0.25 / 3.4 / 25.3 ms legacy vs 0.05 / 0.46 / 2.4 ms fast, with peak
+allocations of 0.5 / 3.9 / 18.9 MB vs 0.27 / 2.4 / 11.8 MB. The fast
+peak is the first call's, which allocates the reused float32 buffer.
+
+Decoding reads the header first and rejects images above
+config.MAX_IMAGE_PIXELS before any pixel data is decoded. Given a target
+size (the detector's imgsz), JPEGs are decoded at a reduced DCT scale
+(1/2, 1/4 or 1/8) that still covers the target, and the returned scale maps
+coordinates back to the original resolution. Compare full and reduced
+decoding of large photos with
+
+    python preprocess.py --decode 960 photo.jpg
+"""
+import argparse
+import glob
+import io
+import os
+import threading
+import time
+import tracemalloc
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+CROP_SIZE = (128, 128)
+
+_buffers = threading.local()
+
+
+def list_images(source):
+    """Sorted image paths from a directory or a glob pattern."""
+    pattern = os.path.join(source, "*") if os.path.isdir(source) else source
+    return sorted(p for p in glob.glob(pattern) if p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+class ImageTooLarge(ValueError):
+    """The image header declares more pixels than the configured limit."""
+
+
+class DecodedImage(NamedTuple):
+    array: np.ndarray  # uint8 RGB (H, W, 3), mungkin lebih kecil dari aslinya
+    scale: tuple  # (sx, sy): piksel asli per piksel hasil decode
+    original_size: tuple  # (width, height) asli
+
+
+def _open(data):
+    if isinstance(data, (bytes, bytearray)):
+        return Image.open(io.BytesIO(data))
+    if isinstance(data, Image.Image):
+        return data
+    return Image.open(data)
+
+
+def _check_size(width, height, max_pixels):
+    max_pixels = config.MAX_IMAGE_PIXELS if max_pixels is None else max_pixels
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLarge(f"image is {width}x{height} ({width * height / 1e6:.0f} MP), "
+                            f"limit is {max_pixels / 1e6:g} MP")
+
+
+def probe_image(data, max_pixels=None):
+    """`(width, height, format)` read from the header only, without decoding pixels.
+
+    Raises ImageTooLarge above `max_pixels` (default config.MAX_IMAGE_PIXELS).
+    """
+    try:
+        img = _open(data)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from e
+    _check_size(img.width, img.height, max_pixels)
+    return img.width, img.height, img.format
+
+
+def _to_rgb(img):
+    # Palet dengan transparansi harus lewat RGBA dulu (PIL memperingatkan kalau langsung ke RGB)
+    if img.mode == "P" and "transparency" in img.info:
+        img = img.convert("RGBA")
+    return img.convert("RGB")
+
+
+def decode_scaled(data, target_size=None, max_pixels=None):
+    """Decode bytes, a path, a PIL image or an array into a DecodedImage.
+
+    The header is checked against `max_pixels` first. With `target_size`,
+    a JPEG larger than that is decoded at the smallest DCT scale whose
+    longest side is still at least `target_size`; other formats are decoded
+    at full size. Already decoded inputs are passed through.
+    """
+    if isinstance(data, DecodedImage):
+        return data
+    if isinstance(data, np.ndarray):
+        h, w = data.shape[:2]
+        return DecodedImage(data, (1.0, 1.0), (w, h))
+    try:
+        img = _open(data)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from e
+    width, height = img.size
+    _check_size(width, height, max_pixels)
+    longest = max(width, height)
+    if target_size and longest > target_size and img.format == "JPEG":
+        # draft() memilih skala DCT terbesar yang hasilnya masih >= ukuran yang diminta
+        img.draft("RGB", (max(1, width * target_size // longest), max(1, height * target_size // longest)))
+    array = np.asarray(_to_rgb(img))
+    h, w = array.shape[:2]
+    return DecodedImage(array, (width / w, height / h), (width, height))
+
+
+def decode_image(data, target_size=None, max_pixels=None):
+    """Decode bytes, a path or a PIL image once into a uint8 RGB array (see decode_scaled)."""
+    if isinstance(data, np.ndarray):
+        return data
+    return decode_scaled(data, target_size, max_pixels).array
+
+
+def scale_boxes(boxes, scale):
+    """Map xyxy boxes from decoded to original pixel coordinates."""
+    boxes = np.asarray(boxes)
+    if tuple(scale) == (1.0, 1.0):
+        return boxes
+    sx, sy = scale
+    return boxes * np.array([sx, sy, sx, sy], dtype=np.float64)
+
+
+def crop_views(image, boxes):
+    """Views into `image` (H, W, 3) for each xyxy box, clipped to the image."""
+    h, w = image.shape[:2]
+    views = []
+    for x1, y1, x2, y2 in np.asarray(boxes, dtype=np.float64).reshape(-1, 4).astype(int):
+        x1, y1 = min(max(x1, 0), w - 1), min(max(y1, 0), h - 1)
+        x2, y2 = max(min(x2, w), x1 + 1), max(min(y2, h), y1 + 1)
+        views.append(image[y1:y2, x1:x2])
+    return views
+
+
+def resize_batch(views, size=CROP_SIZE, out=None):
+    """Resize crop views into one (N, H, W, 3) uint8 batch.
+
+    Each crop is written directly into its slot of `out` (allocated if not
+    given); shrinking uses INTER_AREA, which like PIL's resize filters the
+    source, enlarging uses INTER_CUBIC.
+    """
+    if out is None:
+        out = np.empty((len(views), size[1], size[0], 3), dtype=np.uint8)
+    for view, slot in zip(views, out):
+        shrink = view.shape[0] >= size[1] and view.shape[1] >= size[0]
+        cv2.resize(view, size, dst=slot, interpolation=cv2.INTER_AREA if shrink else cv2.INTER_CUBIC)
+    return out
+
+
+def normalize_batch(batch):
+    """uint8 batch -> float32 [0, 1] in a per-thread buffer reused across calls.
+
+    The returned array is only valid until the next call on the same thread.
+    """
+    buf = getattr(_buffers, "float32", None)
+    if buf is None or buf.shape[1:] != batch.shape[1:] or len(buf) < len(batch):
+        buf = np.empty((max(len(batch), 1), *batch.shape[1:]), dtype=np.float32)
+        _buffers.float32 = buf
+    out = buf[:len(batch)]
+    np.multiply(batch, np.float32(1 / 255.0), out=out, casting="unsafe")
+    return out
+
+
+def _legacy_preprocess(pil_image, boxes):
+    # Jalur lama: PIL crop + resize + np.array / 255.0 (float64) per crop
+    return [np.expand_dims(np.array(pil_image.crop(tuple(map(int, b))).resize(CROP_SIZE)) / 255.0, axis=0)
+            for b in boxes]
+
+
+def _fast_preprocess(image, boxes):
+    return normalize_batch(resize_batch(crop_views(image, boxes)))
+
+
+def _random_boxes(width, height, count, rng):
+    x1 = rng.integers(0, width * 3 // 4, count)
+    y1 = rng.integers(0, height * 3 // 4, count)
+    x2 = np.minimum(x1 + rng.integers(32, max(width // 4, 33), count), width)
+    y2 = np.minimum(y1 + rng.integers(32, max(height // 4, 33), count), height)
+    return np.stack([x1, y1, x2, y2], axis=1)
+
+
+def _measure(fn, repeats):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000, peak
+
+
+def compare_preprocessing(path, counts=(1, 10, 50), repeats=20):
+    """Time (ms) and peak allocation (bytes) of the legacy vs fast crop path.
+
+    The legacy path starts from the decoded PIL image, the fast path from the
+    decoded uint8 array, so only crop/resize/normalise work is compared.
+    """
+    with Image.open(path) as im:
+        pil_image = im.convert("RGB")
+    image = decode_image(pil_image)
+    rng = np.random.default_rng(0)
+    rows = []
+    for count in counts:
+        boxes = _random_boxes(pil_image.width, pil_image.height, count, rng)
+        legacy_ms, legacy_peak = _measure(lambda: _legacy_preprocess(pil_image, boxes), repeats)
+        fast_ms, fast_peak = _measure(lambda: _fast_preprocess(image, boxes), repeats)
+        rows.append({"detections": count, "legacy_ms": legacy_ms, "fast_ms": fast_ms,
+                     "legacy_peak_bytes": legacy_peak, "fast_peak_bytes": fast_peak})
+    return rows
+
+
+def compare_decoding(path, target_size, repeats=5):
+    """Time (ms) and peak allocation (bytes) of a full vs a reduced decode of one file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    width, height, fmt = probe_image(data)
+    full_ms, full_peak = _measure(lambda: np.asarray(_to_rgb(_open(data))), repeats)
+    reduced_ms, reduced_peak = _measure(lambda: decode_scaled(data, target_size), repeats)
+    return {"size": (width, height), "format": fmt,
+            "decoded_size": decode_scaled(data, target_size).array.shape[1::-1],
+            "full_ms": full_ms, "reduced_ms": reduced_ms,
+            "full_peak_bytes": full_peak, "reduced_peak_bytes": reduced_peak}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare legacy and fast crop preprocessing")
+    parser.add_argument("image")
+    parser.add_argument("--counts", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--decode", type=int, metavar="TARGET",
+                        help="instead compare full vs reduced decoding for this target size")
+    args = parser.parse_args(argv)
+
+    if args.decode:
+        row = compare_decoding(args.image, args.decode, args.repeats)
+        print(f"{row['format']} {row['size'][0]}x{row['size'][1]} -> "
+              f"{row['decoded_size'][0]}x{row['decoded_size'][1]} (target {args.decode})")
+        print(f"full decode    {row['full_ms']:8.1f} ms  peak {row['full_peak_bytes'] / 2**20:7.1f} MB")
+        print(f"reduced decode {row['reduced_ms']:8.1f} ms  peak {row['reduced_peak_bytes'] / 2**20:7.1f} MB")
+        return 0
+
+    print(f"{'dets':>5s} {'legacy ms':>10s} {'fast ms':>8s} {'legacy peak':>12s} {'fast peak':>10s}")
+    for row in compare_preprocessing(args.image, args.counts, args.repeats):
+        print(f"{row['detections']:5d} {row['legacy_ms']:10.2f} {row['fast_ms']:8.2f} "
+              f"{row['legacy_peak_bytes'] / 1024:10.0f}KB {row['fast_peak_bytes'] / 1024:8.0f}KB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
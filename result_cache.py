@@ -0,0 +1,147 @@
+"""Content-addressed cache for detection results.
+
+Results are keyed by a hash of the uploaded bytes plus every inference
+parameter that can change the output, so the same image analysed again by
+any session is served without touching the models. Entries live in an
+in-memory LRU tier bounded by a byte budget and, optionally, in an on-disk
+tier that survives restarts.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def file_version(*paths):
+    """Cheap version tag for model files (size + mtime), '-' for missing files.
+
+    A directory (OpenVINO export) is versioned by the files inside it.
+    """
+    parts = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+            parts.append(file_version(*files) if files else "-")
+            continue
+        try:
+            st = os.stat(path)
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append("-")
+    return "|".join(parts)
+
+
+def make_key(image_bytes, **params):
+    """sha256 over the image bytes and the (sorted) inference parameters."""
+    h = hashlib.sha256(image_bytes)
+    h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional disk) cache of `(dets, result_image)`."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, image_format="JPEG"):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.image_format = image_format
+        self._entries = OrderedDict()  # key -> (dets_json, image_bytes)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        """Return `(dets, PIL image)` for `key`, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            entry = self._read_disk(key)
+            with self._lock:
+                if entry is None:
+                    self.misses += 1
+                    return None
+                self.disk_hits += 1
+                self._store(key, entry)
+        dets_json, image_bytes = entry
+        return json.loads(dets_json), Image.open(io.BytesIO(image_bytes))
+
+    def put(self, key, dets, image):
+        buf = io.BytesIO()
+        image.save(buf, format=self.image_format, quality=90)
+        entry = (json.dumps(dets), buf.getvalue())
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _store(self, key, entry):
+        # dipanggil dengan lock terpegang
+        size = len(entry[0]) + len(entry[1])
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old[0]) + len(old[1])
+        self._entries[key] = entry
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (dets_json, image_bytes) = self._entries.popitem(last=False)
+            self._size -= len(dets_json) + len(image_bytes)
+
+    def _paths(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json"), os.path.join(self.disk_dir, f"{key}.img")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        json_path, img_path = self._paths(key)
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                dets_json = f.read()
+            with open(img_path, "rb") as f:
+                image_bytes = f.read()
+        except OSError:
+            return None
+        return dets_json, image_bytes
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        json_path, img_path = self._paths(key)
+        try:
+            # gambar dulu, json terakhir: json yang ada berarti entri lengkap
+            for path, data, mode in ((img_path, entry[1], "wb"), (json_path, entry[0], "w")):
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, mode) as f:
+                    f.write(data)
+                os.replace(tmp, path)
+        except OSError:
+            pass
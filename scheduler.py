@@ -0,0 +1,236 @@
+"""Process-wide inference scheduler shared by all Streamlit sessions.
+
+Instead of every session calling `predict` on the shared models from its
+own script thread, sessions submit jobs to one scheduler that owns the
+engine (engine.VehicleDetector). Jobs queue up, are coalesced across sessions into batches, and run
+on a fixed number of inference threads (default 1, since ultralytics models
+are not thread-safe) with a bounded torch intra-op thread count (default
+min(4, cpu_count); override with SCHEDULER_THREADS or `threads=`), so 20
+simultaneous users share the CPU instead of oversubscribing it. Each
+session gets a Future to wait on. A failing group of jobs only fails its
+own Futures, not those of other sessions batched with it.
+
+Work that cannot be batched as single images (video frames, profiled runs
+that must stay on the session thread) still shares the models through the
+scheduler: `model_lock` is held around every model call, and
+`guarded(model)` wraps a model so each `predict` takes it.
+
+Compare tail latency against every session calling the engine directly
+(the free-for-all the scheduler replaces) with
+
+    python scheduler.py sample_images --standin --clients 20
+"""
+import argparse
+import contextlib
+import os
+import threading
+import time
+
+import numpy as np
+
+import config
+from batcher import ItemError, MicroBatcher
+from tracing import Trace, maybe_span
+
+
+# Batas thread intra-op bila SCHEDULER_THREADS tidak diset: lebih dari ini jarang mempercepat satu batch kecil
+DEFAULT_MAX_THREADS = 4
+
+
+def _params_key(params):
+    return tuple(sorted(params.items()))
+
+
+class GuardedModel:
+    """Model proxy whose `predict` holds `lock`; other attributes pass through."""
+
+    def __init__(self, model, lock):
+        self._model = model
+        self._lock = lock
+
+    def predict(self, *args, **kwargs):
+        with self._lock:
+            return self._model.predict(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class InferenceScheduler:
+    def __init__(self, detector, max_batch_size=None, max_wait_ms=None, workers=None, threads=None):
+        self.detector = detector
+        workers = workers or config.SCHEDULER_WORKERS
+        # Satu worker: model dianggap tidak thread-safe, semua pemakaian di luar batch ikut kunci ini
+        self.model_lock = threading.Lock() if workers == 1 else contextlib.nullcontext()
+        self.threads = threads or config.SCHEDULER_THREADS or min(DEFAULT_MAX_THREADS, os.cpu_count() or 1)
+        self._limit_threads(self.threads)
+        self.batcher = MicroBatcher(
+            self._run_batch,
+            max_batch_size or config.SCHEDULER_MAX_BATCH,
+            config.SCHEDULER_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms,
+            name="inference-scheduler",
+            workers=workers,
+        )
+
+    @staticmethod
+    def _limit_threads(threads):
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    def _run_batch(self, jobs):
+        batch_start = time.perf_counter()
+        # Job dengan parameter berbeda tidak bisa satu panggilan YOLO: kelompokkan
+        groups = {}
+        for i, (image, params, trace, submitted) in enumerate(jobs):
+            groups.setdefault(_params_key(params), []).append(i)
+            if trace is not None:
+                trace.add("queue_wait", batch_start - submitted, start=submitted)
+
+        results = [None] * len(jobs)
+        for indices in groups.values():
+            errors = []
+            traced = [jobs[i][2] for i in indices if jobs[i][2] is not None]
+            group_trace = Trace("batch") if traced else None
+            try:
+                with self.model_lock:
+                    outputs = self.detector.detect_batch(
+                        [jobs[i][0] for i in indices], jobs[indices[0]][1],
+                        on_classify_error=errors.append, trace=group_trace,
+                    )
+            except Exception as e:
+                # Hanya Future kelompok ini yang gagal; kelompok lain tetap mendapat hasilnya
+                for i in indices:
+                    results[i] = ItemError(e)
+                continue
+            for trace in traced:
+                trace.merge(group_trace, batch_size=len(indices))
+            error = errors[0] if errors else None
+            for i, detections in zip(indices, outputs):
+                results[i] = (detections, error)
+        return results
+
+    def submit(self, image, params=None, trace=None):
+        """Queue one image; the Future resolves to `(detections, classify_error)`."""
+        params = self.detector.merged_params(params)
+        # Decode di thread sesi, bukan di thread inferensi (DecodedImage diteruskan apa adanya)
+        with maybe_span(trace, "decode"):
+            image = self.detector.decode(image, params)
+        return self._enqueue(image, params, trace)
+
+    def _enqueue(self, decoded, params, trace):
+        return self.batcher.submit((decoded, params, trace, time.perf_counter()))
+
+    def detect(self, image, params=None, timeout=None, on_classify_error=None, trace=None):
+        """Blocking helper returning `(detections, result_image)` like pipeline.detect_and_classify.
+
+        Rendering runs in the calling (session) thread, outside the scheduler.
+        """
+        params = self.detector.merged_params(params)
+        with maybe_span(trace, "decode"):
+            image = self.detector.decode(image, params)
+        detections, error = self._enqueue(image, params, trace).result(timeout)
+        if error is not None:
+            if on_classify_error is None:
+                raise error
+            on_classify_error(error)
+        with maybe_span(trace, "render"):
+            img = self.detector.render(image, detections, trace)
+        return detections, img
+
+    def guarded(self, model):
+        """`model` with every `predict` serialised against the scheduler's own batches."""
+        return GuardedModel(model, self.model_lock)
+
+    def stats(self):
+        return self.batcher.stats()
+
+    def close(self):
+        self.batcher.close()
+
+
+def load_test(detector, images, clients=20, rounds=5, scheduler=None):
+    """Latency of `clients` threads each running detect + render on `images` `rounds` times.
+
+    Without `scheduler` every client calls the engine directly and
+    concurrently (no coordination); with it, every client goes through
+    `scheduler.detect`.
+    """
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients)
+
+    def client(offset):
+        barrier.wait()
+        for r in range(rounds):
+            image = images[(offset + r) % len(images)]
+            start = time.perf_counter()
+            if scheduler is None:
+                decoded = detector.decode(image)
+                detector.render(decoded, detector.detect(decoded))
+            else:
+                scheduler.detect(image)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    lat = np.array(latencies)
+    return {
+        "requests": len(lat),
+        "images_per_s": len(lat) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tail latency of concurrent sessions with and without the scheduler")
+    parser.add_argument("source", help="directory or glob of images")
+    parser.add_argument("--clients", type=int, default=20, help="simultaneous sessions")
+    parser.add_argument("--rounds", type=int, default=5, help="images per session")
+    parser.add_argument("--max-batch-size", type=int, default=None)
+    parser.add_argument("--max-wait-ms", type=float, default=None)
+    parser.add_argument("--standin", action="store_true",
+                        help="use CPU-bound stand-in models (40 ms per call + 10 ms per image)")
+    args = parser.parse_args(argv)
+
+    from engine import VehicleDetector
+    from preprocess import list_images
+
+    paths = list_images(args.source)
+    if not paths:
+        parser.error(f"no images found in {args.source!r}")
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    if args.standin:
+        from standins import load_standin_models
+        detector = VehicleDetector(*load_standin_models(call_ms=40.0, item_ms=10.0, cpu_bound=True))
+    else:
+        detector = VehicleDetector.load(warmup=True)
+
+    print(f"{args.clients} clients x {args.rounds} images")
+    print(f"{'mode':>9s} {'img/s':>7s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for mode in ("direct", "scheduler"):
+        scheduler = InferenceScheduler(detector, args.max_batch_size, args.max_wait_ms) if mode == "scheduler" else None
+        try:
+            row = load_test(detector, images, args.clients, args.rounds, scheduler)
+        finally:
+            if scheduler is not None:
+                scheduler.close()
+        print(f"{mode:>9s} {row['images_per_s']:7.1f} {row['p50_ms']:8.0f} {row['p95_ms']:8.0f} {row['p99_ms']:8.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
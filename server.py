@@ -0,0 +1,202 @@
+"""HTTP inference service for the car/bike pipeline.
+
+    python server.py serve --port 8000
+    curl --data-binary @"sample_images/Car (6).jpg" http://localhost:8000/detect
+
+POST /detect takes raw image bytes and returns {"dets": [...]} in the same
+format as the app. Concurrent requests are coalesced into micro-batches
+(one YOLO call and one classifier pass per batch) bounded by
+--max-batch-size and --max-wait-ms. GET /stats reports batching counters.
+
+Both commands accept --standin to run with the deterministic stand-in models
+instead of the real weights. `loadtest` compares throughput with and
+without micro-batching:
+
+    python server.py loadtest --standin --requests 200 --concurrency 16
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import pipeline
+from batcher import MicroBatcher
+from engine import VehicleDetector
+from preprocess import ImageTooLarge, list_images
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    server_version = "CarBikeDetection/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.server.batcher.stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/detect":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._send_json(400, {"error": "empty body, expected image bytes"})
+            return
+        try:
+            # Decode di thread request (paralel), hanya inferensi yang di-batch
+            image = self.server.detector.decode(self.rfile.read(length))
+        except ImageTooLarge as e:
+            self._send_json(413, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send_json(400, {"error": f"cannot decode image: {e}"})
+            return
+        start = time.perf_counter()
+        try:
+            dets = self.server.batcher(image, timeout=self.server.request_timeout)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {"dets": dets, "latency_ms": (time.perf_counter() - start) * 1000})
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, yolo_model, classifier, max_batch_size=8, max_wait_ms=10.0, params=None,
+                 request_timeout=60.0, verbose=False):
+        super().__init__(address, InferenceHandler)
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+        self.detector = VehicleDetector(yolo_model, classifier, **(params or {}))
+        self.params = self.detector.params
+
+        def process_batch(images):
+            return [d.to_rows() for d in self.detector.detect_batch(images)]
+
+        self.batcher = MicroBatcher(process_batch, max_batch_size, max_wait_ms, name="inference-batcher")
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+
+def _load_models(standin):
+    if standin:
+        from standins import load_standin_models
+        # Biaya simulasi: 40 ms per panggilan + 10 ms per gambar
+        return load_standin_models(call_ms=40.0, item_ms=10.0)
+    return pipeline.load_models()
+
+
+def run_load_test(models, payloads, requests=200, concurrency=16, max_batch_size=8, max_wait_ms=10.0):
+    """Fire `requests` POSTs from `concurrency` client threads at a local server.
+
+    Returns throughput and latency percentiles for the given batching setup.
+    """
+    server = InferenceServer(("127.0.0.1", 0), *models, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/detect"
+
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        for i in counter:
+            req = urllib.request.Request(url, data=payloads[i % len(payloads)], method="POST")
+            start = time.perf_counter()
+            with urllib.request.urlopen(req) as resp:
+                resp.read()
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stats = server.batcher.stats()
+    server.shutdown()
+    server.server_close()
+
+    lat = np.array(latencies)
+    return {
+        "max_batch_size": max_batch_size,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "mean_batch_size": stats["mean_batch_size"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Car/bike detection HTTP service")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "loadtest"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--standin", action="store_true", help="use deterministic stand-in models")
+        cmd.add_argument("--max-batch-size", type=int, default=8)
+        cmd.add_argument("--max-wait-ms", type=float, default=10.0)
+    serve = sub.choices["serve"]
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--verbose", action="store_true")
+    loadtest = sub.choices["loadtest"]
+    loadtest.add_argument("--images", default="sample_images")
+    loadtest.add_argument("--requests", type=int, default=200)
+    loadtest.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    models = _load_models(args.standin)
+    if args.command == "serve":
+        server = InferenceServer((args.host, args.port), *models, args.max_batch_size, args.max_wait_ms,
+                                 verbose=args.verbose)
+        print(f"Serving on http://{args.host}:{args.port} (max batch {args.max_batch_size}, "
+              f"max wait {args.max_wait_ms} ms)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+
+    payloads = []
+    for path in list_images(args.images):
+        with open(path, "rb") as f:
+            payloads.append(f.read())
+    if not payloads:
+        parser.error(f"no images found in {args.images!r}")
+    print(f"{'batch':>5s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'mean batch':>10s}")
+    for max_batch_size in (1, args.max_batch_size):
+        row = run_load_test(models, payloads, args.requests, args.concurrency, max_batch_size, args.max_wait_ms)
+        print(f"{row['max_batch_size']:5d} {row['throughput_rps']:8.1f} {row['p50_ms']:8.1f} "
+              f"{row['p95_ms']:8.1f} {row['mean_batch_size']:10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
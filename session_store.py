@@ -0,0 +1,196 @@
+"""Compact, bounded storage for per-session artefacts.
+
+Streamlit keeps everything in st.session_state for as long as the session
+lives, so large uploads and result images from idle sessions pile up. The
+app instead keeps them here as encoded bytes (the uploaded file as-is,
+result images re-encoded as WebP/JPEG) and decodes lazily when they are
+displayed. Decoded arrays that are worth keeping between reruns go in
+through `put_object` with their byte size, so they count against the same
+budgets. One store is shared by all sessions in the process and enforces
+a per-session byte budget (oldest unpinned entries of that session go
+first; pinned entries such as the upload are kept, and a new entry that
+only fits by evicting them is rejected), a global byte budget (least
+recently active sessions go first) and an idle TTL after which a
+session's entries are dropped.
+"""
+import io
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+class _Session:
+    __slots__ = ("entries", "sizes", "pinned", "size", "last_access")
+
+    def __init__(self, now):
+        self.entries = OrderedDict()  # key -> bytes atau objek (terlama di depan)
+        self.sizes = {}  # key -> byte yang dihitung ke budget
+        self.pinned = set()  # key yang tidak dikeluarkan oleh batas per sesi
+        self.size = 0
+        self.last_access = now
+
+
+class SessionStore:
+    def __init__(self, max_session_bytes=16 * 1024 * 1024, max_total_bytes=256 * 1024 * 1024, ttl_seconds=1800,
+                 image_format="WEBP", image_quality=80):
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.ttl_seconds = ttl_seconds
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self._sessions = OrderedDict()  # session_id -> _Session, urut dari yang paling lama tidak aktif
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = {"ttl": 0, "session_budget": 0, "global_budget": 0}
+        self.rejected = 0
+
+    def put(self, session_id, key, data, pinned=False):
+        """Store encoded `data` for the session; returns False if it does not fit the per-session budget.
+
+        Over budget, the session's oldest unpinned entries are evicted; if
+        only pinned entries are left, `data` is rejected instead.
+        """
+        data = bytes(data)
+        return self._put(session_id, key, data, len(data), pinned)
+
+    def put_object(self, session_id, key, obj, nbytes, pinned=False):
+        """Store an in-memory object (e.g. a decoded image) counted as `nbytes`; same budgets as `put`."""
+        return self._put(session_id, key, obj, int(nbytes), pinned)
+
+    def _put(self, session_id, key, value, nbytes, pinned):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if nbytes > min(self.max_session_bytes, self.max_total_bytes):
+                self.rejected += 1
+                return False
+            session = self._touch(session_id, now)
+            self._remove(session, key)
+            session.entries[key] = value
+            session.sizes[key] = nbytes
+            if pinned:
+                session.pinned.add(key)
+            session.size += nbytes
+            self._size += nbytes
+            while session.size > self.max_session_bytes:
+                victim = next((k for k in session.entries if k != key and k not in session.pinned), None)
+                if victim is None:
+                    # Entri turunan tidak boleh mengusir upload yang masih ditampilkan
+                    self._remove(session, key)
+                    self.rejected += 1
+                    return False
+                self._remove(session, victim)
+                self.evictions["session_budget"] += 1
+            while self._size > self.max_total_bytes:
+                oldest_id = next(iter(self._sessions))
+                if oldest_id == session_id:
+                    break
+                self._drop_session(oldest_id)
+                self.evictions["global_budget"] += 1
+            return True
+
+    def put_image(self, session_id, key, image, format=None, quality=None):
+        """Encode a PIL image or uint8 array (WebP by default) and store it."""
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        buf = io.BytesIO()
+        image.save(buf, format=format or self.image_format, quality=quality or self.image_quality)
+        return self.put(session_id, key, buf.getvalue())
+
+    def get(self, session_id, key):
+        """Stored bytes (or object) for `key`, or None if never stored or evicted."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None or key not in session.entries:
+                return None
+            self._touch(session_id, now)
+            session.entries.move_to_end(key)
+            return session.entries[key]
+
+    def get_image(self, session_id, key):
+        """Decoded PIL image for `key`, or None."""
+        data = self.get(session_id, key)
+        return Image.open(io.BytesIO(data)) if data is not None else None
+
+    def drop(self, session_id, *keys):
+        """Remove the given keys of a session, or the whole session when no keys are given."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            if not keys:
+                self._drop_session(session_id)
+                return
+            for key in keys:
+                self._remove(session, key)
+
+    def session_stats(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return {"bytes": 0, "entries": {}}
+            return {"bytes": session.size, "entries": dict(session.sizes)}
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._size,
+                "max_total_bytes": self.max_total_bytes,
+                "max_session_bytes": self.max_session_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": dict(self.evictions),
+                "rejected": self.rejected,
+            }
+
+    # Semua helper di bawah dipanggil dengan lock terpegang
+
+    def _touch(self, session_id, now):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session(now)
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _remove(self, session, key):
+        session.pinned.discard(key)
+        if session.entries.pop(key, None) is not None:
+            nbytes = session.sizes.pop(key)
+            session.size -= nbytes
+            self._size -= nbytes
+
+    def _drop_session(self, session_id):
+        session = self._sessions.pop(session_id)
+        self._size -= session.size
+
+    def _expire(self, now):
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.ttl_seconds:
+                break
+            self._drop_session(session_id)
+            self.evictions["ttl"] += 1
+
+
+def estimate_size(obj):
+    """Rough in-memory size in bytes of a session_state value (arrays and images by pixel data)."""
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return len(obj)
+    if isinstance(obj, np.ndarray) or hasattr(obj, "nbytes"):
+        # array, atau objek berbasis array seperti pipeline.Detections
+        return obj.nbytes
+    if isinstance(obj, Image.Image):
+        return obj.width * obj.height * len(obj.getbands())
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(estimate_size(v) for v in obj)
+    return sys.getsizeof(obj)
@@ -0,0 +1,108 @@
+"""Deterministic stand-ins for the YOLO detector and the CNN classifier.
+
+They expose the same interfaces as detector.YoloDetector and the classifier
+backends, need no weights and no TensorFlow/PyTorch, and derive their
+output from the image pixels so repeated runs give identical results. An
+optional simulated cost (fixed per call + per item) makes batching effects
+visible in load tests and benchmarks on machines without the real models.
+By default the cost is a sleep; with `cpu_bound=True` it is spent burning
+CPU while holding the GIL, so concurrent calls contend like real inference
+on a busy machine.
+"""
+import time
+import zlib
+
+import cv2
+import numpy as np
+
+from boxes import ArrayBoxes
+
+
+class StandInResult:
+    def __init__(self, image, boxes, names):
+        self.orig_img = image
+        self.boxes = boxes
+        self.names = names
+
+    def plot(self):
+        canvas = np.ascontiguousarray(self.orig_img).copy()
+        for x1, y1, x2, y2 in self.boxes.xyxy.numpy().astype(int):
+            cv2.rectangle(canvas, (x1, y1), (x2, y2), (167, 139, 250), 2)
+        return canvas
+
+
+def _seed(image):
+    return zlib.crc32(np.ascontiguousarray(image[::16, ::16]).data) ^ image.shape[0] ^ (image.shape[1] << 16)
+
+
+def _simulate(call_ms, item_ms, n, cpu_bound=False):
+    cost = (call_ms + item_ms * n) / 1000
+    if cost <= 0:
+        return
+    if not cpu_bound:
+        time.sleep(cost)
+        return
+    # Waktu CPU thread ini, bukan jam dinding: panggilan bersamaan saling memperlambat
+    end = time.thread_time() + cost
+    while time.thread_time() < end:
+        pass
+
+
+class StandInDetector:
+    """YOLO stand-in returning 0..max_boxes pseudo-random boxes per image."""
+
+    backend = "standin"
+    names = {0: "car", 1: "motorcycle"}
+
+    def __init__(self, max_boxes=6, call_ms=0.0, image_ms=0.0, imgsz=960, cpu_bound=False):
+        self.max_boxes = max_boxes
+        self.call_ms = call_ms
+        self.image_ms = image_ms
+        self.imgsz = imgsz
+        self.cpu_bound = cpu_bound
+
+    def predict(self, source, imgsz=None, conf=0.45, max_det=50, **kwargs):
+        images = source if isinstance(source, (list, tuple)) else [source]
+        _simulate(self.call_ms, self.image_ms, len(images), self.cpu_bound)
+        return [self._detect(np.asarray(img), conf, max_det) for img in images]
+
+    def _detect(self, image, conf, max_det):
+        h, w = image.shape[:2]
+        rng = np.random.default_rng(_seed(image))
+        n = int(rng.integers(0, self.max_boxes + 1))
+        x1 = rng.uniform(0, w * 0.8, n)
+        y1 = rng.uniform(0, h * 0.8, n)
+        x2 = np.minimum(x1 + rng.uniform(w * 0.05, w * 0.3, n), w)
+        y2 = np.minimum(y1 + rng.uniform(h * 0.05, h * 0.3, n), h)
+        scores = rng.uniform(0.3, 0.99, n).astype(np.float32)
+        keep = np.argsort(-scores)[:max_det]
+        keep = keep[scores[keep] >= conf]
+        xyxy = np.stack([x1, y1, x2, y2], axis=1).astype(np.float32)[keep]
+        cls = rng.integers(0, 2, n).astype(np.float32)[keep]
+        return StandInResult(image, ArrayBoxes(xyxy, scores[keep], cls), self.names)
+
+
+class StandInClassifier:
+    """Classifier backend stand-in: sigmoid of the crop's red/blue balance."""
+
+    name = "standin"
+
+    def __init__(self, call_ms=0.0, crop_ms=0.0, cpu_bound=False):
+        self.call_ms = call_ms
+        self.crop_ms = crop_ms
+        self.cpu_bound = cpu_bound
+
+    def predict(self, batch):
+        """uint8 batch (N, 128, 128, 3) -> sigmoid scores (N,)"""
+        _simulate(self.call_ms, self.crop_ms, len(batch), self.cpu_bound)
+        if len(batch) == 0:
+            return np.zeros(0, dtype=np.float32)
+        means = batch.reshape(len(batch), -1, 3).mean(axis=1)
+        logits = (means[:, 0] - means[:, 2]) / 32.0
+        return (1 / (1 + np.exp(-logits))).astype(np.float32)
+
+
+def load_standin_models(call_ms=0.0, item_ms=0.0, cpu_bound=False):
+    """(detector, classifier) stand-ins; costs in ms are shared by both models."""
+    return (StandInDetector(call_ms=call_ms, image_ms=item_ms, cpu_bound=cpu_bound),
+            StandInClassifier(call_ms=call_ms, crop_ms=item_ms / 10, cpu_bound=cpu_bound))
@@ -0,0 +1,266 @@
+"""Streaming detect-then-classify over any iterable of images.
+
+`detect_stream` runs the pipeline's stages concurrently instead of one
+after another per image:
+
+    feeder -> decode pool -> detect thread -> crop/classify thread -> render pool -> caller
+
+Stages are connected by bounded queues, so while the classifier works on
+one batch the detector already runs the next and the decode pool reads the
+ones after it, and memory stays bounded however long the input is. The
+models are only ever called from their own stage thread (YOLO from the
+detect thread, the CNN from the classify thread), like in the scheduler.
+The detect thread batches whatever decoded images are ready, up to
+`batch_size`, into one YOLO call. Results are yielded in input order.
+
+Compare against calling pipeline.detect_and_classify in a loop with
+
+    python streaming.py sample_images --standin --repeat 20
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, NamedTuple, Optional
+
+import pipeline
+from preprocess import decode_scaled, list_images
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class StreamResult(NamedTuple):
+    index: int
+    source: Any
+    detections: Any  # pipeline.Detections (kosong jika gagal decode)
+    image: Any  # PIL image dari render_result, None jika render=False atau gagal
+    error: Optional[BaseException] = None
+    timings: Optional[dict] = None  # detik per tahap untuk gambar ini (tahap batch: bagian rata-rata per gambar)
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _END
+
+
+def detect_stream(images, yolo_model, classifier, params=None, batch_size=8, decode_workers=None, render=True,
+                  render_workers=None, queue_size=None, cascade=None, stats=None):
+    """Yield a StreamResult per item of `images` (paths, bytes, PIL images or arrays), in order.
+
+    An item that cannot be decoded yields a result with `error` set and no
+    detections; errors in the models end the stream by raising in the
+    caller. Each result carries its own per-stage seconds in `timings`;
+    detect, crop and classify run per batch, so an image gets its batch's
+    time divided by the batch's image count. `queue_size` (default
+    2 * batch_size) bounds each queue between stages. `stats`, if a dict,
+    receives image/batch/error counts, per-stage busy seconds (decode is
+    summed over the pool) and the wall time. Closing the generator early
+    stops all stages.
+    """
+    params = {**pipeline.DETECT_PARAMS, **(params or {})}
+    size = pipeline.decode_size(params)
+    queue_size = queue_size or 2 * batch_size
+    cpus = os.cpu_count() or 1
+    decode_pool = ThreadPoolExecutor(decode_workers or min(4, cpus), thread_name_prefix="stream-decode")
+    render_pool = ThreadPoolExecutor(render_workers or min(2, cpus), thread_name_prefix="stream-render")
+    decoded_q, detected_q, out_q = (queue.Queue(queue_size), queue.Queue(2), queue.Queue(queue_size))
+    stop = threading.Event()
+    stats = stats if stats is not None else {}
+    stats.update(images=0, batches=0, errors=0, decode=0.0)
+    timings = stats.setdefault("stages", {})
+    stats_lock = threading.Lock()
+
+    def decode(item):
+        start = time.perf_counter()
+        try:
+            return decode_scaled(item, size), time.perf_counter() - start
+        finally:
+            with stats_lock:
+                stats["decode"] += time.perf_counter() - start
+
+    def render_image(decoded, detections):
+        start = time.perf_counter()
+        return pipeline.render_result(decoded, detections), time.perf_counter() - start
+
+    def add_batch(stage_timings):
+        for stage, seconds in stage_timings.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+    def feed():
+        try:
+            for index, item in enumerate(images):
+                if not _put(decoded_q, (index, item, decode_pool.submit(decode, item)), stop):
+                    return
+        except BaseException as e:
+            _put(decoded_q, _Failure(e), stop)
+            return
+        _put(decoded_q, _END, stop)
+
+    def detect():
+        try:
+            done = False
+            while not done:
+                first = _get(decoded_q, stop)
+                if first is _END or isinstance(first, _Failure):
+                    _put(detected_q, first, stop)
+                    return
+                batch = [first]
+                # Ambil yang sudah siap saja, tanpa menunggu batch penuh
+                while len(batch) < batch_size:
+                    try:
+                        item = decoded_q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _END or isinstance(item, _Failure):
+                        done = item
+                        break
+                    batch.append(item)
+
+                rows = []
+                for index, item, future in batch:
+                    try:
+                        decoded, decode_s = future.result()
+                        rows.append((index, item, decoded, {"decode": decode_s}, None))
+                    except Exception as e:
+                        rows.append((index, item, None, None, e))
+                ok = [row[2] for row in rows if row[4] is None]
+                batch_timings = {}
+                results = pipeline.detect_decoded(ok, yolo_model, params, batch_timings) if ok else []
+                add_batch(batch_timings)
+                if not _put(detected_q, (rows, ok, results, batch_timings), stop):
+                    return
+                stats["batches"] += 1
+                if done:
+                    _put(detected_q, done, stop)
+        except BaseException as e:
+            _put(detected_q, _Failure(e), stop)
+
+    def classify():
+        try:
+            while True:
+                batch = _get(detected_q, stop)
+                if batch is _END or isinstance(batch, _Failure):
+                    _put(out_q, batch, stop)
+                    return
+                rows, ok, results, batch_timings = batch
+                classify_timings = {}
+                outputs = iter(pipeline.classify_detections(ok, results, classifier, params, classify_timings,
+                                                            cascade=cascade))
+                add_batch(classify_timings)
+                # Waktu tahap batch dibagi rata ke gambar di dalamnya (batch tanpa gambar valid: tidak ada yang dibagi)
+                shared = ({stage: seconds / len(ok) for stage, seconds in {**batch_timings, **classify_timings}.items()}
+                          if ok else {})
+                for index, item, decoded, image_timings, error in rows:
+                    if error is not None:
+                        row = (index, item, pipeline.Detections.empty(), None, error, None)
+                    else:
+                        detections = next(outputs)
+                        image = render_pool.submit(render_image, decoded, detections) if render else None
+                        row = (index, item, detections, image, None, {**image_timings, **shared})
+                    if not _put(out_q, row, stop):
+                        return
+        except BaseException as e:
+            _put(out_q, _Failure(e), stop)
+
+    threads = [threading.Thread(target=fn, name=f"stream-{fn.__name__}", daemon=True)
+               for fn in (feed, detect, classify)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            row = out_q.get()
+            if row is _END:
+                return
+            if isinstance(row, _Failure):
+                raise row.error
+            index, item, detections, image, error, image_timings = row
+            if image is not None:
+                image, image_timings["render"] = image.result()
+            stats["images"] += 1
+            stats["errors"] += error is not None
+            yield StreamResult(index, item, detections, image, error, image_timings)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        decode_pool.shutdown(wait=True, cancel_futures=True)
+        render_pool.shutdown(wait=True, cancel_futures=True)
+        stats["wall_s"] = time.perf_counter() - start
+
+
+def compare_streaming(paths, yolo_model, classifier, params=None, batch_size=8):
+    """Images/s of detect_and_classify in a loop vs detect_stream over the same `paths`."""
+    start = time.perf_counter()
+    loop_dets = [pipeline.detect_and_classify(path, yolo_model, classifier, params)[0].to_rows() for path in paths]
+    loop_s = time.perf_counter() - start
+
+    stats = {}
+    start = time.perf_counter()
+    stream_dets = [r.detections.to_rows()
+                   for r in detect_stream(paths, yolo_model, classifier, params, batch_size, stats=stats)]
+    stream_s = time.perf_counter() - start
+    return {
+        "images": len(paths),
+        "loop_s": loop_s,
+        "stream_s": stream_s,
+        "loop_images_per_s": len(paths) / loop_s,
+        "stream_images_per_s": len(paths) / stream_s,
+        "speedup": loop_s / stream_s,
+        "same_output": loop_dets == stream_dets,
+        "mean_batch_size": len(paths) / stats["batches"] if stats["batches"] else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the streaming pipeline with a per-image loop")
+    parser.add_argument("source", help="directory or glob of images")
+    parser.add_argument("--repeat", type=int, default=1, help="repeat the image list to get a longer stream")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--profile", choices=sorted(pipeline.PROFILES), default=None)
+    parser.add_argument("--standin", action="store_true", help="use deterministic stand-in models")
+    parser.add_argument("--standin-call-ms", type=float, default=20.0)
+    parser.add_argument("--standin-item-ms", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    paths = list_images(args.source) * args.repeat
+    if not paths:
+        parser.error(f"no images found in {args.source!r}")
+    if args.standin:
+        from standins import load_standin_models
+        yolo_model, classifier = load_standin_models(args.standin_call_ms, args.standin_item_ms)
+    else:
+        yolo_model, classifier = pipeline.load_models()
+
+    row = compare_streaming(paths, yolo_model, classifier, pipeline.profile_params(args.profile), args.batch_size)
+    print(f"{row['images']} images")
+    print(f"  loop    {row['loop_s']:7.2f} s  {row['loop_images_per_s']:6.1f} img/s")
+    print(f"  stream  {row['stream_s']:7.2f} s  {row['stream_images_per_s']:6.1f} img/s  "
+          f"(x{row['speedup']:.2f}, mean batch {row['mean_batch_size']:.1f})")
+    print(f"  same detections: {'yes' if row['same_output'] else 'NO'}")
+    return 0 if row["same_output"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
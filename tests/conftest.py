@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Modul aplikasi ada di akar repo, bukan di paket
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+SAMPLE_IMAGES = os.path.join(ROOT, "sample_images")
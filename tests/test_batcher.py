@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from batcher import ItemError, MicroBatcher
+
+
+def test_concurrent_items_share_one_batch():
+    release = threading.Event()
+    batches = []
+
+    def process(items):
+        release.wait(5)
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=200)
+    try:
+        # process ditahan: item yang datang selama itu menumpuk dan dikumpulkan per batch (maks 4)
+        first = batcher.submit(0)
+        futures = [batcher.submit(i) for i in range(1, 5)]
+        release.set()
+        assert first.result(5) == 0
+        assert [f.result(5) for f in futures] == [2, 4, 6, 8]
+        assert all(len(batch) <= 4 for batch in batches)
+        assert sum(len(batch) for batch in batches) == 5
+        assert len(batches) < 5
+        stats = batcher.stats()
+        assert stats["items"] == 5 and stats["batches"] == len(batches)
+    finally:
+        batcher.close()
+
+
+def test_item_error_fails_only_that_future():
+    def process(items):
+        return [ItemError(ValueError(item)) if item == "bad" else item for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(item) for item in ("a", "bad", "b")]
+        assert futures[0].result(5) == "a"
+        with pytest.raises(ValueError, match="bad"):
+            futures[1].result(5)
+        assert futures[2].result(5) == "b"
+    finally:
+        batcher.close()
+
+
+def test_exception_in_process_batch_fails_the_whole_batch():
+    def process(items):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model crashed"):
+                future.result(5)
+        # Worker tetap hidup setelah batch gagal
+        batcher.process_batch = lambda items: items
+        assert batcher(7, timeout=5) == 7
+    finally:
+        batcher.close()
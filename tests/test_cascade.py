@@ -0,0 +1,35 @@
+import pytest
+
+from cascade import ROUTE_CNN, ROUTE_DROP, ROUTE_YOLO, CascadePolicy
+
+NAMES = {0: "car", 1: "motorcycle", 2: "truck"}
+
+
+def test_off_by_default_routes_everything_to_the_cnn(monkeypatch):
+    monkeypatch.setattr("config.CASCADE_SKIP_CONF", 0.0)
+    monkeypatch.setattr("config.CASCADE_MIN_AREA", 0.0)
+    policy = CascadePolicy()
+    assert not policy.enabled
+    routes = policy.route([(0, 0, 10, 10)] * 2, [0.99, 0.5], [0, 1], NAMES)
+    assert routes.tolist() == [ROUTE_CNN, ROUTE_CNN]
+
+
+def test_confident_mapped_classes_skip_the_cnn():
+    policy = CascadePolicy(skip_conf=0.9, min_area=0)
+    routes = policy.route([(0, 0, 10, 10)] * 3, [0.95, 0.95, 0.5], [0, 2, 1], NAMES)
+    # truck tidak punya label CNN: tetap diklasifikasi
+    assert routes.tolist() == [ROUTE_YOLO, ROUTE_CNN, ROUTE_CNN]
+    assert policy.stats()["avoided_rate"] == pytest.approx(1 / 3)
+
+
+def test_min_area_is_in_original_pixels():
+    policy = CascadePolicy(skip_conf=0, min_area=400, small_boxes="drop")
+    box = [(0, 0, 10, 10)]  # 100 px^2 di gambar hasil decode
+    assert policy.route(box, [0.9], [0], NAMES).tolist() == [ROUTE_DROP]
+    # Decode 1/2: kotak yang sama mencakup 400 px^2 gambar asli
+    assert policy.route(box, [0.9], [0], NAMES, scale=(2.0, 2.0)).tolist() == [ROUTE_CNN]
+
+
+def test_unknown_small_box_policy_is_rejected():
+    with pytest.raises(ValueError):
+        CascadePolicy(small_boxes="shrink")
@@ -0,0 +1,21 @@
+import json
+
+import numpy as np
+
+from pipeline import Detections
+
+
+def test_dict_round_trip_through_json_keeps_arrays_and_dtypes():
+    dets = Detections([(1.5, 2, 3, 4), (5, 6, 7, 8)], [0.9, 0.8], [0, 1], [1, -1], [0.7, 0.0], [0, 1], [0, 3],
+                      {0: "car", 1: "motorcycle"})
+    back = Detections.from_dict(json.loads(json.dumps(dets.to_dict())))
+    for name in ("boxes", "scores", "classes", "labels", "label_scores", "sources", "ids"):
+        np.testing.assert_array_equal(getattr(back, name), getattr(dets, name))
+        assert getattr(back, name).dtype == getattr(dets, name).dtype
+    assert back.class_names == {0: "car", 1: "motorcycle"}
+    assert back.to_rows() == dets.to_rows()
+
+
+def test_empty_round_trip():
+    back = Detections.from_dict(json.loads(json.dumps(Detections.empty({0: "car"}).to_dict())))
+    assert len(back) == 0 and back.boxes.shape == (0, 4)
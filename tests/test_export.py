@@ -0,0 +1,73 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from export import JsonlExportWriter, export_stream, open_writer
+from pipeline import SOURCES, Detections
+from streaming import StreamResult
+
+
+def _detections():
+    return Detections([(1, 2, 3, 4), (5, 6, 7, 8)], [0.9, 0.8], [0, 1], [0, -1], [0.7, 0.0], [0, 0], [0, 2],
+                      {0: "car", 1: "motorcycle"})
+
+
+def _results():
+    timings = {"decode": 0.001, "detect": 0.002}
+    return [
+        StreamResult(0, "a.jpg", _detections(), None, None, timings),
+        StreamResult(1, "broken.jpg", Detections.empty(), None, OSError("cannot decode"), None),
+        StreamResult(2, "empty.jpg", Detections.empty(), None, None, timings),
+    ]
+
+
+def _jsonl(results):
+    buf = io.BytesIO()
+    with JsonlExportWriter(buf) as writer:
+        failed = export_stream(results, writer)
+    return failed, writer, [json.loads(line) for line in buf.getvalue().decode().splitlines()]
+
+
+def test_failed_images_are_counted_not_written():
+    failed, writer, records = _jsonl(_results())
+    assert failed == 1
+    assert writer.images == 2
+    assert {r["image"] for r in records} == {"a.jpg", "empty.jpg"}
+
+
+def test_image_without_detections_gets_a_null_sentinel_row():
+    _, _, records = _jsonl(_results())
+    [empty] = [r for r in records if r["image"] == "empty.jpg"]
+    assert empty["image_id"] == 1 and empty["det_id"] == 0
+    assert all(empty[k] is None for k in ("x1", "det_score", "yolo_class", "yolo_class_name", "label",
+                                          "label_score", "label_source", "crop_ms"))
+    assert empty["decode_ms"] == pytest.approx(1.0)
+
+
+def test_detection_rows_carry_ids_labels_and_timings():
+    _, _, records = _jsonl(_results())
+    rows = [r for r in records if r["image"] == "a.jpg"]
+    assert [r["det_id"] for r in rows] == [1, 3]
+    assert [r["label"] for r in rows] == ["car", "unknown"]
+    assert rows[0]["label_source"] == SOURCES[0]
+    assert rows[0]["detect_ms"] == pytest.approx(2.0)
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_arrow_formats_write_nulls(fmt):
+    pa = pytest.importorskip("pyarrow")
+    buf = io.BytesIO()
+    with open_writer(buf, fmt, row_group_size=2) as writer:
+        export_stream(_results(), writer)
+    buf.seek(0)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(buf)
+    else:
+        table = pa.ipc.open_file(buf).read_all()
+    assert table.num_rows == 3
+    empty = table.filter(pa.compute.equal(table["image"], "empty.jpg")).to_pylist()[0]
+    assert empty["x1"] is None and empty["label"] is None and empty["yolo_class"] is None
+    assert np.isclose(empty["decode_ms"], 1.0)
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import InferenceScheduler
+
+
+class FakeDetector:
+    """Records how many model calls overlap; params {"fail": True} make a group raise."""
+
+    def __init__(self, delay=0.005):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.batch_sizes = []
+        self._lock = threading.Lock()
+
+    def merged_params(self, params=None):
+        return dict(params or {})
+
+    def decode(self, image, params=None):
+        return image
+
+    def render(self, image, detections, trace=None):
+        return image
+
+    def predict(self, *args, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+
+    def detect_batch(self, images, params=None, on_classify_error=None, trace=None):
+        self.predict()
+        self.batch_sizes.append(len(images))
+        if params.get("fail"):
+            raise RuntimeError("boom")
+        return [f"dets:{image}" for image in images]
+
+
+@pytest.fixture
+def scheduler():
+    detector = FakeDetector()
+    scheduler = InferenceScheduler(detector, max_batch_size=8, max_wait_ms=50, workers=1, threads=1)
+    yield scheduler
+    scheduler.close()
+
+
+def test_jobs_are_batched(scheduler):
+    futures = [scheduler.submit(i) for i in range(6)]
+    assert [f.result(5)[0] for f in futures] == [f"dets:{i}" for i in range(6)]
+    assert max(scheduler.detector.batch_sizes) > 1
+
+
+def test_failing_group_only_fails_its_own_futures(scheduler):
+    ok = scheduler.submit("a")
+    bad = scheduler.submit("b", {"fail": True})
+    assert ok.result(5) == ("dets:a", None)
+    with pytest.raises(RuntimeError, match="boom"):
+        bad.result(5)
+
+
+def test_guarded_model_never_overlaps_batches(scheduler):
+    detector = scheduler.detector
+    model = scheduler.guarded(detector)
+
+    def direct():
+        for _ in range(10):
+            model.predict()
+
+    threads = [threading.Thread(target=direct) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    futures = [scheduler.submit(i) for i in range(20)]
+    for f in futures:
+        f.result(5)
+    for thread in threads:
+        thread.join()
+    assert detector.max_active == 1
+    assert model.delay == detector.delay  # atribut lain diteruskan ke model asli
+
+
+def test_default_thread_count_is_bounded(monkeypatch):
+    monkeypatch.setattr("config.SCHEDULER_THREADS", 0)
+    monkeypatch.setattr("os.cpu_count", lambda: 64)
+    monkeypatch.setattr(InferenceScheduler, "_limit_threads", staticmethod(lambda threads: None))
+    scheduler = InferenceScheduler(FakeDetector(), workers=1)
+    try:
+        assert scheduler.threads == 4
+    finally:
+        scheduler.close()
@@ -0,0 +1,61 @@
+from session_store import SessionStore
+
+
+def test_session_budget_evicts_oldest_unpinned_entry():
+    store = SessionStore(max_session_bytes=100, max_total_bytes=1000)
+    assert store.put("s", "upload", b"u" * 40, pinned=True)
+    assert store.put("s", "result", b"r" * 30)
+    assert store.put("s", "export_csv", b"c" * 20)
+    assert store.put("s", "profile", b"p" * 30)
+    assert store.get("s", "upload") is not None
+    assert store.get("s", "result") is None
+    assert store.session_stats("s")["bytes"] == 90
+
+
+def test_entry_that_only_fits_by_evicting_pinned_is_rejected():
+    store = SessionStore(max_session_bytes=100, max_total_bytes=1000)
+    assert store.put("s", "upload", b"u" * 80, pinned=True)
+    assert not store.put("s", "result", b"r" * 30)
+    assert store.get("s", "upload") is not None
+    assert store.get("s", "result") is None
+    assert store.rejected == 1
+
+
+def test_replacing_pinned_key_unpins_when_stored_unpinned():
+    store = SessionStore(max_session_bytes=100, max_total_bytes=1000)
+    store.put("s", "upload", b"u" * 60, pinned=True)
+    store.put("s", "upload", b"u" * 60)
+    assert store.put("s", "result", b"r" * 60)
+    assert store.get("s", "upload") is None
+
+
+def test_global_budget_drops_least_recently_active_session():
+    store = SessionStore(max_session_bytes=100, max_total_bytes=150)
+    store.put("a", "upload", b"a" * 80, pinned=True)
+    store.put("b", "upload", b"b" * 80, pinned=True)
+    assert store.get("a", "upload") is None
+    assert store.get("b", "upload") is not None
+    assert store.evictions["global_budget"] == 1
+
+
+def test_ttl_drops_idle_sessions(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("session_store.time.monotonic", lambda: now[0])
+    store = SessionStore(ttl_seconds=10)
+    store.put("s", "upload", b"x", pinned=True)
+    now[0] += 11
+    assert store.get("s", "upload") is None
+    assert store.evictions["ttl"] == 1
+
+
+def test_objects_count_against_the_budget_and_go_before_the_upload():
+    store = SessionStore(max_session_bytes=100, max_total_bytes=1000)
+    store.put("s", "upload", b"u" * 40, pinned=True)
+    decoded = object()
+    assert store.put_object("s", "decoded", decoded, 50)
+    assert store.get("s", "decoded") is decoded
+    assert store.session_stats("s") == {"bytes": 90, "entries": {"upload": 40, "decoded": 50}}
+    assert store.put("s", "result", b"r" * 30)
+    assert store.get("s", "decoded") is None
+    assert store.get("s", "upload") is not None
+    assert not store.put_object("s", "decoded", decoded, 101)
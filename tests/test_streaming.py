@@ -0,0 +1,40 @@
+import io
+import os
+
+import pytest
+
+from export import CsvExportWriter, export_stream
+from standins import load_standin_models
+from streaming import detect_stream
+
+GOOD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_images", "Car (6).jpg")
+
+
+@pytest.fixture(scope="module")
+def models():
+    return load_standin_models()
+
+
+@pytest.mark.parametrize("bad", [b"not an image", "missing.jpg"])
+def test_undecodable_item_yields_error_result(models, bad):
+    results = list(detect_stream([GOOD, bad], *models, batch_size=1, render=False))
+    assert [r.index for r in results] == [0, 1]
+    assert results[0].error is None and results[0].timings["detect"] >= 0
+    assert results[1].error is not None
+    assert len(results[1].detections) == 0
+
+
+def test_export_survives_undecodable_item(models):
+    buf = io.BytesIO()
+    with CsvExportWriter(buf) as writer:
+        failed = export_stream(detect_stream([GOOD, "missing.jpg", GOOD], *models, batch_size=1, render=False),
+                               writer)
+    assert failed == 1
+    assert writer.images == 2
+
+
+def test_stream_matches_input_order(models):
+    paths = [GOOD] * 5
+    results = list(detect_stream(paths, *models, batch_size=3, render=False))
+    assert [r.index for r in results] == list(range(5))
+    assert all(r.detections.to_rows() == results[0].detections.to_rows() for r in results)
@@ -0,0 +1,17 @@
+"""Guards for the Streamlit internals app.release_upload relies on (version pinned in requirements.txt)."""
+from streamlit.runtime.memory_uploaded_file_manager import MemoryUploadedFileManager
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.uploaded_file_manager import UploadedFileRec
+
+
+def test_memory_file_manager_can_release_one_upload():
+    manager = MemoryUploadedFileManager("/_stcore/upload_file")
+    for file_id in ("a", "b"):
+        manager.add_file("session", UploadedFileRec(file_id=file_id, name=f"{file_id}.jpg", type="image/jpeg",
+                                                    data=b"x" * 10))
+    manager.remove_file(session_id="session", file_id="a")
+    assert [f.file_id for f in manager.get_files("session", ["a", "b"])] == ["b"]
+
+
+def test_script_run_ctx_is_none_outside_a_script_run():
+    assert get_script_run_ctx() is None
@@ -0,0 +1,47 @@
+import numpy as np
+
+from tiling import merge_tiles, nms, seam_truncated, tile_grid
+
+
+def test_tile_grid_covers_image_with_edge_aligned_tiles():
+    windows = tile_grid(1000, 600, 512, overlap=0.2)
+    assert windows[0] == (0, 0, 512, 512)
+    assert max(w[2] for w in windows) == 1000 and max(w[3] for w in windows) == 600
+    assert all(w[2] - w[0] == 512 and w[3] - w[1] == 512 for w in windows)
+
+
+def test_seam_truncated_ignores_image_edges():
+    windows = [(0, 0, 500, 500), (0, 0, 500, 500)]
+    boxes = [(400, 100, 500, 200), (0, 100, 100, 200)]
+    # Tepi kanan window 500 ada di dalam gambar 1000 px (sambungan); tepi kiri 0 adalah tepi gambar
+    assert seam_truncated(boxes, windows, (1000, 500)).tolist() == [True, False]
+
+
+def test_merge_removes_cut_half_across_a_seam():
+    boxes = [(300, 100, 600, 200),  # utuh, dari window 1
+             (300, 100, 400, 200)]  # potongan di sambungan window 0
+    kept = merge_tiles(boxes, scores=[0.7, 0.9], classes=[0, 0], window_ids=[1, 0], truncated=[False, True])
+    assert kept.tolist() == [0]
+
+
+def test_merge_keeps_small_vehicle_inside_a_larger_one():
+    boxes = [(0, 0, 400, 400), (100, 100, 150, 150)]
+    # Window sama dan tidak terpotong: IoS tidak berlaku, IoU kecil
+    kept = merge_tiles(boxes, [0.9, 0.8], [0, 1], window_ids=[0, 0], truncated=[False, False])
+    assert sorted(kept.tolist()) == [0, 1]
+    kept = merge_tiles(boxes, [0.9, 0.8], [0, 0], window_ids=[0, 0], truncated=[False, False])
+    assert sorted(kept.tolist()) == [0, 1]
+
+
+def test_merge_is_class_aware():
+    boxes = [(0, 0, 100, 100), (0, 0, 100, 100)]
+    kept = merge_tiles(boxes, [0.9, 0.8], [0, 1], window_ids=[0, 1], truncated=[False, False])
+    assert sorted(kept.tolist()) == [0, 1]
+    kept = merge_tiles(boxes, [0.9, 0.8], [0, 0], window_ids=[0, 1], truncated=[False, False])
+    assert kept.tolist() == [0]
+
+
+def test_nms_keeps_highest_score_per_class():
+    boxes = np.array([(0, 0, 10, 10), (1, 1, 10, 10), (0, 0, 10, 10)], dtype=np.float32)
+    assert nms(boxes, [0.5, 0.9, 0.8], 0.5).tolist() == [1]
+    assert nms(boxes, [0.5, 0.9, 0.8], 0.5, classes=[0, 0, 1]).tolist() == [1, 2]
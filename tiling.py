@@ -0,0 +1,252 @@
+"""Tiled (sliced) detection for very large images.
+
+A single pass letterboxes the whole frame into `imgsz`, so in a 4K/8K
+surveillance frame a distant vehicle of 20-30 px shrinks to a few pixels
+and is missed. Tiled mode instead cuts the full-resolution image into
+overlapping tiles of the model's native size, runs them (plus one
+downscaled full-frame pass that keeps large vehicles whole) through the
+detector in batched calls of at most `tile_batch` images, shifts the
+boxes back to image coordinates and merges duplicates with class-aware
+NMS (see merge_tiles: IoU everywhere, intersection-over-smaller only for
+boxes cut by a tile seam). The merged boxes are then cropped and
+classified as usual.
+
+Trade-off: latency grows roughly linearly with the number of tiles
+(a 3840x2160 frame at 960 px with 20% overlap is 15 tiles + 1 full pass),
+in exchange for recall on small objects; peak memory is bounded by
+`tile_batch` letterboxed tiles rather than by the frame size. Compare
+both modes on a directory of images with
+
+    python tiling.py sample_images --tile-size 480
+
+The recall side of the trade-off is still unmeasured: it needs the real
+weights, and the only run so far used the stand-in detector, whose boxes
+are random per tile, so its recovered/extra columns mean nothing. That
+run (sample_images, 10 images of at most 930x620, --tile-size 256) gave
+1-16 tiles per image and 31-46 ms single-pass vs 31-204 ms tiled, which
+only reflects the stand-in's simulated cost (20 ms per call + 10 ms per
+image). Record tile count, latency and recovered/extra boxes from
+`python tiling.py sample_images` with best.pt here once measured.
+"""
+import argparse
+import time
+
+import numpy as np
+
+import config
+from boxes import ArrayBoxes
+from detector import box_iou
+from preprocess import decode_image, list_images
+
+
+class TiledResult:
+    """Merged detections of one image, shaped like an ultralytics `Results`."""
+
+    def __init__(self, image, boxes, names, tiles):
+        self.orig_img = image
+        self.boxes = boxes
+        self.names = names
+        self.tiles = tiles
+
+
+def tile_grid(width, height, tile_size, overlap=0.2):
+    """xyxy windows of at most `tile_size` covering the image, overlapping by `overlap`.
+
+    The last row/column is aligned to the image edge, so every tile has the
+    full size unless the image itself is smaller.
+    """
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]
+
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def box_ios(a, b):
+    """Pairwise intersection over the smaller box between (N, 4) and (M, 4) xyxy arrays."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(np.minimum(area_a[:, None], area_b[None, :]), 1e-9)
+
+
+def nms(boxes, scores, threshold=0.5, metric="iou", classes=None):
+    """Greedy NMS; returns kept indices, highest score first.
+
+    With `classes`, only boxes of the same class suppress each other.
+    `metric` "ios" (intersection over the smaller box) also removes boxes
+    lying mostly inside a kept box; see merge_tiles for the seam-only use.
+    """
+    order = np.argsort(-np.asarray(scores))
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    overlap = (box_ios if metric == "ios" else box_iou)(boxes, boxes) > threshold
+    if classes is not None:
+        classes = np.asarray(classes)
+        overlap &= classes[:, None] == classes[None, :]
+    return _greedy(order, overlap)
+
+
+def _greedy(order, suppresses):
+    keep = []
+    suppressed = np.zeros(len(suppresses), dtype=bool)
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= suppresses[i]
+    return np.array(keep, dtype=int)
+
+
+def seam_truncated(boxes, windows, image_size, margin=2.0):
+    """Whether each box touches an edge of its window that is inside the image (a tile seam)."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    windows = np.asarray(windows, dtype=np.float32).reshape(-1, 4)
+    w, h = image_size
+    inner = np.stack([windows[:, 0] > 0, windows[:, 1] > 0, windows[:, 2] < w, windows[:, 3] < h], axis=1)
+    near = np.abs(boxes - windows) <= margin
+    return (inner & near).any(axis=1)
+
+
+def merge_tiles(boxes, scores, classes, window_ids, truncated, iou_threshold=0.5, ios_threshold=0.6):
+    """Class-aware merge of boxes from overlapping windows; returns kept indices.
+
+    Boxes of the same class are duplicates when their IoU exceeds
+    `iou_threshold`. Intersection over the smaller box (`ios_threshold`)
+    only applies between boxes of different windows where one of them is
+    cut by a tile seam (`truncated`), which removes the cut half of an
+    object without deleting a small vehicle that merely sits in front of
+    a larger one. Whole boxes are kept before truncated ones.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    classes = np.asarray(classes)
+    window_ids = np.asarray(window_ids)
+    truncated = np.asarray(truncated, dtype=bool)
+    same_class = classes[:, None] == classes[None, :]
+    seam_pair = (window_ids[:, None] != window_ids[None, :]) & (truncated[:, None] | truncated[None, :])
+    duplicate = (box_iou(boxes, boxes) > iou_threshold) | (seam_pair & (box_ios(boxes, boxes) > ios_threshold))
+    order = np.lexsort((-np.asarray(scores), truncated))
+    return _greedy(order, duplicate & same_class)
+
+
+def detect_tiled(yolo_model, image, imgsz=None, conf=0.45, max_det=50, tile_size=None, overlap=None,
+                 tile_batch=None, merge_threshold=None, merge_iou=None, full_pass=True, **kwargs):
+    """Detect on overlapping tiles of `image` (uint8 RGB array) and merge across seams.
+
+    Tiles default to the detector's `imgsz`; tiles and the optional
+    full-frame pass go through `yolo_model.predict` in batches of at most
+    `tile_batch`. Boxes are merged with merge_tiles (`merge_iou`, and
+    `merge_threshold` as the seam IoS). Returns a TiledResult whose boxes
+    are in image pixels.
+    """
+    imgsz = imgsz or config.DETECTOR_IMGSZ
+    tile_size = tile_size or imgsz
+    overlap = config.TILE_OVERLAP if overlap is None else overlap
+    tile_batch = tile_batch or config.TILE_BATCH
+    merge_threshold = config.TILE_MERGE_THRESHOLD if merge_threshold is None else merge_threshold
+    merge_iou = config.TILE_MERGE_IOU if merge_iou is None else merge_iou
+
+    h, w = image.shape[:2]
+    windows = tile_grid(w, h, tile_size, overlap)
+    if full_pass and len(windows) > 1:
+        windows.append((0, 0, w, h))
+
+    all_boxes, all_conf, all_cls, all_windows, names = [], [], [], [], {}
+    for start in range(0, len(windows), tile_batch):
+        chunk = windows[start:start + tile_batch]
+        # Tile = view ke gambar penuh; yang dialokasikan hanya letterbox per tile di dalam predict
+        tiles = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in chunk]
+        results = yolo_model.predict(tiles, imgsz=imgsz, conf=conf, max_det=max_det, **kwargs)
+        for window_id, ((x1, y1, _, _), r) in enumerate(zip(chunk, results), start):
+            names = getattr(r, "names", names)
+            if r.boxes is None or len(r.boxes) == 0:
+                continue
+            all_boxes.append(r.boxes.xyxy.cpu().numpy() + np.array([x1, y1, x1, y1], dtype=np.float32))
+            all_conf.append(r.boxes.conf.cpu().numpy())
+            all_cls.append(r.boxes.cls.cpu().numpy())
+            all_windows.append(np.full(len(r.boxes), window_id))
+
+    if all_boxes:
+        boxes, scores, classes = np.concatenate(all_boxes), np.concatenate(all_conf), np.concatenate(all_cls)
+        window_ids = np.concatenate(all_windows)
+        truncated = seam_truncated(boxes, np.asarray(windows)[window_ids], (w, h))
+        keep = merge_tiles(boxes, scores, classes, window_ids, truncated, merge_iou, merge_threshold)
+        # merge_tiles mengurutkan kotak utuh lebih dulu; max_det tetap memotong berdasarkan skor
+        keep = keep[np.argsort(-scores[keep], kind="stable")][:max_det]
+        boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+    else:
+        boxes = np.zeros((0, 4), dtype=np.float32)
+        scores = classes = np.zeros(0, dtype=np.float32)
+    return TiledResult(image, ArrayBoxes(boxes, scores, classes), names, len(windows))
+
+
+def compare_tiling(yolo_model, paths, tile_size=None, imgsz=None, conf=0.45, max_det=50, match_iou=0.5):
+    """Latency and box counts of single-pass vs tiled detection per image.
+
+    Without ground truth, `recovered` is the share of single-pass boxes the
+    tiled run also finds and `extra` the tiled boxes no single-pass box
+    matches (mostly small objects, or false positives).
+    """
+    imgsz = imgsz or config.DETECTOR_IMGSZ
+    rows = []
+    for path in paths:
+        image = decode_image(path)
+        start = time.perf_counter()
+        single = yolo_model.predict(image, imgsz=imgsz, conf=conf, max_det=max_det)[0]
+        single_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        tiled = detect_tiled(yolo_model, image, imgsz, conf, max_det, tile_size)
+        tiled_ms = (time.perf_counter() - start) * 1000
+
+        a = single.boxes.xyxy.cpu().numpy() if single.boxes is not None else np.zeros((0, 4))
+        b = tiled.boxes.xyxy.cpu().numpy()
+        iou = box_iou(a, b) if len(a) and len(b) else np.zeros((len(a), len(b)))
+        rows.append({
+            "image": path, "size": image.shape[1::-1], "tiles": tiled.tiles,
+            "single_ms": single_ms, "tiled_ms": tiled_ms,
+            "single_boxes": len(a), "tiled_boxes": len(b),
+            "recovered": float((iou.max(axis=1) >= match_iou).mean()) if len(a) else 1.0,
+            "extra": int((iou.max(axis=0) < match_iou).sum()) if len(a) else len(b),
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare single-pass and tiled detection")
+    parser.add_argument("source", help="directory or glob of images")
+    parser.add_argument("--tile-size", type=int, default=None, help="tile size in px (default: imgsz)")
+    parser.add_argument("--imgsz", type=int, default=None)
+    parser.add_argument("--standin", action="store_true", help="use the deterministic stand-in detector")
+    args = parser.parse_args(argv)
+
+    paths = list_images(args.source)
+    if not paths:
+        parser.error(f"no images found in {args.source!r}")
+    if args.standin:
+        from standins import StandInDetector
+        yolo_model = StandInDetector(call_ms=20.0, image_ms=10.0)
+    else:
+        from detector import load_detector
+        yolo_model = load_detector(warmup=True)
+
+    rows = compare_tiling(yolo_model, paths, args.tile_size, args.imgsz)
+    print(f"{'image':30s} {'size':>11s} {'tiles':>5s} {'single ms':>9s} {'tiled ms':>9s} "
+          f"{'boxes':>9s} {'recovered':>9s} {'extra':>5s}")
+    for row in rows:
+        size = f"{row['size'][0]}x{row['size'][1]}"
+        print(f"{row['image'][-30:]:30s} {size:>11s} {row['tiles']:5d} {row['single_ms']:9.1f} "
+              f"{row['tiled_ms']:9.1f} {row['single_boxes']:4d}/{row['tiled_boxes']:<4d} "
+              f"{row['recovered']:9.0%} {row['extra']:5d}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+"""Span-based timing of the detection pipeline, plus opt-in profiling.
+
+A Trace collects named spans (start offset, duration, attributes) for one
+request and serialises them to JSON. Pipeline functions accept an optional
+`trace` and record their stages into it. `profile_call` runs one call under
+cProfile or the PyTorch profiler and returns the result with a
+downloadable trace file.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Trace:
+    def __init__(self, name="request"):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._depth = threading.local()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        depth = getattr(self._depth, "value", 0)
+        self._depth.value = depth + 1
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self._depth.value = depth
+            self._record(name, start, time.perf_counter() - start, depth, attrs)
+
+    def add(self, name, seconds, start=None, **attrs):
+        """Record an already measured span (`start` is a perf_counter value)."""
+        start = start if start is not None else time.perf_counter() - seconds
+        self._record(name, start, seconds, getattr(self._depth, "value", 0), attrs)
+
+    def merge(self, other, **attrs):
+        """Copy the spans of `other` (e.g. a shared batch trace) into this trace."""
+        for span in other.spans:
+            self._record(span["name"], other.started + span["start_ms"] / 1000, span["duration_ms"] / 1000,
+                         span["depth"], {**span["attrs"], **attrs})
+
+    def _record(self, name, start, seconds, depth, attrs):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "start_ms": round((start - self.started) * 1000, 3),
+                "duration_ms": round(seconds * 1000, 3),
+                "depth": depth,
+                "attrs": attrs,
+            })
+
+    def total_ms(self):
+        with self._lock:
+            return max((s["start_ms"] + s["duration_ms"] for s in self.spans), default=0.0)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: (s["start_ms"], s["depth"]))
+        return {"name": self.name, "total_ms": self.total_ms(), "spans": spans}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+@contextmanager
+def maybe_span(trace, name, **attrs):
+    """`trace.span(...)` when a trace is given, otherwise a no-op."""
+    if trace is None:
+        yield attrs
+    else:
+        with trace.span(name, **attrs) as a:
+            yield a
+
+
+def profile_call(fn, kind="cprofile"):
+    """Run `fn()` under a profiler; returns `(result, trace_bytes, filename, summary_text)`.
+
+    `kind` is "cprofile" (.prof for snakeviz/pstats) or "torch" (Chrome trace
+    JSON for chrome://tracing or Perfetto). Only the calling thread is
+    profiled, so run the pipeline directly rather than through the scheduler.
+    """
+    if kind == "torch":
+        from torch.profiler import ProfilerActivity, profile
+
+        with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+            result = fn()
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            prof.export_chrome_trace(path)
+            with open(path, "rb") as f:
+                data = f.read()
+        finally:
+            os.remove(path)
+        summary = prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=20)
+        return result, data, "torch_trace.json", summary
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn)
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(25)
+    fd, path = tempfile.mkstemp(suffix=".prof")
+    os.close(fd)
+    try:
+        stats.dump_stats(path)
+        with open(path, "rb") as f:
+            data = f.read()
+    finally:
+        os.remove(path)
+    return result, data, "pipeline.prof", out.getvalue()